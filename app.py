@@ -1,20 +1,28 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+import os
+# The green-thread server needs the standard library patched before anything else is imported
+if os.getenv("SOCKETIO_ASYNC_MODE") == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    from grpc.experimental import gevent as grpc_gevent
+    grpc_gevent.init_gevent()  # Lets the Speech client's gRPC calls yield to other greenlets
+
+from flask import Flask, Response, request, jsonify, render_template, session, redirect, url_for
 from flask_socketio import SocketIO
 from flask_session import Session
 import speech_utils  # Import the whole module
-from events import socketio
+from events import socketio, user_room
 import json
-import threading
-from gpt_utils import get_gpt_response
+import hmac
+from gpt_utils import get_gpt_response, stream_gpt_response
 from speech_utils import get_full_transcription
-import os
+from storage import get_storage
+from metrics import registry
 
 app = Flask(__name__, template_folder='templates')  # Specify the templates folder
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')  # Change in production
 app.config['SESSION_TYPE'] = 'filesystem'
 Session(app)
 socketio.init_app(app)
-is_listening = False  # Global flag to track listening state
 
 # Hardcoded users (replace with database in production)
 USERS = {
@@ -25,6 +33,9 @@ USERS = {
 # Base directory for user transcriptions
 BASE_DIR = os.path.join("transcriptions", "users")
 
+# Bearer token a Prometheus scraper sends to read /metrics; without one only logged-in users can
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 def get_user_dir():
     """Get the current user's transcription directory."""
     if 'user' not in session:
@@ -80,30 +91,25 @@ def start_listening():
     if not user_dir:
         return jsonify({"error": "Unauthorized"}), 401
 
-    # Clear user's transcription files
-    for filename in ["live_transcription.txt", "questions_answers.json", 
-                    "action_items.json", "meeting_minutes.json"]:
-        filepath = os.path.join(user_dir, filename)
-        with open(filepath, "w") as f:
-            if filename.endswith('.json'):
-                json.dump([] if filename == "questions_answers.json" else {}, f)
-            else:
-                f.write("")
+    # The previous session's loop and GPT work finish first, so none of it lands in the new one
+    speech_utils.finish_session(user_dir)
+    # Clear the user's transcript, Q&A, minutes and action items
+    storage = get_storage(user_dir)
+    storage.reset()
 
-    # Start transcription thread for user
-    threading.Thread(target=speech_utils.transcribe_streaming, 
-                    args=(user_dir,)).start()
+    # Start transcription for user (a thread or green thread, depending on SOCKETIO_ASYNC_MODE)
+    socketio.start_background_task(speech_utils.transcribe_streaming, user_dir)
 
-    return jsonify({"message": "Listening started, previous session cleared!"})
+    return jsonify({"message": "Listening started, previous session cleared!", "session": storage.session})
 
 
 @app.route("/stop-listening", methods=["POST"])
+@user_required
 def stop_listening():
     """Stop listening for transcription."""
-    global is_listening
-    if is_listening:
-        is_listening = False
-        speech_utils.stop_transcription()  # Add this line to stop the transcription
+    user_dir = get_user_dir()
+    if speech_utils.get_user_state(user_dir).should_continue.is_set():
+        speech_utils.stop_transcription(user_dir)
         return jsonify({"message": "Listening stopped. Data retained until next session starts."})
     return jsonify({"message": "Already stopped."})
 
@@ -139,18 +145,23 @@ def ask_ai():
 @app.route('/get-transcript')
 @user_required
 def get_transcript():
+    """Return transcript lines, newest first; with ?cursor=&session= from the last call, only newer lines."""
     try:
         user_dir = get_user_dir()
         if not user_dir:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        filepath = os.path.join(user_dir, 'live_transcription.txt')
-        with open(filepath, 'r') as file:
-            lines = file.readlines()
-            # Return lines in reverse chronological order
-            return jsonify({'lines': lines[::-1]})
-    except FileNotFoundError:
-        return jsonify({'lines': []})
+        cursor = request.args.get('cursor', default=0, type=int)
+        storage = get_storage(user_dir)
+        # Taken before the read, so a reset during it makes the next call start over
+        session = storage.session
+        # A cursor from an earlier session (or past the end) starts from the beginning
+        segments, cursor, reset = storage.read_segments(cursor, request.args.get('session'))
+        # Return lines in reverse chronological order, both in the legacy format and as structured segments
+        segments.reverse()
+        lines = [segment.to_line() + "\n" for segment in segments]
+        return jsonify({'lines': lines, 'segments': [s.to_dict() for s in segments],
+                        'cursor': cursor, 'session': session, 'reset': reset})
     except Exception as e:
         print(f"Error reading transcript: {e}")
         return jsonify({'error': str(e)}), 500
@@ -158,21 +169,28 @@ def get_transcript():
 @app.route('/get-questions')
 @user_required
 def get_questions():
+    """Return Q&A entries, newest first; with ?cursor=&session= from the last call, only newer entries."""
     try:
         user_dir = get_user_dir()
         if not user_dir:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        filepath = os.path.join(user_dir, 'questions_answers.json')
-        with open(filepath, 'r') as file:
-            qa_data = json.load(file)
-            return jsonify({'questions': qa_data})
-    except FileNotFoundError:
-        return jsonify({'questions': []})
+        cursor = request.args.get('cursor', default=0, type=int)
+        storage = get_storage(user_dir)
+        session = storage.session
+        # A cursor from an earlier session (or past the end) starts from the beginning
+        questions, cursor, reset = storage.read_qa(cursor, request.args.get('session'))
+        return jsonify({'questions': questions, 'cursor': cursor, 'session': session, 'reset': reset})
     except Exception as e:
         print(f"Error reading questions: {e}")
         return jsonify({'error': str(e)}), 500
 
+def conditional_json(data):
+    """JSON response with an ETag; answers 304 Not Modified when the client already has it."""
+    response = jsonify(data)
+    response.add_etag()
+    return response.make_conditional(request)
+
 @app.route('/get-action-items')
 @user_required
 def get_action_items():
@@ -181,12 +199,10 @@ def get_action_items():
         if not user_dir:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        filepath = os.path.join(user_dir, 'action_items.json')
-        with open(filepath, 'r') as file:
-            action_items = json.load(file)
-        return jsonify(action_items)
-    except FileNotFoundError:
-        return jsonify({"action_items": ""})
+        action_items = get_storage(user_dir).load_document('action_items')
+        if action_items is None:
+            return jsonify({"action_items": ""})
+        return conditional_json(action_items)
     except Exception as e:
         return jsonify({"error": f"Error fetching action items: {str(e)}"}), 500
 
@@ -198,12 +214,10 @@ def get_meeting_minutes():
         if not user_dir:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        filepath = os.path.join(user_dir, 'meeting_minutes.json')
-        with open(filepath, 'r') as file:
-            minutes = json.load(file)
-        return jsonify(minutes)
-    except FileNotFoundError:
-        return jsonify({"meeting_minutes": ""})
+        minutes = get_storage(user_dir).load_document('meeting_minutes')
+        if minutes is None:
+            return jsonify({"meeting_minutes": ""})
+        return conditional_json(minutes)
     except Exception as e:
         return jsonify({"error": f"Error fetching meeting minutes: {str(e)}"}), 500
 
@@ -221,13 +235,14 @@ def chat():
 
         user_message = data['message']
         
-        # Get current transcription context from user's directory
-        filepath = os.path.join(user_dir, 'live_transcription.txt')
-        with open(filepath, 'r') as file:
-            context = file.read()
-        
+        # Get the transcript lines relevant to this message (plus the latest ones)
+        context = speech_utils.build_context(user_dir, user_message)
+
+        if data.get('stream'):
+            return stream_chat(user_message, context, user_room(user_dir))
+
         # Get response from GPT
-        response = get_gpt_response(user_message, context)
+        response = get_gpt_response(user_message, context, user_room(user_dir))
         
         return jsonify({
             'response': response
@@ -240,6 +255,44 @@ def chat():
             'response': 'Sorry, there was an error processing your message.'
         }), 500
 
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat(user_message, context, user=None):
+    """
+    Answer a chat message as Server-Sent Events: a "token" event per piece of
+    text as GPT generates it, then "done" (or "error"). When the browser goes
+    away the server can no longer write, the generator is closed, and that
+    closes the OpenAI stream.
+    """
+    def generate():
+        tokens = stream_gpt_response(user_message, context, user)
+        try:
+            for token in tokens:
+                yield server_sent_event('token', {'token': token})
+            yield server_sent_event('done', {})
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield server_sent_event('error', {'response': 'Sorry, there was an error processing your message.'})
+        finally:
+            tokens.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Keep proxies from holding tokens back
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Stage latencies, LLM usage and per-session queue/capture stats for Prometheus."""
+    # Series are labelled with user names, so they are not public
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            return jsonify({"error": "Unauthorized"}), 401
+    elif 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     socketio.run(app, port=8000, debug=True)
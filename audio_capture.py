@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import numpy as np
+
+# Capture format expected by the recognizer (16-bit mono PCM)
+AUDIO_RATE = int(os.getenv("AUDIO_RATE", "16000"))
+# Duration of each chunk handed to the recognizer
+AUDIO_CHUNK_MS = int(os.getenv("AUDIO_CHUNK_MS", "100"))
+# Capacity of the ring buffer between the device callback and the recognizer
+AUDIO_BUFFER_SECONDS = float(os.getenv("AUDIO_BUFFER_SECONDS", "10"))
+# Frames per device callback
+AUDIO_BLOCKSIZE = int(os.getenv("AUDIO_BLOCKSIZE", "1024"))
+
+
+class AudioCapture:
+    """
+    Preallocated int16 ring buffer between an audio source and the recognizer.
+
+    The source calls write() with blocks of any size (from the device
+    callback thread); chunks() yields memoryview slices of exactly one chunk
+    straight out of the buffer. The capacity is a whole number of chunks, so
+    a slice never wraps, and the slice being consumed is not overwritten until
+    the consumer asks for the next one. When the buffer is full, new samples
+    are dropped and counted rather than blocking the device.
+    """
+
+    def __init__(self, rate=None, chunk_ms=None, buffer_seconds=None):
+        self.rate = rate or AUDIO_RATE
+        self.chunk_samples = max(1, self.rate * (chunk_ms or AUDIO_CHUNK_MS) // 1000)
+        chunks = max(2, round((buffer_seconds or AUDIO_BUFFER_SECONDS) * self.rate / self.chunk_samples))
+        self.buffer = np.zeros(chunks * self.chunk_samples, dtype=np.int16)
+        self.view = memoryview(self.buffer)
+        self.written = 0  # Total samples stored
+        self.read = 0  # Total samples released by the consumer
+        self.taken = 0  # Total samples handed to the consumer
+        self.closed = False
+        self.condition = threading.Condition()
+        self.captured_samples = 0
+        self.dropped_samples = 0
+        self.overflows = 0
+        self.chunks_out = 0
+
+    @property
+    def capacity(self):
+        return len(self.buffer)
+
+    def write(self, block, overflowed=False, wait=False):
+        """
+        Store a block of samples; overflowed marks samples the device already
+        lost before it. With wait, block until there is room instead of
+        dropping (for file and synthetic sources, never for a live device).
+        """
+        samples = np.asarray(block).reshape(-1)
+        if samples.dtype != np.int16:
+            # Float sources are in [-1, 1]
+            samples = (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+        with self.condition:
+            if wait:
+                needed = min(len(samples), self.capacity)
+                while self.capacity - (self.written - self.read) < needed and not self.closed:
+                    self.condition.wait(0.1)
+            if overflowed:
+                self.overflows += 1
+            self.captured_samples += len(samples)
+            free = self.capacity - (self.written - self.read)
+            if len(samples) > free:
+                self.dropped_samples += len(samples) - free
+                samples = samples[:free]
+            position = self.written % self.capacity
+            first = min(len(samples), self.capacity - position)
+            self.buffer[position:position + first] = samples[:first]
+            self.buffer[:len(samples) - first] = samples[first:]
+            self.written += len(samples)
+            if self.written - self.read >= self.chunk_samples:
+                self.condition.notify_all()
+
+    def close(self):
+        """The source has finished; chunks() ends once the buffer is drained."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def chunks(self, active=None):
+        """
+        Yield memoryview slices of chunk_samples int16 samples (the last one
+        may be shorter). Ends when the source is closed and drained, or when
+        the `active` event is cleared. A slice is only valid until the next
+        one is requested. Meant for a single consumer.
+        """
+        held = 0
+        while True:
+            with self.condition:
+                if held:
+                    self.read += held
+                    held = 0
+                    self.condition.notify_all()
+                while (self.written - self.read < self.chunk_samples and not self.closed
+                       and (active is None or active.is_set())):
+                    self.condition.wait(0.1)
+                available = self.written - self.read
+                if available >= self.chunk_samples:
+                    count = self.chunk_samples
+                elif self.closed and available and (active is None or active.is_set()):
+                    count = available
+                else:
+                    return
+                start = self.read % self.capacity
+                self.chunks_out += 1
+                self.taken += count
+            held = count
+            yield self.view[start:start + count]
+
+    def elapsed(self):
+        """
+        Seconds of audio the consumer has taken so far, counting dropped
+        samples: the session's audio clock, which runs at wall-clock speed
+        for a live device and at the audio's own pace for a replay.
+        """
+        with self.condition:
+            return (self.taken + self.dropped_samples) / self.rate
+
+    def stats(self):
+        with self.condition:
+            return {
+                "captured_samples": self.captured_samples,
+                "dropped_samples": self.dropped_samples,
+                "overflows": self.overflows,
+                "chunks": self.chunks_out,
+                "buffered_samples": self.written - self.read,
+            }
+
+
+def open_microphone(capture, device=None, blocksize=None):
+    """An (unstarted) sounddevice input stream whose callback writes into capture."""
+    import sounddevice as sd
+
+    def callback(indata, frames, time_info, status):
+        capture.write(indata[:, 0], overflowed=bool(status.input_overflow))
+
+    return sd.InputStream(samplerate=capture.rate, channels=1, dtype="int16",
+                          blocksize=blocksize or AUDIO_BLOCKSIZE, device=device, callback=callback)
+
+
+class SyntheticSource:
+    """
+    Feeds a prepared signal into a capture in device-sized blocks, then closes
+    it. With realtime it is paced like a real device (`speed` times faster);
+    otherwise it goes as fast as the consumer reads, without dropping
+    anything. Used for replays, tests and benchmarks in place of a microphone.
+    """
+
+    def __init__(self, samples, blocksize=None, realtime=False, speed=1.0):
+        self.samples = np.asarray(samples)
+        self.blocksize = blocksize or AUDIO_BLOCKSIZE
+        self.realtime = realtime
+        self.speed = speed
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def run(self, capture):
+        started = time.monotonic()
+        for offset in range(0, len(self.samples), self.blocksize):
+            if self.stopped.is_set():
+                break
+            if self.realtime:
+                delay = started + offset / (capture.rate * self.speed) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            capture.write(self.samples[offset:offset + self.blocksize], wait=not self.realtime)
+        capture.close()
+
+    def start(self, capture):
+        """Run on a daemon thread."""
+        self.thread = threading.Thread(target=self.run, args=(capture,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stopped.set()
+
+
+def tone(seconds, rate=None, frequency=440.0, amplitude=0.5):
+    """Sine wave as int16 samples."""
+    rate = rate or AUDIO_RATE
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * frequency * t) * amplitude * 32767).astype(np.int16)
@@ -0,0 +1,99 @@
+"""
+Micro-benchmarks for transcript chunking.
+
+Compares the legacy 200-character slicer (chunk_transcription) with the
+token-budgeted line packer (iter_token_chunks / TokenChunker): how many
+chunks (i.e. summarization calls) each produces for the same transcript,
+how fast each runs over a full transcript, and how much work it takes to
+keep chunks current while a live transcript grows one line at a time.
+
+Usage: python bench_chunking.py [--lines 2000] [--max-tokens 400] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import timeit
+
+# gpt_utils creates an OpenAI client at import time; no request is ever made here
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from gpt_utils import chunk_transcription, iter_token_chunks, TokenChunker, estimate_tokens
+
+WORDS = ("we need to ship the release before friday and the marketing budget is still open "
+         "sales are up this quarter so hiring the senior developer role should be a priority "
+         "can we review the roadmap next week what about the customer feedback on pricing").split()
+
+
+def make_transcript(line_count, seed=0):
+    """Build a synthetic transcript of speaker lines with a realistic length spread."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(line_count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 40))]
+        sentence = " ".join(words).capitalize() + rng.choice([".", ".", "?", "!"])
+        lines.append(f"{sentence} (Confidence: 0.9{rng.randint(0, 9)}) (Time Stamp: {i // 60:02d}:{i % 60:02d})")
+    return lines
+
+
+def bench(label, fn, repeat):
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return label, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = make_transcript(args.lines)
+    transcript = "\n".join(lines)
+    size_mb = len(transcript.encode("utf-8")) / 1e6
+
+    sliced = chunk_transcription(transcript)
+    packed = list(iter_token_chunks(lines, args.max_tokens))
+
+    print(f"Transcript: {len(lines)} lines, {len(transcript)} chars, ~{estimate_tokens(transcript)} tokens")
+    print()
+    print(f"{'chunker':<38}{'chunks':>8}{'avg tokens':>12}")
+    for label, chunks in (("chunk_transcription (200 chars)", sliced),
+                          (f"iter_token_chunks ({args.max_tokens} tokens)", packed)):
+        average = sum(estimate_tokens(chunk) for chunk in chunks) / max(len(chunks), 1)
+        print(f"{label:<38}{len(chunks):>8}{average:>12.1f}")
+    cut_lines = sum(1 for left, right in zip(sliced, sliced[1:])
+                    if not left.endswith("\n") and not right.startswith("\n"))
+    print(f"Lines cut mid-way by the 200-char slicer: {cut_lines}")
+    print()
+
+    results = [
+        bench("chunk_transcription, full pass", lambda: chunk_transcription(transcript), args.repeat),
+        bench("iter_token_chunks, full pass", lambda: list(iter_token_chunks(lines, args.max_tokens)), args.repeat),
+    ]
+
+    # Live use: keep chunks current after every new line
+    step = max(1, len(lines) // 200)
+    prefixes = ["\n".join(lines[:n]) for n in range(step, len(lines) + 1, step)]
+
+    def rechunk_every_update():
+        for prefix in prefixes:
+            chunk_transcription(prefix)
+
+    def incremental_every_update():
+        chunker = TokenChunker(args.max_tokens)
+        for n in range(len(lines)):
+            chunker.feed(lines[n])
+            if (n + 1) % step == 0:
+                chunker.pending()
+
+    results.append(bench(f"chunk_transcription, re-run x{len(prefixes)}", rechunk_every_update, args.repeat))
+    results.append(bench(f"TokenChunker, incremental x{len(prefixes)}", incremental_every_update, args.repeat))
+
+    print(f"{'benchmark':<42}{'best (ms)':>12}{'MB/s':>10}")
+    for label, seconds in results:
+        throughput = f"{size_mb / seconds:>10.1f}" if "full pass" in label else f"{'':>10}"
+        print(f"{label:<42}{seconds * 1000:>12.2f}{throughput}")
+
+
+if __name__ == "__main__":
+    main()
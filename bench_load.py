@@ -0,0 +1,331 @@
+"""
+Multi-user load benchmark for the Flask/Socket.IO server.
+
+Starts app.py on a local port with stubbed backends:
+
+- speech: each user's session plays a generated script through the scripted
+  recognizer in real time (optional result latency and stream failures,
+  which exercise reconnects and rollover);
+- OpenAI: chat completions sleep for a configurable latency and fail
+  (timeout) at a configurable rate.
+
+N simulated users log in, start listening, poll /get-transcript and
+/get-questions like the browser does, and chat. The report has
+p50/p95/p99 of utterance -> line visible, question -> answer visible and
+/chat round trips, throughput, and memory per session, and is stored as JSON
+so runs can be compared (--compare).
+
+Usage: python bench_load.py [--users 10] [--duration 30] [--llm-latency 0.8] [--llm-failure-rate 0.05]
+                            [--output bench_results.json] [--compare previous.json]
+"""
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import re
+import resource
+import socket
+import sys
+import threading
+import time
+import types
+import urllib.request
+import numpy as np
+
+# gpt_utils creates an OpenAI client at import time; every call is stubbed here
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+
+from openai import APITimeoutError
+import app as server
+import gpt_utils
+import speech_utils
+from audio_capture import AUDIO_RATE, tone
+from llm_cache import LLMCache
+from metrics import timings, format_report
+from speech_backends import ScriptedRecognizer, SignalSource
+
+WORDS = ("we need to ship the release before friday and the marketing budget is still open "
+         "sales are up this quarter so hiring the senior developer role should be a priority").split()
+
+
+def rss_bytes():
+    """Resident memory of this process."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": float(np.mean(values)), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(np.max(values))}
+
+
+class StubLLM:
+    """Stands in for client.chat.completions.create: sleeps, sometimes times out, echoes the prompt."""
+
+    def __init__(self, latency, jitter, failure_rate, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def create(self, model, messages, timeout=None, **params):
+        self.calls += 1
+        time.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise APITimeoutError(request=None)
+        if params.get("response_format") and messages[0]["content"] == gpt_utils.ANALYSIS_PROMPT:
+            content = json.dumps({"minutes": ["Stub minutes point"], "action_items": [], "open_questions": []})
+        elif params.get("response_format"):
+            # A batch of numbered questions answered as JSON
+            numbers = re.findall(r"^(\d+)\. ", messages[-1]["content"], re.MULTILINE)
+            content = json.dumps({"answers": [{"id": int(n), "answer": f"Stub answer {n}"} for n in numbers]})
+        else:
+            content = f"Stub reply to: {messages[-1]['content'][-120:]}"
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+
+class FlakyRecognizer(ScriptedRecognizer):
+    """Scripted recognizer that also records when each final is produced and can drop its stream."""
+
+    def __init__(self, script, failure_rate, emitted, seed, **kwargs):
+        super().__init__(script, **kwargs)
+        self.failure_rate = failure_rate
+        self.emitted = emitted
+        self.rng = random.Random(seed)
+
+    def stream(self, chunks):
+        for response in super().stream(chunks):
+            if self.rng.random() < self.failure_rate:
+                # The result is lost with the stream; it comes again from the audio replayed into the next one
+                self.next_event -= 1
+                raise ConnectionError("stub recognizer stream dropped")
+            for result in response.results:
+                if result.is_final:
+                    self.emitted.setdefault(result.alternatives[0].transcript, time.perf_counter())
+            yield response
+
+
+def make_script(user, duration, interval, question_every, rng):
+    """Utterances every `interval` seconds; every `question_every`-th one is a question."""
+    script = []
+    for i in range(int(duration / interval)):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+        question = question_every and i % question_every == question_every - 1
+        text = f"{user} line {i} {words}" + ("?" if question else ".")
+        script.append({"at": (i + 1) * interval, "text": text})
+    return script
+
+
+class SimulatedUser(threading.Thread):
+    """One browser: logs in, starts listening, polls transcript and questions, chats now and then."""
+
+    def __init__(self, base_url, name, script, args, results):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.name = name
+        self.script = script
+        self.args = args
+        self.results = results
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.seen_lines = {}
+        self.seen_questions = {}
+        self.errors = 0
+
+    def request(self, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method="POST" if data else "GET",
+                                         headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                body = json.loads(response.read())
+        except Exception:
+            self.errors += 1
+            return None, time.perf_counter() - started
+        return body, time.perf_counter() - started
+
+    def run(self):
+        self.request("/login", {"username": self.name, "password": self.name})
+        self.request("/start-listening", {})
+        transcript_cursor = questions_cursor = 0
+        deadline = time.perf_counter() + self.args.duration + self.args.drain
+        next_chat = time.perf_counter() + self.args.chat_interval
+        questions = sum(1 for e in self.script if e["text"].endswith("?"))
+        while time.perf_counter() < deadline:
+            body, _ = self.request(f"/get-transcript?cursor={transcript_cursor}")
+            now = time.perf_counter()
+            if body and "cursor" in body:
+                transcript_cursor = body["cursor"]
+                for segment in body["segments"]:
+                    self.seen_lines.setdefault(segment["text"], now)
+            body, _ = self.request(f"/get-questions?cursor={questions_cursor}")
+            now = time.perf_counter()
+            if body and "cursor" in body:
+                questions_cursor = body["cursor"]
+                for item in body["questions"]:
+                    self.seen_questions.setdefault(item["question"], now)
+            if self.args.chat_interval and now >= next_chat:
+                _, elapsed = self.request("/chat", {"message": "What has been decided so far?"})
+                self.results["chat"].append(elapsed)
+                next_chat = now + self.args.chat_interval
+            if len(self.seen_lines) == len(self.script) and len(self.seen_questions) == questions:
+                break
+            time.sleep(self.args.poll_interval)
+        self.request("/stop-listening", {})
+
+
+def run_benchmark(args):
+    # Stub the OpenAI client and turn off the response cache so every call pays the stub latency
+    llm = StubLLM(args.llm_latency, args.llm_jitter, args.llm_failure_rate, seed=args.seed)
+    gpt_utils.client.chat.completions.create = llm.create
+    gpt_utils.llm_cache = LLMCache(path="", bypass=True)
+
+    rng = random.Random(args.seed)
+    names = [f"bench{i}" for i in range(args.users)]
+    server.USERS.update({name: name for name in names})
+    scripts = {name: make_script(name, args.duration, args.interval, args.question_every, rng) for name in names}
+    emitted = {}
+
+    # Each session gets its user's script, played in real time through the live path
+    live_transcribe = speech_utils.transcribe_streaming
+    def transcribe_streaming(user_dir):
+        name = os.path.basename(user_dir)
+        recognizer = FlakyRecognizer(scripts[name], args.speech_failure_rate, emitted, seed=args.seed + names.index(name),
+                                     rate=AUDIO_RATE, latency=args.speech_latency)
+        live_transcribe(user_dir, recognizer, SignalSource(tone(recognizer.duration() + 1, rate=AUDIO_RATE)))
+    speech_utils.transcribe_streaming = transcribe_streaming
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    threading.Thread(target=server.socketio.run, args=(server.app,), daemon=True,
+                     kwargs={"host": "127.0.0.1", "port": port, "allow_unsafe_werkzeug": True,
+                             "use_reloader": False, "log_output": False}).start()
+    time.sleep(1)
+
+    timings.reset()
+    results = {"chat": []}
+    rss_before = rss_bytes()
+    users = [SimulatedUser(f"http://127.0.0.1:{port}", name, scripts[name], args, results) for name in names]
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+    rss_peak = rss_before
+    while any(user.is_alive() for user in users):
+        rss_peak = max(rss_peak, rss_bytes())
+        time.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    line_latency, answer_latency = [], []
+    lines = questions = 0
+    for user in users:
+        for entry in user.script:
+            text = entry["text"]
+            if text in user.seen_lines and text in emitted:
+                line_latency.append(user.seen_lines[text] - emitted[text])
+                lines += 1
+            if text.endswith("?") and text in user.seen_questions and text in emitted:
+                answer_latency.append(user.seen_questions[text] - emitted[text])
+                questions += 1
+
+    return {
+        "config": vars(args),
+        "elapsed_seconds": elapsed,
+        "line_visible": percentiles(line_latency),
+        "answer_visible": percentiles(answer_latency),
+        "chat": percentiles(results["chat"]),
+        "throughput": {
+            "lines_per_second": lines / elapsed,
+            "answers_per_second": questions / elapsed,
+            "chats_per_second": len(results["chat"]) / elapsed,
+        },
+        "completeness": {
+            "lines_expected": sum(len(s) for s in scripts.values()),
+            "lines_seen": lines,
+            "questions_expected": sum(1 for s in scripts.values() for e in s if e["text"].endswith("?")),
+            "answers_seen": questions,
+            "http_errors": sum(user.errors for user in users),
+        },
+        "llm": {"calls": llm.calls, "failures": llm.failures},
+        "memory": {
+            "rss_before_mb": rss_before / 1e6,
+            "rss_peak_mb": rss_peak / 1e6,
+            "per_session_mb": (rss_peak - rss_before) / 1e6 / args.users,
+        },
+        "stages": timings.report(),
+    }
+
+
+def print_report(report, previous=None):
+    print(f"{report['config']['users']} users, {report['elapsed_seconds']:.1f}s")
+    print(f"{'latency (ms)':<18}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}" + ("   p95 before" if previous else ""))
+    for key in ("line_visible", "answer_visible", "chat"):
+        row = report[key]
+        if not row["count"]:
+            print(f"{key:<18}{0:>8}")
+            continue
+        line = f"{key:<18}{row['count']:>8}" + "".join(f"{row[p] * 1000:>10.1f}" for p in ("p50", "p95", "p99"))
+        if previous and previous.get(key, {}).get("count"):
+            line += f"{previous[key]['p95'] * 1000:>13.1f}"
+        print(line)
+    print(f"Throughput: {report['throughput']}")
+    print(f"Completeness: {report['completeness']}")
+    print(f"LLM stub: {report['llm']}")
+    print(f"Memory: {report['memory']['per_session_mb']:.2f} MB per session "
+          f"(RSS {report['memory']['rss_before_mb']:.0f} -> {report['memory']['rss_peak_mb']:.0f} MB)")
+    print()
+    print(format_report(report["stages"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of speech per user")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between utterances")
+    parser.add_argument("--question-every", type=int, default=4, help="every Nth utterance is a question (0: none)")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--chat-interval", type=float, default=10, help="seconds between chats per user (0: none)")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to keep polling for late answers")
+    parser.add_argument("--speech-latency", type=float, default=0.0)
+    parser.add_argument("--speech-failure-rate", type=float, default=0.0, help="chance a result drops the stream")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to show p95s against")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's per-line logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with output:
+        report = run_benchmark(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_report(report, previous)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=4)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,31 @@
-from flask_socketio import SocketIO
+import os
+from flask import session
+from flask_socketio import SocketIO, join_room
+from metrics import socket_emits, timings
 
-socketio = SocketIO()
+# "threading" runs each connection and background task on an OS thread; "gevent" runs them
+# as green threads, so sessions blocked on network I/O share a few OS threads. eventlet is
+# not supported: grpcio cannot cooperate with it, so a Speech stream would block every session.
+SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+if SOCKETIO_ASYNC_MODE not in ("threading", "gevent"):
+    raise ValueError(f"SOCKETIO_ASYNC_MODE should be threading or gevent, not {SOCKETIO_ASYNC_MODE}")
 
-def notify_frontend_update():
-    """Notify frontend that new content is available"""
-    socketio.emit('content_update') 
\ No newline at end of file
+socketio = SocketIO(async_mode=SOCKETIO_ASYNC_MODE)
+
+def user_room(user_dir):
+    """Socket.IO room for the user whose transcriptions live in user_dir."""
+    return os.path.basename(os.path.normpath(user_dir))
+
+@socketio.on('connect')
+def handle_connect():
+    """Put each browser in its user's room so updates only reach that user."""
+    if 'user' not in session:
+        return False  # Reject sockets from logged-out browsers
+    join_room(session['user'])
+
+def notify_frontend_update(user_dir, event, payload=None):
+    """Push an update (with its data, so no refetch is needed) to the user's browsers."""
+    room = user_room(user_dir)
+    with timings.timed("emit", room):
+        socketio.emit(event, payload or {}, to=room)
+    socket_emits.inc(event=event, user=room)
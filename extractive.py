@@ -0,0 +1,143 @@
+import bisect
+import os
+import re
+import sys
+import threading
+import numpy as np
+from retrieval import tokenize
+
+# Sentences in a summary of the whole meeting, and in one of just the latest lines
+EXTRACTIVE_SENTENCES = int(os.getenv("EXTRACTIVE_SENTENCES", "6"))
+EXTRACTIVE_RECENT_SENTENCES = int(os.getenv("EXTRACTIVE_RECENT_SENTENCES", "3"))
+# A sentence sharing more than this fraction of its terms with one already picked is a repeat
+EXTRACTIVE_REDUNDANCY = float(os.getenv("EXTRACTIVE_REDUNDANCY", "0.5"))
+# Sentences with fewer terms are never picked ("Yes.", "Okay, thanks.")
+EXTRACTIVE_MIN_TERMS = 3
+# Most recent sentences kept for summaries; older ones are forgotten a quarter at a time
+EXTRACTIVE_WINDOW_SENTENCES = int(os.getenv("EXTRACTIVE_WINDOW_SENTENCES", "4000"))
+
+
+def split_sentences(text):
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+
+
+class ExtractiveSummarizer:
+    """
+    In-process extractive summary of a session's transcript, cheap enough
+    to refresh on every new line.
+
+    add() splits each final segment into sentences and appends their term
+    occurrences to flat NumPy arrays (term id, and the sentence it belongs
+    to), counting document frequencies per sentence. summary() scores every
+    sentence in one pass: each term occurrence weighs the term's frequency in
+    the summarized lines times its IDF (what the meeting keeps coming back
+    to, but not words said everywhere), summed per sentence with np.bincount
+    and divided by the square root of the sentence's length, so neither
+    fragments nor run-ons win on length. The best sentences, skipping
+    near-repeats of ones already picked, come back in meeting order.
+
+    Only the most recent `window` sentences are kept, so a long meeting's
+    summary covers its latest stretch.
+    """
+
+    def __init__(self, window=None):
+        self.window = window or EXTRACTIVE_WINDOW_SENTENCES
+        self.vocabulary = {}
+        self.df = np.zeros(256, dtype=np.float64)
+        self.term_ids = np.empty(1024, dtype=np.int32)
+        self.owners = np.empty(1024, dtype=np.int32)
+        self.size = 0
+        self.sentences = []  # (segment seq, clock, text)
+        self.sentence_seqs = []
+        self.offsets = []  # Position of each sentence's first term occurrence
+        self.lengths = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def _term_id(self, term):
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.vocabulary)
+            if term_id == len(self.df):
+                self.df = np.concatenate([self.df, np.zeros(len(self.df))])
+        return term_id
+
+    def add(self, segment):
+        """Index the sentences of a final segment."""
+        with self.lock:
+            for text in split_sentences(segment.text):
+                ids = [self._term_id(term) for term in tokenize(text)]
+                unique = set(ids)
+                self.df[list(unique)] += 1
+                if self.size + len(ids) > len(self.term_ids):
+                    capacity = max(2 * len(self.term_ids), self.size + len(ids))
+                    self.term_ids = np.resize(self.term_ids, capacity)
+                    self.owners = np.resize(self.owners, capacity)
+                self.term_ids[self.size:self.size + len(ids)] = ids
+                self.owners[self.size:self.size + len(ids)] = len(self.sentences)
+                self.offsets.append(self.size)
+                self.size += len(ids)
+                self.lengths.append(len(ids))
+                self.sentence_seqs.append(segment.seq)
+                self.sentences.append((segment.seq, segment.clock(), text))
+            if len(self.sentences) > self.window:
+                self._forget(len(self.sentences) - self.window * 3 // 4)
+
+    def _forget(self, count):
+        """Drop the oldest count sentences (caller holds the lock)."""
+        cut = self.offsets[count]
+        # Each dropped sentence counted each of its distinct terms once
+        pairs = np.unique(self.owners[:cut].astype(np.int64) * len(self.df) + self.term_ids[:cut])
+        np.subtract.at(self.df, pairs % len(self.df), 1)
+        kept = self.size - cut
+        self.term_ids[:kept] = self.term_ids[cut:self.size]
+        self.owners[:kept] = self.owners[cut:self.size] - count
+        self.size = kept
+        self.offsets = [offset - cut for offset in self.offsets[count:]]
+        del self.lengths[:count], self.sentence_seqs[:count], self.sentences[:count]
+
+    def memory_bytes(self):
+        """Approximate memory held by the vocabulary, term arrays and sentences."""
+        with self.lock:
+            return (self.df.nbytes + self.term_ids.nbytes + self.owners.nbytes + sys.getsizeof(self.vocabulary) +
+                    sum(sys.getsizeof(sentence) + sys.getsizeof(sentence[2]) for sentence in self.sentences))
+
+    def _terms(self, i):
+        """Distinct term ids of sentence i (caller holds the lock)."""
+        return frozenset(self.term_ids[self.offsets[i]:self.offsets[i] + self.lengths[i]].tolist())
+
+    def summary(self, since_seq=0, count=None):
+        """The best (seq, clock, text) sentences from segments since_seq onwards, in meeting order."""
+        count = count or EXTRACTIVE_SENTENCES
+        with self.lock:
+            total = len(self.sentences)
+            first = bisect.bisect_left(self.sentence_seqs, since_seq)
+            if first == total:
+                return []
+            idf = np.log((1 + total) / (1 + self.df[:len(self.vocabulary)])) + 1
+            start = self.offsets[first]
+            ids = self.term_ids[start:self.size]
+            tf = np.bincount(ids, minlength=len(self.vocabulary))
+            lengths = np.array(self.lengths[first:], dtype=np.float64)
+            scores = np.bincount(self.owners[start:self.size] - first, weights=tf[ids] * idf[ids],
+                                 minlength=total - first) / np.sqrt(np.maximum(lengths, 1))
+            scores[lengths < EXTRACTIVE_MIN_TERMS] = 0
+
+            picked = []
+            picked_terms = []
+            for i in np.argsort(-scores, kind="stable"):
+                if scores[i] <= 0 or len(picked) == count:
+                    break
+                terms = self._terms(first + i)
+                if any(len(terms & other) > EXTRACTIVE_REDUNDANCY * len(terms | other) for other in picked_terms):
+                    continue
+                picked.append(i)
+                picked_terms.append(terms)
+            return [self.sentences[first + i] for i in sorted(picked)]
+
+
+def format_summary(sentences):
+    """Markdown bullets of summary sentences with their time stamps."""
+    return "\n".join(f"* [{clock}] {text}" for _, clock, text in sentences)
@@ -1,23 +1,162 @@
+import hashlib
+import json
 import os
+import re
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import OpenAI, DefaultHttpxClient, RateLimitError, APIConnectionError, InternalServerError
+from llm_cache import LLMCache, make_key
+from metrics import timings, llm_calls, llm_tokens
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Connection pool shared by every OpenAI call in the process. Idle connections are kept
+# longer than the library default (5 s) so answers and minutes updates a few seconds
+# apart reuse a warm TLS connection instead of handshaking again.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
 
+def create_http_client():
+    """HTTP client with the tuned connection pool (httpx, as used by the openai package)."""
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+    return DefaultHttpxClient(limits=limits)
 
-def get_gpt_response(question, context=""):
+# Initialize the OpenAI client, shared by all sessions and threads. Retries are left to
+# create_chat_completion's own bounded backoff, so the SDK does not retry on top of it.
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=create_http_client(), max_retries=0)
+
+# Shared response cache for every chat completion made by this module
+llm_cache = LLMCache()
+
+# Per-call timeout and retry policy for chat completions
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Rate limits, timeouts, dropped connections and 5xx replies are retried (the client itself never retries)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+# How many chunk summaries may be in flight at once for one transcription
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# Token budget (and optional overlap) for each transcript chunk sent for summarization
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+
+def count_tokens_used(function, response, user=None):
+    """Add a completion's token usage to the metrics, when the response reports it."""
+    usage = getattr(response, "usage", None)
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if isinstance(tokens, int):
+            llm_tokens.inc(tokens, function=function, kind=kind, user=user or "")
+
+def create_chat_completion(messages, model="gpt-3.5-turbo", bypass_cache=False, timeout=None, function="chat",
+                           user=None, **params):
     """
-    Get a response from GPT for chat messages, incorporating meeting context when available.
+    Return the text of a chat completion, served from llm_cache when possible.
+    `function` and `user` (the session's room) label the call's timings and
+    token counts in the metrics.
     """
+    def create():
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                with timings.timed(f"llm:{function}", user):
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        timeout=timeout or LLM_TIMEOUT,
+                        **params
+                    )
+                llm_calls.inc(function=function, outcome="ok", user=user or "")
+                count_tokens_used(function, response, user)
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                llm_calls.inc(function=function, outcome="retried" if attempt < LLM_MAX_RETRIES else "failed",
+                          user=user or "")
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                # Full jitter keeps parallel callers from retrying in lockstep
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                print(f"Retrying chat completion in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+
+    return llm_cache.get_or_create(model, messages, params, create, bypass=bypass_cache)
+
+
+def stream_chat_completion(messages, model="gpt-3.5-turbo", bypass_cache=False, timeout=None, function="chat",
+                           user=None, **params):
+    """
+    Yield the text of a chat completion as the tokens arrive. A cached
+    response is yielded whole, and a finished stream is cached under the same
+    key create_chat_completion uses. Retryable errors are retried
+    until the stream opens. Closing the generator early (the client went
+    away) closes the upstream stream, so the rest is not generated.
+    """
+    use_cache = not (bypass_cache or llm_cache.bypass)
+    key = make_key(model, messages, params)
+    cached = llm_cache.get(key) if use_cache else None
+    if cached is not None:
+        yield cached
+        return
+
+    started = time.perf_counter()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=timeout or LLM_TIMEOUT,
+                stream=True,
+                stream_options={"include_usage": True},
+                **params
+            )
+            break
+        except RETRYABLE_ERRORS as e:
+            llm_calls.inc(function=function, outcome="retried" if attempt < LLM_MAX_RETRIES else "failed",
+                          user=user or "")
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+            print(f"Retrying chat completion stream in {delay:.2f}s after: {e}")
+            time.sleep(delay)
+
+    parts = []
     try:
-        messages = [
-            {
-                "role": "system", 
-                "content": """You are Pai, an AI assistant helping with meeting discussions. 
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                count_tokens_used(function, chunk, user)
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if not parts:
+                timings.observe(f"llm_first_token:{function}", time.perf_counter() - started, user)
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+    except GeneratorExit:
+        llm_calls.inc(function=function, outcome="cancelled", user=user or "")
+        raise
+    finally:
+        stream.close()
+        timings.observe(f"llm:{function}", time.perf_counter() - started, user)
+    llm_calls.inc(function=function, outcome="ok", user=user or "")
+    if use_cache:
+        llm_cache.set(key, "".join(parts))
+
+
+def chat_messages(question, context=""):
+    """Messages asking Pai a chat question, with the meeting context when there is some."""
+    messages = [
+        {
+            "role": "system",
+            "content": """You are Pai, an AI assistant helping with meeting discussions. 
                 You have access to the live meeting transcription and can reference it to provide context-aware responses.
                 Use Markdown formatting for better readability:
                 - ## for headers
@@ -27,68 +166,120 @@ def get_gpt_response(question, context=""):
                 
                 Keep responses concise but informative. If referencing the meeting, cite specific parts.
                 If there's no meeting context or the question is unrelated, respond generally but helpfully."""
-            }
-        ]
+        }
+    ]
 
-        # Add context if available
-        if context.strip():
-            messages.append({
-                "role": "system",
-                "content": f"Here is the current meeting transcription for context:\n{context}"
-            })
-
-        # Add user question
+    # Add context if available
+    if context.strip():
         messages.append({
-            "role": "user",
-            "content": question
+            "role": "system",
+            "content": f"Here is the current meeting transcription for context:\n{context}"
         })
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
+    # Add user question
+    messages.append({
+        "role": "user",
+        "content": question
+    })
+    return messages
+
+
+def get_gpt_response(question, context="", user=None):
+    """
+    Get a response from GPT for chat messages, incorporating meeting context when available.
+    """
+    try:
+        return create_chat_completion(
+            chat_messages(question, context),
             temperature=0.7,
-            max_tokens=500
+            max_tokens=500,
+            function="response",
+            user=user
         )
-        
-        return response.choices[0].message.content
     except Exception as e:
         print(f"Error in get_gpt_response: {e}")
         return f"I apologize, but I encountered an error while processing your request. Please try again."
 
 
+def answer_questions(questions, context="", user=None):
+    """
+    Answer several questions with one chat completion that returns them as
+    JSON. Returns an answer per question; any the reply leaves out (or all
+    of them, if it is not the expected JSON) are answered one at a time
+    with get_gpt_response.
+    """
+    if len(questions) == 1:
+        return [get_gpt_response(questions[0], context, user)]
+
+    numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+    messages = chat_messages(
+        f"Answer each of these questions from the meeting separately:\n{numbered}\n\n"
+        'Reply with a JSON object of the form {"answers": [{"id": <question number>, "answer": "<Markdown answer>"}]}.',
+        context
+    )
+    answers = [None] * len(questions)
+    try:
+        reply = create_chat_completion(
+            messages,
+            temperature=0.7,
+            max_tokens=500 * len(questions),
+            response_format={"type": "json_object"},
+            function="answers",
+            user=user
+        )
+        for entry in json.loads(reply)["answers"]:
+            index = int(entry["id"]) - 1
+            if 0 <= index < len(questions) and isinstance(entry.get("answer"), str) and entry["answer"].strip():
+                answers[index] = entry["answer"]
+    except Exception as e:
+        print(f"Batched answer failed, answering questions one at a time: {e}")
+    return [answer if answer is not None else get_gpt_response(question, context, user)
+            for question, answer in zip(questions, answers)]
+
+
+def stream_gpt_response(question, context="", user=None):
+    """Like get_gpt_response, but yields the answer's text as it is generated."""
+    return stream_chat_completion(
+        chat_messages(question, context),
+        temperature=0.7,
+        max_tokens=500,
+        function="response",
+        user=user
+    )
+
+
 # THIS IS FOR THE QUESTION AND ANSWER SECTION
 def analyze_with_gpt(transcription, query):
     """Send transcription and query to OpenAI for analysis."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant helping with meeting discussions. The current meeting is being transcribed in real time. Use Markdown formatting for better readability: ## for headers, 1. for numbered lists, - [ ] for unchecked boxes, - [x] for checked boxes, * for bullet points, and ** for emphasis."},
-                {"role": "user", "content": f"Here is the meeting transcription so far: {transcription}. The user has a question: '{query}'. Please provide a response using the specified Markdown formatting."}
-            ]
-        )
-        return response.choices[0].message.content
+        return create_chat_completion([
+            {"role": "system", "content": "You are an AI assistant helping with meeting discussions. The current meeting is being transcribed in real time. Use Markdown formatting for better readability: ## for headers, 1. for numbered lists, - [ ] for unchecked boxes, - [x] for checked boxes, * for bullet points, and ** for emphasis."},
+            {"role": "user", "content": f"Here is the meeting transcription so far: {transcription}. The user has a question: '{query}'. Please provide a response using the specified Markdown formatting."}
+        ], function="analysis")
     except Exception as e:
         return f"Error generating feedback: {e}"
 
 # THIS IS FOR THE MEETING MINUTES
-def generate_meeting_minutes(transcription):
+def generate_meeting_minutes(transcription, user=None):
     """Generate meeting minutes summary from the transcription."""
     try:
         # First process the long transcription into a rolling summary
-        summary = process_long_transcription(transcription)
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that creates concise meeting minutes from transcriptions. Use as little words as possible. Organize the meeting minutes chronologically. Use Markdown formatting: ## for headers, 1. for numbered lists, - [ ] for unchecked boxes, - [x] for checked boxes, * for bullet points, and ** for emphasis."},
-                {"role": "user", "content": f"Please create meeting minutes from this meeting summary, highlighting the main points discussed: {summary}"}
-            ]
-        )
-        return response.choices[0].message.content
+        summary = process_long_transcription(transcription, user=user)
+        return minutes_from_summary(summary, user=user)
     except Exception as e:
         return f"Error generating meeting minutes: {e}"
 
+def minutes_from_summary(summary, recent_text="", user=None):
+    """Turn a rolling summary (plus any not-yet-summarized tail) into meeting minutes."""
+    content = f"Please create meeting minutes from this meeting summary, highlighting the main points discussed: {summary}"
+    if recent_text.strip():
+        content += f"\n\nMost recent discussion (not yet summarized):\n{recent_text}"
+
+    return create_chat_completion([
+        {"role": "system", "content": "You are an AI assistant that creates concise meeting minutes from transcriptions. Use as little words as possible. Organize the meeting minutes chronologically. Use Markdown formatting: ## for headers, 1. for numbered lists, - [ ] for unchecked boxes, - [x] for checked boxes, * for bullet points, and ** for emphasis."},
+        {"role": "user", "content": content}
+    ], function="minutes", user=user)
+
 
 ################################################################################
 
@@ -99,33 +290,362 @@ def chunk_transcription(transcription, chunk_size=200):  # Reduced chunk size fo
     cleaned_text = "\n".join(line.strip() for line in transcription.split("\n") if line.strip())
     return [cleaned_text[i:i + chunk_size] for i in range(0, len(cleaned_text), chunk_size)]
 
-def summarize_chunk(chunk):
+# tiktoken encoding, loaded on first use (False when tiktoken is unavailable)
+_encoding = None
+
+def estimate_tokens(text):
+    """Count tokens with tiktoken when it is installed, otherwise approximate at ~4 characters per token."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        except Exception:  # tiktoken is optional, and its encoding download can fail offline
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class TokenChunker:
+    """
+    Incrementally packs whole transcript lines into chunks of at most max_tokens.
+
+    Lines are never cut unless a single line is over budget, in which case it
+    is split at sentence boundaries (and, as a last resort, between words).
+    With overlap_tokens, the tail of each finished chunk is repeated at the
+    start of the next one. Packing is greedy, so a chunk never changes once it
+    has been returned from feed().
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=None, count_tokens=None):
+        self.max_tokens = max_tokens or CHUNK_TOKENS
+        self.overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.count_tokens = count_tokens or estimate_tokens
+        self.units = []  # (separator, text, tokens) of the chunk being filled
+        self.tokens = 0
+
+    def feed(self, line):
+        """Add one transcript line and return the chunks it completed."""
+        line = line.strip()
+        if not line:
+            return []
+        completed = []
+        separator = "\n"
+        for text, tokens in self._split(line):
+            if self.units and self.tokens + tokens > self.max_tokens:
+                completed.append(self._emit())
+                if self.tokens + tokens > self.max_tokens:
+                    self.units, self.tokens = [], 0  # No room left for the overlap
+            self.units.append((separator, text, tokens))
+            self.tokens += tokens
+            separator = " "
+        return completed
+
+    def pending(self):
+        """Text of the chunk that is still being filled."""
+        return "".join(sep + text for sep, text, _ in self.units).lstrip()
+
+    def flush(self):
+        """Return the partially filled chunk (or None) and start over."""
+        chunk = self.pending() or None
+        self.units, self.tokens = [], 0
+        return chunk
+
+    def _emit(self):
+        chunk = self.pending()
+        kept, kept_tokens = [], 0
+        for unit in reversed(self.units):
+            if kept_tokens + unit[2] > self.overlap_tokens:
+                break
+            kept.insert(0, unit)
+            kept_tokens += unit[2]
+        self.units, self.tokens = kept, kept_tokens
+        return chunk
+
+    def _split(self, line):
+        tokens = self.count_tokens(line)
+        if tokens <= self.max_tokens:
+            return [(line, tokens)]
+        pieces = []
+        for sentence in re.split(r"(?<=[.!?])\s+", line):
+            sentence_tokens = self.count_tokens(sentence)
+            if sentence_tokens <= self.max_tokens:
+                pieces.append((sentence, sentence_tokens))
+                continue
+            words = []
+            for word in sentence.split():
+                if words and self.count_tokens(" ".join(words + [word])) > self.max_tokens:
+                    pieces.append((" ".join(words), self.count_tokens(" ".join(words))))
+                    words = []
+                words.append(word)
+            if words:
+                pieces.append((" ".join(words), self.count_tokens(" ".join(words))))
+        return pieces
+
+
+def iter_token_chunks(lines, max_tokens=None, overlap_tokens=None, count_tokens=None):
+    """
+    Yield token-budgeted chunks from an iterable of transcript lines (or one string).
+
+    Chunks are yielded as soon as they are complete, so this also works over a
+    live line source; the final, partially filled chunk comes last.
+    """
+    if isinstance(lines, str):
+        lines = lines.split("\n")
+    chunker = TokenChunker(max_tokens, overlap_tokens, count_tokens)
+    for line in lines:
+        yield from chunker.feed(line)
+    last = chunker.flush()
+    if last:
+        yield last
+
+def summarize_chunk(chunk, user=None):
     """Summarize a single chunk of the transcription."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that creates very concise summaries of meeting segments. Use as few words as possible while capturing key points."},
-                {"role": "user", "content": f"Summarize this part of the meeting concisely:\n{chunk}"}
-            ]
-        )
-        return response.choices[0].message.content
+        return create_chat_completion([
+            {"role": "system", "content": "You are an AI assistant that creates very concise summaries of meeting segments. Use as few words as possible while capturing key points."},
+            {"role": "user", "content": f"Summarize this part of the meeting concisely:\n{chunk}"}
+        ], function="summary", user=user)
     except Exception as e:
         return f"Error summarizing chunk: {e}"
 
-def process_long_transcription(transcription):
+def summarize_chunks(chunks, max_workers=None, user=None):
+    """Summarize chunks concurrently; summaries come back in chunk order."""
+    workers = min(max_workers or SUMMARY_CONCURRENCY, len(chunks))
+    if workers <= 1:
+        return [summarize_chunk(chunk, user) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda chunk: summarize_chunk(chunk, user), chunks))
+
+def process_long_transcription(transcription, max_workers=None, max_tokens=None, user=None):
     """Process a long transcription using rolling summaries."""
-    chunks = chunk_transcription(transcription)
+    chunks = list(iter_token_chunks(transcription, max_tokens))
     rolling_summary = []
-    
-    for chunk in chunks:
-        if not chunk.strip():  # Skip empty chunks
-            continue
-        # Summarize current chunk
-        chunk_summary = summarize_chunk(chunk)
+
+    for chunk_summary in summarize_chunks(chunks, max_workers, user):
         # Append to rolling summary list if not an error
         if not chunk_summary.startswith("Error summarizing chunk"):
             rolling_summary.append(chunk_summary)
-    
+
     # Join all summaries with newlines
-    return "\n".join(rolling_summary) if rolling_summary else "No valid summaries generated."
\ No newline at end of file
+    return "\n".join(rolling_summary) if rolling_summary else "No valid summaries generated."
+
+
+# THIS IS FOR THE LIVE (INCREMENTAL) MEETING MINUTES
+class IncrementalMinutes:
+    """
+    Per-session meeting minutes that only summarizes newly completed chunks.
+
+    The transcript only ever grows at the end, so each update feeds just the
+    segments added since the last one to a TokenChunker and summarizes the
+    chunks it completes. The chunk still being filled goes into the minutes
+    prompt as raw text. Each update therefore costs the new chunk summaries
+    plus one minutes call, however long the meeting is, and never reads back
+    segments the transcript has spilled to storage.
+
+    Chunk summaries are keyed by a hash of the chunk text, so a summary is
+    only ever used for exactly the text it was made from. When the transcript
+    is replaced rather than extended, the chunks are rebuilt and only those
+    whose text changed are summarized again.
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=None, user=None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.user = user
+        self.reset()
+
+    def update(self, transcript):
+        """Return fresh meeting minutes for the transcript (a Transcript) so far."""
+        try:
+            tail = self._feed(transcript)
+
+            missing = {key: chunk for key, chunk in zip(self.chunk_keys, self.chunks) if key not in self.chunk_summaries}
+            for key, chunk_summary in zip(missing, summarize_chunks(list(missing.values()), user=self.user)):
+                # Failed summaries are not kept, so they are retried on the next update
+                if not chunk_summary.startswith("Error summarizing chunk"):
+                    self.chunk_summaries[key] = chunk_summary
+            # Summaries of chunks that were replaced are no longer needed
+            if len(self.chunk_summaries) > len(self.chunks):
+                keys = set(self.chunk_keys)
+                self.chunk_summaries = {key: value for key, value in self.chunk_summaries.items() if key in keys}
+            summaries = [self.chunk_summaries[key] for key in self.chunk_keys if key in self.chunk_summaries]
+
+            if not summaries and not tail.strip():
+                return "No valid summaries generated."
+            return minutes_from_summary("\n".join(summaries), tail, self.user)
+        except Exception as e:
+            return f"Error generating meeting minutes: {e}"
+
+    def _feed(self, transcript):
+        """Chunk the segments added since the last update and return the unsummarized tail."""
+        if len(transcript) < self.next_seq:
+            self._restart()  # The transcript was replaced rather than extended
+        for segment in transcript.since(self.next_seq):
+            for chunk in self.chunker.feed(segment.to_context()):
+                self.chunks.append(chunk)
+                self.chunk_keys.append(hashlib.sha256(chunk.encode("utf-8")).hexdigest())
+            self.next_seq = segment.seq + 1
+        return self.chunker.pending()
+
+    def _restart(self):
+        """Rechunk from the first segment; summaries are kept for chunks whose text comes back."""
+        self.chunker = TokenChunker(self.max_tokens, self.overlap_tokens)
+        self.chunks = []
+        self.chunk_keys = []
+        self.next_seq = 0
+
+    def reset(self):
+        """Forget all chunks and summaries (e.g. when a new meeting starts)."""
+        self._restart()
+        self.chunk_summaries = {}
+
+
+# THIS IS FOR THE LIVE MEETING ANALYSIS (minutes, action items and open questions in one call)
+# Token budget of the new transcript lines sent with each analysis call
+ANALYSIS_CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "1500"))
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "600"))
+# Most recent minutes points repeated in the prompt, so the model adds to them instead of restating them
+ANALYSIS_CONTEXT_POINTS = int(os.getenv("ANALYSIS_CONTEXT_POINTS", "20"))
+
+# Expected shape of an analysis reply (see validate)
+ANALYSIS_SCHEMA = {
+    "minutes": [str],
+    "action_items": [{"task": str, "owner": (str, type(None)), "due": (str, type(None))}],
+    "open_questions": [str],
+}
+
+ANALYSIS_PROMPT = """You analyze a live meeting transcript as it arrives, a few new lines at a time.
+Reply with a JSON object with exactly these keys:
+"minutes": new minutes points from the new lines, in as few words as possible, without repeating earlier points;
+"action_items": tasks someone agreed or was asked to do in the new lines, as objects {"task": ..., "owner": ..., "due": ...}, with owner and due null when they were not said;
+"open_questions": questions raised in the new lines that the meeting has not answered.
+Use empty lists when there is nothing new."""
+
+
+def validate(value, schema, path="reply"):
+    """
+    Check a parsed JSON value against a schema: a type (or tuple of types),
+    [item schema] for a list, or {key: schema} for an object. Object keys
+    missing from the value count as null; keys not in the schema are dropped.
+    Returns the cleaned value, or raises ValueError naming the first mismatch.
+    """
+    if isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ValueError(f"{path} should be a list")
+        return [validate(item, schema[0], f"{path}[{i}]") for i, item in enumerate(value)]
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"{path} should be an object")
+        return {key: validate(value.get(key), item_schema, f"{path}.{key}") for key, item_schema in schema.items()}
+    if not isinstance(value, schema):
+        raise ValueError(f"{path} should be {getattr(schema, '__name__', schema)}, not {type(value).__name__}")
+    return value
+
+
+def normalize_task(task):
+    return " ".join(re.findall(r"[a-z0-9']+", task.lower()))
+
+
+def format_action_item(item):
+    """Markdown checklist line for an action item."""
+    details = ", ".join(f"{key}: {item[key]}" for key in ("owner", "due") if item[key])
+    return f"- [ ] {item['task']}" + (f" ({details})" if details else "")
+
+
+class MeetingAnalysis:
+    """
+    Live minutes, action items and open questions for one session, from one
+    structured call per update instead of a chain of summary calls.
+
+    Each update sends only the transcript segments added since the last one
+    (in chunks of at most ANALYSIS_CHUNK_TOKENS), together with the recent
+    minutes points and the known action items, and merges the validated
+    reply. A chunk whose reply fails to parse or validate is not marked as
+    analyzed, so it is sent again on the next update (past the response
+    cache, which would return the same bad reply).
+    """
+
+    def __init__(self, chunk_tokens=None, user=None):
+        self.chunk_tokens = chunk_tokens or ANALYSIS_CHUNK_TOKENS
+        self.user = user
+        self.reset()
+
+    def reset(self):
+        """Forget everything (e.g. when a new meeting starts)."""
+        self.next_seq = 0
+        self.failed = False
+        self.points = []
+        self.action_items = []
+        self.open_questions = []
+
+    def update(self, transcript):
+        """Analyze the segments added to transcript since the last update; returns the new open questions."""
+        if len(transcript) < self.next_seq:
+            self.reset()  # The transcript was replaced rather than extended
+        found = []
+        try:
+            for chunk in self._chunks(transcript.since(self.next_seq)):
+                reply = validate(json.loads(self._analyze("\n".join(s.to_context() for s in chunk))), ANALYSIS_SCHEMA)
+                found.extend(self._merge(reply))
+                self.next_seq = chunk[-1].seq + 1
+                self.failed = False
+        except Exception as e:
+            self.failed = True
+            print(f"Meeting analysis failed, will retry with the next update: {e}")
+        return found
+
+    def _chunks(self, segments):
+        chunk, tokens = [], 0
+        for segment in segments:
+            segment_tokens = estimate_tokens(segment.to_context())
+            if chunk and tokens + segment_tokens > self.chunk_tokens:
+                yield chunk
+                chunk, tokens = [], 0
+            chunk.append(segment)
+            tokens += segment_tokens
+        if chunk:
+            yield chunk
+
+    def _analyze(self, lines):
+        known = []
+        if self.points:
+            known.append("Earlier minutes points:\n" + "\n".join(f"- {p}" for p in self.points[-ANALYSIS_CONTEXT_POINTS:]))
+        if self.action_items:
+            known.append("Known action items:\n" + "\n".join(f"- {item['task']}" for item in self.action_items))
+        known.append(f"New transcript lines:\n{lines}")
+        return create_chat_completion([
+            {"role": "system", "content": ANALYSIS_PROMPT},
+            {"role": "user", "content": "\n\n".join(known)}
+        ], temperature=0.2, max_tokens=ANALYSIS_MAX_TOKENS, response_format={"type": "json_object"},
+            bypass_cache=self.failed, function="meeting_analysis", user=self.user)
+
+    def _merge(self, reply):
+        """Add a validated reply; an action item restating a known task updates it. Returns the new open questions."""
+        self.points.extend(point.strip() for point in reply["minutes"] if point.strip())
+        known = {normalize_task(item["task"]): item for item in self.action_items}
+        for item in reply["action_items"]:
+            key = normalize_task(item["task"])
+            if not key:
+                continue
+            if key in known:
+                known[key]["owner"] = item["owner"] or known[key]["owner"]
+                known[key]["due"] = item["due"] or known[key]["due"]
+            else:
+                known[key] = dict(item, task=item["task"].strip())
+                self.action_items.append(known[key])
+        questions = [q.strip() for q in reply["open_questions"] if q.strip() and q.strip() not in self.open_questions]
+        self.open_questions.extend(questions)
+        return questions
+
+    def render(self):
+        """The minutes as Markdown, with the action items and open questions."""
+        sections = []
+        if self.points:
+            sections.append("## Minutes\n" + "\n".join(f"* {point}" for point in self.points))
+        if self.action_items:
+            sections.append("## Action items\n" + "\n".join(format_action_item(item) for item in self.action_items))
+        if self.open_questions:
+            sections.append("## Open questions\n" + "\n".join(f"* {q}" for q in self.open_questions))
+        return "\n\n".join(sections) or "No valid summaries generated."
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache policy, overridable from the environment
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60)))
+# Set to an empty string to keep the cache in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("transcriptions", "llm_cache.sqlite3"))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def make_key(model, messages, params):
+    """Content hash of everything that determines a chat completion."""
+    payload = json.dumps({"model": model, "messages": messages, "params": params},
+                         sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache of LLM responses keyed by (model, messages, params).
+
+    Lookups go to an in-memory LRU first and then to an optional SQLite file,
+    which survives restarts. Entries older than `ttl` seconds are treated as
+    misses in both tiers. The SQLite file is only opened on first use.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, path=None, bypass=None, clock=time.time):
+        self.max_entries = LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = LLM_CACHE_TTL if ttl is None else ttl
+        self.path = LLM_CACHE_PATH if path is None else path
+        self.bypass = LLM_CACHE_BYPASS if bypass is None else bypass
+        self.clock = clock
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _connect(self):
+        """Open the on-disk tier (caller holds the lock)."""
+        if self.db is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+            self.db.execute("DELETE FROM responses WHERE created_at < ?", (self.clock() - self.ttl,))
+            self.db.commit()
+        return self.db
+
+    def _remember(self, key, value, created_at):
+        """Insert into the LRU tier, evicting the least recently used entry (caller holds the lock)."""
+        self.memory[key] = (value, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        with self.lock:
+            now = self.clock()
+            entry = self.memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[0]
+                del self.memory[key]
+                self.counters["expired"] += 1
+
+            db = self._connect()
+            if db is not None:
+                row = db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl:
+                        self._remember(key, row[0], row[1])
+                        self.counters["disk_hits"] += 1
+                        return row[0]
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+                    self.counters["expired"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        """Store value in both tiers."""
+        with self.lock:
+            created_at = self.clock()
+            self._remember(key, value, created_at)
+            db = self._connect()
+            if db is not None:
+                db.execute("INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                           (key, value, created_at))
+                db.commit()
+
+    def get_or_create(self, model, messages, params, create, bypass=False):
+        """Return the cached response for this request, calling create() on a miss."""
+        if bypass or self.bypass:
+            return create()
+        key = make_key(model, messages, params)
+        value = self.get(key)
+        if value is None:
+            value = create()
+            # Only successful responses are stored; exceptions propagate uncached
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters."""
+        with self.lock:
+            self.memory.clear()
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+            for name in self.counters:
+                self.counters[name] = 0
+
+    def stats(self):
+        """Snapshot of hit/miss counters and the number of resident entries."""
+        with self.lock:
+            return dict(self.counters, entries=len(self.memory))
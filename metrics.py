@@ -0,0 +1,220 @@
+import bisect
+import contextlib
+import math
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Recent durations kept per stage for percentiles
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "10000"))
+# Histogram bucket upper bounds (seconds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels, in Prometheus terms."""
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Bucketed distribution with labels; observe() is a bisect and three additions under a lock."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+        for key, counts, total, count in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket", labels + (("le", format_value(float(bound))),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    """
+    Metrics exposed on /metrics. Besides counters and histograms updated as
+    things happen, collectors registered with collector() are called at
+    scrape time for values that are cheaper to read than to track (queue
+    depths, cache sizes).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """collect() returns (name, kind, help, [(labels dict, value), ...]) tuples."""
+        self.collectors.append(collect)
+        return collect
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for collect in self.collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(sorted(labels.items()))} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram("live_ai_stage_seconds", "Duration of live pipeline stages", ("stage", "user"))
+llm_tokens = registry.counter("live_ai_llm_tokens_total", "Tokens used by chat completions", ("function", "kind", "user"))
+llm_calls = registry.counter("live_ai_llm_calls_total", "Chat completion requests by outcome", ("function", "outcome", "user"))
+socket_emits = registry.counter("live_ai_socket_emits_total", "Socket.IO updates pushed to browsers", ("event", "user"))
+
+
+class StageTimings:
+    """
+    Durations of the live pipeline's stages (recognizer, storage, LLM calls,
+    answers, minutes...). Counts and totals cover everything recorded;
+    percentiles cover the most recent METRICS_WINDOW durations of each stage.
+    When a histogram is given, every duration is also recorded there,
+    labelled with the stage and user.
+    """
+
+    def __init__(self, window=None, histogram=None):
+        self.window = window or METRICS_WINDOW
+        self.histogram = histogram
+        self.recent = {}
+        self.counts = {}
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, user=None):
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage, user=user or "")
+        with self.lock:
+            if stage not in self.recent:
+                self.recent[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+                self.totals[stage] = 0.0
+            self.recent[stage].append(seconds)
+            self.counts[stage] += 1
+            self.totals[stage] += seconds
+
+    @contextlib.contextmanager
+    def timed(self, stage, user=None):
+        """Record how long the with-block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, user)
+
+    def timed_iter(self, stage, iterable, user=None):
+        """Pass items through, recording how long each one took to arrive."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start, user)
+            yield item
+
+    def report(self):
+        """Per-stage count, total, mean, p50/p95/p99 and max (seconds)."""
+        with self.lock:
+            stages = {stage: (np.array(self.recent[stage]), self.counts[stage], self.totals[stage])
+                      for stage in self.recent}
+        report = {}
+        for stage, (recent, count, total) in sorted(stages.items()):
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+            report[stage] = {"count": count, "total": total, "mean": total / count,
+                             "p50": p50, "p95": p95, "p99": p99, "max": recent.max()}
+        return report
+
+    def reset(self):
+        with self.lock:
+            self.recent.clear()
+            self.counts.clear()
+            self.totals.clear()
+
+
+timings = StageTimings(histogram=stage_seconds)
+
+def format_report(report):
+    """Plain-text table of a timing report, in milliseconds."""
+    lines = [f"{'stage':<24}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'total s':>10}"]
+    for stage, row in report.items():
+        lines.append(f"{stage:<24}{row['count']:>8}" +
+                     "".join(f"{row[key] * 1000:>10.1f}" for key in ("mean", "p50", "p95", "p99", "max")) +
+                     f"{row['total']:>10.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Pipeline policy, overridable from the environment
+PIPELINE_MAX_DEPTH = int(os.getenv("PIPELINE_MAX_DEPTH", "32"))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+# What to do when the queue is full: "drop_oldest", "drop_newest" or "block"
+PIPELINE_OVERFLOW = os.getenv("PIPELINE_OVERFLOW", "drop_oldest")
+PIPELINE_BLOCK_TIMEOUT = float(os.getenv("PIPELINE_BLOCK_TIMEOUT", "0.5"))
+
+
+class Task:
+    __slots__ = ("fn", "args", "kwargs", "key", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs, key):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.enqueued_at = time.monotonic()
+
+
+class SessionPipeline:
+    """
+    Bounded background work queue for one user's session.
+
+    The speech-recognition loop only ever calls submit(), which never waits on
+    an LLM call. Tasks submitted with a key are coalesced: while a task with
+    the same key is still pending, a new submission replaces its arguments
+    instead of queueing a second copy, and two tasks with the same key never
+    run at the same time. When the queue is full the overflow policy decides
+    whether the oldest task, the new task, or the producer (for a bounded
+    time) gives way.
+    """
+
+    def __init__(self, name, max_depth=None, workers=None, overflow=None, block_timeout=None):
+        self.name = name
+        self.max_depth = max_depth or PIPELINE_MAX_DEPTH
+        self.overflow = overflow or PIPELINE_OVERFLOW
+        self.block_timeout = PIPELINE_BLOCK_TIMEOUT if block_timeout is None else block_timeout
+        self.tasks = deque()
+        self.pending_keys = {}
+        self.running_keys = set()
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "coalesced": 0}
+        self.threads = []
+        for i in range(workers or PIPELINE_WORKERS):
+            thread = threading.Thread(target=self._worker, name=f"pipeline-{name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, fn, *args, key=None, **kwargs):
+        """Queue fn(*args, **kwargs). Returns False if the task was dropped."""
+        with self.condition:
+            if self.stopping:
+                return False
+            self.counters["submitted"] += 1
+
+            if key is not None and key in self.pending_keys:
+                task = self.pending_keys[key]
+                task.fn, task.args, task.kwargs = fn, args, kwargs
+                self.counters["coalesced"] += 1
+                return True
+
+            if len(self.tasks) >= self.max_depth:
+                if self.overflow == "block":
+                    self.condition.wait_for(lambda: len(self.tasks) < self.max_depth or self.stopping,
+                                            timeout=self.block_timeout)
+                if len(self.tasks) >= self.max_depth or self.stopping:
+                    if self.overflow == "drop_oldest" and not self.stopping:
+                        self._forget(self.tasks.popleft())
+                        self.counters["dropped"] += 1
+                    else:
+                        self.counters["dropped"] += 1
+                        return False
+
+            task = Task(fn, args, kwargs, key)
+            self.tasks.append(task)
+            if key is not None:
+                self.pending_keys[key] = task
+            self.condition.notify()
+            return True
+
+    def _forget(self, task):
+        if task.key is not None and self.pending_keys.get(task.key) is task:
+            del self.pending_keys[task.key]
+
+    def _next_task(self):
+        """Pop the oldest task whose key is not already running (caller holds the lock)."""
+        for task in self.tasks:
+            if task.key is None or task.key not in self.running_keys:
+                self.tasks.remove(task)
+                self._forget(task)
+                return task
+        return None
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                task = self._next_task()
+                while task is None:
+                    if self.stopping and not self.tasks:
+                        return
+                    self.condition.wait()
+                    task = self._next_task()
+                if task.key is not None:
+                    self.running_keys.add(task.key)
+                # A slot was freed for producers waiting under the "block" policy
+                self.condition.notify_all()
+
+            try:
+                task.fn(*task.args, **task.kwargs)
+                outcome = "completed"
+            except Exception as e:
+                print(f"Pipeline task failed for {self.name}: {e}")
+                outcome = "failed"
+
+            with self.condition:
+                self.counters[outcome] += 1
+                if task.key is not None:
+                    self.running_keys.discard(task.key)
+                self.condition.notify_all()
+
+    def depth(self):
+        """Number of tasks waiting to run."""
+        with self.condition:
+            return len(self.tasks)
+
+    def stats(self):
+        """Snapshot of queue depth and task counters."""
+        with self.condition:
+            return dict(self.counters, depth=len(self.tasks), running=len(self.running_keys))
+
+    def stop(self, drain=True, timeout=None):
+        """Stop accepting work; by default let the queued tasks finish first."""
+        with self.condition:
+            self.stopping = True
+            if not drain:
+                self.counters["dropped"] += len(self.tasks)
+                self.tasks.clear()
+                self.pending_keys.clear()
+            self.condition.notify_all()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+
+class CoalescingScheduler:
+    """
+    Debounced, coalescing trigger for an expensive regeneration callback.
+
+    request() marks the output as stale; the callback then runs on the
+    scheduler's own thread, so at most one run is ever in flight. A burst of
+    requests collapses into one run that starts once the requests have been
+    quiet for `debounce` seconds, but never later than `max_staleness` after
+    the first unserved request and never sooner than `min_interval` after the
+    previous run started. Requests that arrive while a run is in flight cause
+    exactly one trailing run afterwards.
+    """
+
+    def __init__(self, name, callback, min_interval, debounce, max_staleness):
+        self.name = name
+        self.callback = callback
+        self.min_interval = min_interval
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self.condition = threading.Condition()
+        self.dirty = False
+        self.first_pending = None
+        self.last_request = None
+        self.last_start = None
+        self.in_flight = False
+        self.stopping = False
+        self.flush_requested = False
+        self.thread = None
+        self.counters = {"requested": 0, "runs": 0, "failed": 0}
+
+    def request(self):
+        """Mark the output stale; the callback will run according to the policy."""
+        with self.condition:
+            if self.stopping:
+                return
+            now = time.monotonic()
+            self.counters["requested"] += 1
+            if not self.dirty:
+                self.dirty = True
+                self.first_pending = now
+            self.last_request = now
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name=f"scheduler-{self.name}", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _due_time(self):
+        due = min(self.last_request + self.debounce, self.first_pending + self.max_staleness)
+        if self.last_start is not None:
+            due = max(due, self.last_start + self.min_interval)
+        return due
+
+    def _loop(self):
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    if self.dirty and (self.flush_requested or now >= self._due_time()):
+                        break
+                    if self.stopping:
+                        self.thread = None
+                        return
+                    self.condition.wait(self._due_time() - now if self.dirty else None)
+                self.dirty = False
+                self.first_pending = None
+                self.last_start = time.monotonic()
+                self.in_flight = True
+                self.counters["runs"] += 1
+
+            try:
+                self.callback()
+            except Exception as e:
+                print(f"Scheduled run failed for {self.name}: {e}")
+                with self.condition:
+                    self.counters["failed"] += 1
+            finally:
+                with self.condition:
+                    self.in_flight = False
+
+    def stats(self):
+        """Snapshot of request/run counters and whether output is stale."""
+        with self.condition:
+            return dict(self.counters, pending=self.dirty, in_flight=self.in_flight)
+
+    def stop(self, flush=True, timeout=None):
+        """Stop scheduling; with flush, a pending request runs immediately first."""
+        with self.condition:
+            self.stopping = True
+            self.flush_requested = flush
+            thread = self.thread
+            self.condition.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+
+class QAStore:
+    """
+    Append-only JSON Lines log of question/answer entries for one session.
+
+    Each entry is written with a single O_APPEND write, so concurrent writers
+    never interleave and readers never see a rewritten file. The byte offset
+    of every complete line is kept in memory, which makes counting and
+    reading the entries after a cursor cheap; a line that is still being
+    written is simply not indexed until its newline arrives.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = []
+        self.indexed = 0
+        self.lock = threading.Lock()
+
+    def append(self, item):
+        """Append one entry; returns the number of entries after it."""
+        data = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self._refresh()
+            return len(self.offsets)
+
+    def clear(self):
+        """Remove every entry (a new session is starting)."""
+        with self.lock:
+            with open(self.path, "wb"):
+                pass
+            self.offsets = []
+            self.indexed = 0
+
+    def _refresh(self):
+        """Index lines appended since the last look (caller holds the lock)."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size < self.indexed:
+            # The file was truncated behind our back; start over
+            self.offsets = []
+            self.indexed = 0
+        if size == self.indexed:
+            return
+        with open(self.path, "rb") as file:
+            file.seek(self.indexed)
+            data = file.read(size - self.indexed)
+        position = 0
+        while True:
+            end = data.find(b"\n", position)
+            if end < 0:
+                break
+            self.offsets.append(self.indexed + position)
+            position = end + 1
+        self.indexed += position
+
+    def count(self):
+        """Number of complete entries."""
+        with self.lock:
+            self._refresh()
+            return len(self.offsets)
+
+    def _read(self, indices):
+        """Load the entries at the given positions, in the order given (caller holds the lock)."""
+        entries = []
+        with open(self.path, "rb") as file:
+            for i in indices:
+                file.seek(self.offsets[i])
+                entries.append(json.loads(file.readline()))
+        return entries
+
+    def since(self, cursor=0):
+        """Entries added after the first `cursor` ones, newest first, plus the new cursor."""
+        with self.lock:
+            self._refresh()
+            count = len(self.offsets)
+            if not 0 <= cursor <= count:
+                cursor = 0
+            return self._read(range(count - 1, cursor - 1, -1)), count
+
+
+
+stores = {}
+stores_lock = threading.Lock()
+
+def get_store(path):
+    """Shared QAStore for path, so the writer and HTTP readers use the same index."""
+    path = os.path.abspath(path)
+    with stores_lock:
+        if path not in stores:
+            stores[path] = QAStore(path)
+        return stores[path]
@@ -0,0 +1,98 @@
+import os
+import re
+import threading
+from collections import deque
+from retrieval import STOPWORDS
+
+# Questions sharing at least this fraction of their terms (Jaccard) with an earlier one are restatements
+QA_DEDUPE_SIMILARITY = float(os.getenv("QA_DEDUPE_SIMILARITY", "0.8"))
+# Most questions answered by one batched LLM call
+QA_BATCH_MAX = int(os.getenv("QA_BATCH_MAX", "5"))
+# What a question asks about; retrieval drops these as stopwords, but "When is the demo?" and
+# "Where is the demo?" are different questions
+QUESTION_WORDS = frozenset("what when where which who whom whose why how".split())
+QUESTION_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+
+def question_terms(question):
+    """Word terms of a question for spotting restatements: stopwords aside, but keeping the question words."""
+    return frozenset(term for term in re.findall(r"[a-z0-9']+", question.lower()) if term not in QUESTION_STOPWORDS)
+
+
+def normalize_question(question):
+    """Lowercased words of a question, without punctuation or extra spaces."""
+    return " ".join(re.findall(r"[a-z0-9']+", question.lower()))
+
+
+class PendingQuestion:
+    __slots__ = ("text", "timestamp", "detected_at")
+
+    def __init__(self, text, timestamp, detected_at):
+        self.text = text
+        self.timestamp = timestamp
+        self.detected_at = detected_at
+
+
+class QuestionQueue:
+    """
+    Questions detected in one session, waiting to be answered.
+
+    add() skips a question that restates one already asked this session:
+    the same words once normalized, or mostly the same terms (stopwords
+    aside, so "Can we ship on Friday?" and "So can we ship it Friday?" match).
+    Questions asking different things ("When...?" and "Where...?") never match.
+    take() hands out the pending questions in batches of up to `batch_max`,
+    to be answered together.
+    """
+
+    def __init__(self, similarity=None, batch_max=None):
+        self.similarity = QA_DEDUPE_SIMILARITY if similarity is None else similarity
+        self.batch_max = batch_max or QA_BATCH_MAX
+        self.seen = set()
+        self.seen_terms = []
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.counters = {"added": 0, "duplicates": 0, "batches": 0}
+
+    def _is_duplicate(self, normalized, terms):
+        """Whether a question was already asked (caller holds the lock)."""
+        if normalized in self.seen:
+            return True
+        if not terms:
+            return False
+        asks = terms & QUESTION_WORDS
+        for seen in self.seen_terms:
+            if asks == seen & QUESTION_WORDS and len(terms & seen) >= self.similarity * len(terms | seen):
+                return True
+        return False
+
+    def add(self, question, timestamp="00:00", detected_at=None):
+        """Queue a question unless it restates an earlier one; returns whether it was queued."""
+        normalized = normalize_question(question)
+        terms = question_terms(question)
+        with self.lock:
+            if self._is_duplicate(normalized, terms):
+                self.counters["duplicates"] += 1
+                return False
+            self.seen.add(normalized)
+            if terms:
+                self.seen_terms.append(terms)
+            self.pending.append(PendingQuestion(question, timestamp, detected_at))
+            self.counters["added"] += 1
+            return True
+
+    def take(self):
+        """The oldest pending questions, up to batch_max (empty when there are none)."""
+        with self.lock:
+            batch = [self.pending.popleft() for _ in range(min(self.batch_max, len(self.pending)))]
+            if batch:
+                self.counters["batches"] += 1
+            return batch
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=len(self.pending))
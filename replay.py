@@ -0,0 +1,124 @@
+"""
+Replay a recorded meeting through the live transcription pipeline.
+
+The input is a WAV/FLAC recording (recognized by Google Cloud Speech, or by
+the scripted recognizer when --script gives its transcript) or a transcript
+script on its own (JSON Lines, a saved transcript or plain text). It goes
+through the same code as a live session: audio capture, voice-activity gate,
+stream rollover, process_responses, storage, Q&A, minutes and socket events.
+Audio is fed at real time (--speed 1), N times faster (--speed N) or as fast
+as the pipeline takes it (--speed max). A per-stage timing report is printed
+at the end.
+
+Usage: python replay.py meeting.wav [--script transcript.txt] [--speed max] [--user-dir DIR] [--json report.json]
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from app import app  # noqa: F401 -- sets up Socket.IO so updates are emitted exactly as in the server
+import speech_utils
+from audio_capture import AUDIO_RATE, tone
+from metrics import timings, format_report
+from speech_backends import GoogleRecognizer, ScriptedRecognizer, SignalSource, load_script
+from storage import get_storage
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg")
+
+
+def read_audio(path, rate):
+    """Mono int16 samples of an audio file at the given rate."""
+    import soundfile as sf
+    data, file_rate = sf.read(path, dtype="float32", always_2d=True)
+    samples = data.mean(axis=1)
+    if file_rate != rate:
+        times = np.arange(int(len(samples) * rate / file_rate)) / rate
+        samples = np.interp(times, np.arange(len(samples)) / file_rate, samples)
+    return (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+
+
+def wait_for(worker, timeout):
+    """Join a pipeline's or scheduler's background work."""
+    if worker is not None:
+        worker.stop(timeout=timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="WAV/FLAC recording or transcript script")
+    parser.add_argument("--script", help="transcript of the recording, replayed instead of calling Google")
+    parser.add_argument("--speed", default="1", help="playback speed factor, or 'max'")
+    parser.add_argument("--user-dir", help="where to store the replayed session (default transcriptions/replay/<name>)")
+    parser.add_argument("--drain-timeout", type=float, default=120, help="seconds to wait for pending answers and minutes")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    realtime = args.speed != "max"
+    speed = float(args.speed) if realtime else 1.0
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    user_dir = args.user_dir or os.path.join("transcriptions", "replay", name)
+    os.makedirs(user_dir, exist_ok=True)
+
+    if args.input.lower().endswith(AUDIO_EXTENSIONS):
+        samples = read_audio(args.input, AUDIO_RATE)
+        if args.script:
+            recognizer = ScriptedRecognizer(load_script(args.script), rate=AUDIO_RATE)
+            # Script times are positions in the recording, so the scripted recognizer must hear all of it
+            speech_utils.VAD_ENABLED = False
+        else:
+            recognizer = GoogleRecognizer(AUDIO_RATE)
+            if not realtime or speed > 1:
+                print("Note: Google Cloud Speech may reject audio streamed faster than real time.")
+    else:
+        recognizer = ScriptedRecognizer(load_script(args.input), rate=AUDIO_RATE)
+        samples = tone(recognizer.duration() + 1, rate=AUDIO_RATE)
+    source = SignalSource(samples, realtime=realtime, speed=speed)
+    audio_seconds = len(samples) / AUDIO_RATE
+
+    get_storage(user_dir).reset()
+    timings.reset()
+    started = time.perf_counter()
+    speech_utils.transcribe_streaming(user_dir, recognizer, source)
+    streamed = time.perf_counter()
+    speech_utils.stop_transcription(user_dir)
+    state = speech_utils.get_user_state(user_dir)
+    # Let queued answers and the final minutes update finish before reporting
+    wait_for(state.pipeline, args.drain_timeout)
+    wait_for(state.minutes_scheduler, args.drain_timeout)
+    finished = time.perf_counter()
+
+    storage = get_storage(user_dir)
+    report = {
+        "input": args.input,
+        "speed": args.speed,
+        "audio_seconds": audio_seconds,
+        "stream_seconds": streamed - started,
+        "wall_seconds": finished - started,
+        "speedup": audio_seconds / (streamed - started),
+        "segments": len(storage.read_segments(0)[0]),
+        "questions": len(storage.read_qa(0)[0]),
+        "capture": state.capture.stats(),
+        "streams": state.rollover.stats(),
+        "vad": state.vad.stats() if state.vad is not None else None,
+        "stages": timings.report(),
+    }
+
+    print()
+    print(f"Replayed {audio_seconds:.1f}s of audio in {report['stream_seconds']:.1f}s "
+          f"({report['speedup']:.1f}x), {report['wall_seconds']:.1f}s including pending LLM work")
+    print(f"Segments: {report['segments']}, questions answered: {report['questions']}, output in {user_dir}")
+    print(f"Streams: {report['streams']}")
+    if report["vad"]:
+        print(f"Voice activity gate: {report['vad']}")
+    print()
+    print(format_report(report["stages"]))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import re
+import math
+import sys
+import threading
+import numpy as np
+from gpt_utils import estimate_tokens
+
+# Prompt context policy, overridable from the environment
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1500"))
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "8"))
+CONTEXT_TAIL_LINES = int(os.getenv("CONTEXT_TAIL_LINES", "10"))
+# Most recent lines searched for context; older ones are forgotten to bound the index's memory
+CONTEXT_INDEX_LINES = int(os.getenv("CONTEXT_INDEX_LINES", "10000"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from had has have he her his how i if in
+is it its just me my of on or our she so that the their them then there they this to was we were
+what when where which who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercased word terms of text, without stopwords."""
+    return [term for term in re.findall(r"[a-z0-9']+", text.lower()) if term not in STOPWORDS]
+
+
+class Postings:
+    """Growable arrays of (line id, term frequency) for one term."""
+    __slots__ = ("ids", "tfs", "size")
+
+    def __init__(self):
+        self.ids = np.empty(4, dtype=np.int32)
+        self.tfs = np.empty(4, dtype=np.float32)
+        self.size = 0
+
+    def append(self, line_id, tf):
+        if self.size == len(self.ids):
+            self.ids = np.resize(self.ids, self.size * 2)
+            self.tfs = np.resize(self.tfs, self.size * 2)
+        self.ids[self.size] = line_id
+        self.tfs[self.size] = tf
+        self.size += 1
+
+
+class TranscriptIndex:
+    """
+    Incremental BM25 index over one session's transcript lines.
+
+    add() indexes a line as it arrives; search() scores every line containing
+    a query term with NumPy array operations; build_context() turns the best
+    matches plus the most recent lines into a prompt context that stays under
+    a fixed token budget however long the meeting gets.
+
+    At most `max_lines` lines are searchable; past that the oldest are
+    forgotten a quarter at a time, so the index stops growing. Line ids keep
+    counting from the first line ever added. With `resolve`, the index keeps
+    no copy of the lines: resolve(line ids) returns the context lines for the
+    ids (sorted) when a context is built.
+    """
+
+    def __init__(self, resolve=None, max_lines=None):
+        self.resolve = resolve
+        self.max_lines = max_lines or CONTEXT_INDEX_LINES
+        self.lines = []
+        self.base = 0  # Id of the oldest line still indexed
+        self.count = 0  # Lines ever added (the next line's id)
+        self.postings = {}
+        self.lengths = np.empty(64, dtype=np.float32)
+        self.tokens = np.empty(64, dtype=np.int32)
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, text, line=None):
+        """Index text and store line (defaults to text) as what the context shows. Returns the line id."""
+        terms = tokenize(text)
+        line = text if line is None else line
+        with self.lock:
+            line_id = self.count
+            position = line_id - self.base
+            if position == len(self.lengths):
+                self.lengths = np.resize(self.lengths, position * 2)
+                self.tokens = np.resize(self.tokens, position * 2)
+            if self.resolve is None:
+                self.lines.append(line)
+            self.count += 1
+            self.lengths[position] = len(terms)
+            self.tokens[position] = estimate_tokens(line)
+            self.total_length += len(terms)
+
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = Postings()
+                postings.append(line_id, tf)
+            if self.count - self.base > self.max_lines:
+                self._forget(self.count - self.base - self.max_lines * 3 // 4)
+            return line_id
+
+    def _forget(self, count):
+        """Stop indexing the oldest count lines (caller holds the lock)."""
+        indexed = self.count - self.base
+        self.total_length -= int(self.lengths[:count].sum())
+        self.lengths[:indexed - count] = self.lengths[count:indexed]
+        self.tokens[:indexed - count] = self.tokens[count:indexed]
+        del self.lines[:count]
+        self.base += count
+        for term, postings in list(self.postings.items()):
+            # Ids are appended in order, so the forgotten lines are a prefix
+            dropped = int(np.searchsorted(postings.ids[:postings.size], self.base))
+            if dropped == postings.size:
+                del self.postings[term]
+            elif dropped:
+                kept = postings.size - dropped
+                postings.ids[:kept] = postings.ids[dropped:postings.size]
+                postings.tfs[:kept] = postings.tfs[dropped:postings.size]
+                postings.size = kept
+
+    def memory_bytes(self):
+        """Approximate memory held by the indexed lines, postings and per-line arrays."""
+        with self.lock:
+            return (self.lengths.nbytes + self.tokens.nbytes + sys.getsizeof(self.postings) +
+                    sum(sys.getsizeof(line) for line in self.lines) +
+                    sum(sys.getsizeof(p) + p.ids.nbytes + p.tfs.nbytes for p in self.postings.values()))
+
+    def search(self, query, k=None):
+        """Return up to k (line id, score) pairs, best first, for lines matching the query."""
+        k = k or CONTEXT_TOP_K
+        with self.lock:
+            base = self.base
+            count = self.count - base
+            if not count:
+                return []
+            lengths = self.lengths[:count]
+            average = max(self.total_length / count, 1.0)
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+            scores = np.zeros(count, dtype=np.float32)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                positions = postings.ids[:postings.size] - base
+                tfs = postings.tfs[:postings.size]
+                idf = math.log(1 + (count - postings.size + 0.5) / (postings.size + 0.5))
+                scores[positions] += idf * tfs * (BM25_K1 + 1) / (tfs + norms[positions])
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        ranked = sorted(matches.tolist(), key=lambda i: (-scores[i], -i))
+        return [(base + i, float(scores[i])) for i in ranked]
+
+    def build_context(self, query, max_tokens=None, top_k=None, tail_lines=None):
+        """
+        Prompt context for query: the most recent lines (up to half the budget)
+        plus the top-k relevant lines, in transcript order, within max_tokens.
+        """
+        max_tokens = max_tokens or CONTEXT_TOKENS
+        tail_lines = CONTEXT_TAIL_LINES if tail_lines is None else tail_lines
+        hits = self.search(query, top_k)
+        with self.lock:
+            base, count = self.base, self.count
+            selected = set()
+            used = 0
+            for i in range(count - 1, max(count - tail_lines, base) - 1, -1):
+                if used + self.tokens[i - base] > max_tokens // 2:
+                    break
+                selected.add(i)
+                used += int(self.tokens[i - base])
+            for i, _ in hits:
+                if i in selected or i < base:  # Already shown, or forgotten since the search
+                    continue
+                if used + self.tokens[i - base] > max_tokens:
+                    continue
+                selected.add(i)
+                used += int(self.tokens[i - base])
+
+            ids = sorted(selected)
+            lines = [self.lines[i - base] for i in ids] if self.resolve is None else None
+        if lines is None:
+            lines = self.resolve(ids)
+
+        parts = []
+        previous = -1
+        for i, line in zip(ids, lines):
+            if i != previous + 1:
+                parts.append("...")
+            parts.append(line)
+            previous = i
+        return "\n".join(parts)
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Session states idle this long (seconds) are dropped; their data stays in storage
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(60 * 60)))
+# Most session states kept in memory; the least recently used idle ones go first
+SESSION_MAX_STATES = int(os.getenv("SESSION_MAX_STATES", "256"))
+
+
+class SessionRegistry:
+    """
+    In-memory per-user session states, created on first use.
+
+    Every get() marks a state as used. States unused for `ttl` seconds, and
+    the least recently used ones beyond `max_states`, are evicted, but only
+    while is_idle(state) says so: a meeting that is still live, or still has
+    answers or minutes being generated, is never dropped. An evicted user
+    just gets a fresh state on their next request; everything that outlives
+    a meeting is in storage.
+    """
+
+    def __init__(self, factory, is_idle, ttl=None, max_states=None, clock=time.monotonic):
+        self.factory = factory
+        self.is_idle = is_idle
+        self.ttl = SESSION_IDLE_TTL if ttl is None else ttl
+        self.max_states = max_states or SESSION_MAX_STATES
+        self.clock = clock
+        self.states = OrderedDict()  # key -> (state, last used), least recently used first
+        self.lock = threading.Lock()
+        self.counters = {"created": 0, "evicted": 0}
+
+    def get(self, key):
+        """The state for key, created if needed."""
+        with self.lock:
+            now = self.clock()
+            entry = self.states.get(key)
+            if entry is None:
+                state = self.factory(key)
+                self.counters["created"] += 1
+            else:
+                state = entry[0]
+            self.states[key] = (state, now)
+            self.states.move_to_end(key)
+            self._evict(now)
+            return state
+
+    def _evict(self, now):
+        """Drop expired and over-capacity idle states, oldest first (caller holds the lock)."""
+        excess = len(self.states) - self.max_states
+        if excess <= 0 and now - next(iter(self.states.values()))[1] < self.ttl:
+            return  # Nothing over capacity and even the least recently used state is fresh
+        for key, (state, last_used) in list(self.states.items())[:-1]:
+            if excess <= 0 and now - last_used < self.ttl:
+                break  # Everything after this was used more recently
+            if self.is_idle(state):
+                del self.states[key]
+                self.counters["evicted"] += 1
+                excess -= 1
+
+    def items(self):
+        """Snapshot of (key, state) pairs."""
+        with self.lock:
+            return [(key, state) for key, (state, _) in self.states.items()]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.states
+
+    def __len__(self):
+        with self.lock:
+            return len(self.states)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, states=len(self.states))
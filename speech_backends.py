@@ -0,0 +1,218 @@
+import abc
+import contextlib
+import json
+import os
+import threading
+import time
+import types
+import datetime
+from audio_capture import AUDIO_RATE, SyntheticSource, open_microphone, tone
+from transcript import Segment
+
+# "google" streams to Google Cloud Speech from the microphone; "fake" replays a script offline
+SPEECH_BACKEND = os.getenv("SPEECH_BACKEND", "google")
+SPEECH_LANGUAGE = os.getenv("SPEECH_LANGUAGE", "en-US")
+# Script replayed by the fake backend (JSON Lines or a saved transcript); a short demo when unset
+SPEECH_FAKE_SCRIPT = os.getenv("SPEECH_FAKE_SCRIPT", "")
+# Seconds the fake recognizer waits before delivering each result
+SPEECH_FAKE_LATENCY = float(os.getenv("SPEECH_FAKE_LATENCY", "0"))
+# Speaking rate assumed for script lines without times
+WORDS_PER_SECOND = 2.5
+
+DEMO_SCRIPT = [
+    {"at": 3.0, "text": "Good morning everyone, let's get started with the weekly sync."},
+    {"at": 7.0, "text": "The release candidate passed all the integration tests yesterday."},
+    {"at": 10.5, "text": "Can we ship it on Friday?"},
+    {"at": 14.0, "text": "Maria will update the deployment checklist before then."},
+]
+
+
+class Recognizer(abc.ABC):
+    """
+    Streaming speech recognizer. stream() takes an iterator of 16-bit PCM
+    audio chunks (bytes) and returns an iterator of responses shaped like
+    Google's: response.results[i].is_final, .alternatives[0].transcript,
+    .alternatives[0].confidence and .result_end_time (offset in the stream).
+    """
+
+    @abc.abstractmethod
+    def stream(self, chunks):
+        """Responses for the audio chunks, as they are recognized."""
+
+
+class AudioSource(abc.ABC):
+    """Where session audio comes from. open(capture) is a context manager that fills the capture while open."""
+
+    @abc.abstractmethod
+    def open(self, capture):
+        """Context manager that fills capture with audio while open."""
+
+
+speech_client = None
+speech_client_lock = threading.Lock()
+
+def get_speech_client():
+    """
+    The process's Google SpeechClient. Its gRPC channel multiplexes every
+    session's streams, so sessions share one connection instead of each
+    opening (and authenticating) its own.
+    """
+    global speech_client
+    with speech_client_lock:
+        if speech_client is None:
+            from google.cloud import speech
+            speech_client = speech.SpeechClient()
+        return speech_client
+
+
+class GoogleRecognizer(Recognizer):
+    """Google Cloud Speech streaming recognition."""
+
+    def __init__(self, rate=None, language=None):
+        from google.cloud import speech
+        self.speech = speech
+        self.client = get_speech_client()
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=rate or AUDIO_RATE,
+            language_code=language or SPEECH_LANGUAGE,
+            enable_automatic_punctuation=True
+        )
+        self.streaming_config = speech.StreamingRecognitionConfig(config=config)
+
+    def stream(self, chunks):
+        requests = (self.speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in chunks)
+        return self.client.streaming_recognize(self.streaming_config, requests)
+
+
+class MicrophoneSource(AudioSource):
+    """The default input device."""
+
+    def __init__(self, device=None):
+        self.device = device
+
+    def open(self, capture):
+        return open_microphone(capture, device=self.device)
+
+
+class SignalSource(AudioSource):
+    """
+    Prepared samples fed like a device would, `speed` times real time (as
+    fast as they are consumed when realtime=False); the session ends with them.
+    """
+
+    def __init__(self, samples, realtime=True, speed=1.0):
+        self.samples = samples
+        self.realtime = realtime
+        self.speed = speed
+
+    @contextlib.contextmanager
+    def open(self, capture):
+        source = SyntheticSource(self.samples, realtime=self.realtime, speed=self.speed)
+        source.start(capture)
+        try:
+            yield source
+        finally:
+            source.stop()
+
+
+def fake_result(text, end, is_final=True, confidence=0.9):
+    """A recognition result shaped like the Google client's."""
+    return types.SimpleNamespace(
+        is_final=is_final,
+        result_end_time=datetime.timedelta(seconds=end),
+        alternatives=[types.SimpleNamespace(transcript=text, confidence=confidence)],
+    )
+
+
+class ScriptedRecognizer(Recognizer):
+    """
+    Deterministic offline recognizer. Each script entry ({"at": seconds,
+    "text": ..., "confidence": ...}) becomes a final result once `at` seconds
+    of audio have been received, optionally preceded by an interim result
+    halfway there. Timing follows the audio, so the source decides how fast
+    the script plays; `latency` adds a delay before each response. The
+    script position carries across streams, so stream rollover works as with
+    a real service (replayed audio is counted again, as a service would hear it).
+    With `audio_timeout`, a stream fails like the service's "Audio Timeout"
+    when that many seconds pass between two chunks.
+    """
+
+    def __init__(self, script, rate=None, latency=None, interim=True, audio_timeout=None):
+        self.rate = rate or AUDIO_RATE
+        self.latency = SPEECH_FAKE_LATENCY if latency is None else latency
+        self.audio_timeout = audio_timeout
+        self.timeouts = 0
+        self.events = []
+        previous = 0.0
+        for entry in sorted(script, key=lambda e: e["at"]):
+            words = entry["text"].split()
+            if interim and len(words) > 1:
+                self.events.append(((previous + entry["at"]) / 2, " ".join(words[:len(words) // 2]), False, 0.0))
+            self.events.append((entry["at"], entry["text"], True, entry.get("confidence", 0.9)))
+            previous = entry["at"]
+        self.next_event = 0
+        self.received = 0  # Samples heard across all streams
+
+    def duration(self):
+        """Seconds of audio needed to deliver the whole script."""
+        return self.events[-1][0] if self.events else 0.0
+
+    def stream(self, chunks):
+        stream_samples = 0
+        last = time.monotonic()
+        for chunk in chunks:
+            now = time.monotonic()
+            if self.audio_timeout is not None and now - last > self.audio_timeout:
+                self.timeouts += 1
+                raise RuntimeError("Audio Timeout Error: Long duration elapsed without audio")
+            last = now
+            samples = len(chunk) // 2
+            self.received += samples
+            stream_samples += samples
+            while self.next_event < len(self.events) and self.events[self.next_event][0] * self.rate <= self.received:
+                _, text, is_final, confidence = self.events[self.next_event]
+                self.next_event += 1
+                if self.latency:
+                    time.sleep(self.latency)
+                yield types.SimpleNamespace(results=[fake_result(text, stream_samples / self.rate, is_final, confidence)])
+
+
+def load_script(path):
+    """
+    Script entries from a file: JSON Lines ({"at", "text"[, "confidence"]}),
+    a saved transcript (legacy lines with time stamps) or plain text, one
+    utterance per line. Lines without times are spaced by their word count.
+    """
+    entries = []
+    clock = 0.0
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+            else:
+                segment = Segment.from_line(line)
+                entry = {"text": segment.text, "confidence": segment.confidence or 0.9}
+                if segment.end:
+                    entry["at"] = segment.end
+            if "at" not in entry:
+                entry["at"] = clock + max(1.0, len(entry["text"].split()) / WORDS_PER_SECOND)
+            # Keep times increasing even where stamps only have one-second resolution
+            entry["at"] = max(float(entry["at"]), clock + 0.1)
+            clock = entry["at"]
+            entries.append(entry)
+    return entries
+
+
+def create_backend(rate=None):
+    """Recognizer and audio source for a new session, chosen by SPEECH_BACKEND."""
+    rate = rate or AUDIO_RATE
+    if SPEECH_BACKEND == "fake":
+        script = load_script(SPEECH_FAKE_SCRIPT) if SPEECH_FAKE_SCRIPT else DEMO_SCRIPT
+        recognizer = ScriptedRecognizer(script, rate=rate)
+        # A steady tone so the voice-activity gate passes everything; a second of tail flushes the last result
+        return recognizer, SignalSource(tone(recognizer.duration() + 1, rate=rate))
+    return GoogleRecognizer(rate), MicrophoneSource()
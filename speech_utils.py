@@ -1,74 +1,164 @@
-import sounddevice as sd
-from google.cloud import speech
 import os
+import random
 import re
-from gpt_utils import generate_meeting_minutes
-import json
-from events import notify_frontend_update
+from gpt_utils import IncrementalMinutes, MeetingAnalysis
+from events import notify_frontend_update, user_room
 import threading
 import time
-from gpt_utils import get_gpt_response
+from gpt_utils import answer_questions
+from pipeline import SessionPipeline, CoalescingScheduler
+from retrieval import TranscriptIndex
+from storage import get_storage
+from audio_capture import AudioCapture
+from speech_backends import create_backend, MicrophoneSource
+from vad import VADGate, VAD_ENABLED
+from streaming import StreamRollover
+from transcript import Transcript
+from sessions import SessionRegistry
+from questions import QuestionQueue
+from extractive import ExtractiveSummarizer, format_summary, EXTRACTIVE_RECENT_SENTENCES
+from metrics import timings, registry
+import gpt_utils
 
 # Set start method for multiprocessing
 if __name__ == "__main__":
     os.set_start_method("spawn")
 
+# LLM minutes regeneration policy (seconds). Lines arriving in a burst are coalesced
+# into one regeneration once they have been quiet for MINUTES_DEBOUNCE, but the
+# minutes are never more than MINUTES_MAX_STALENESS behind the first new line,
+# and two regenerations never start closer together than MINUTES_MIN_INTERVAL
+# (which wins if it is larger than MINUTES_MAX_STALENESS). Between regenerations
+# the published minutes are kept current by the extractive summary.
+MINUTES_MIN_INTERVAL = float(os.getenv("MINUTES_MIN_INTERVAL", "60"))
+MINUTES_DEBOUNCE = float(os.getenv("MINUTES_DEBOUNCE", "1.5"))
+MINUTES_MAX_STALENESS = float(os.getenv("MINUTES_MAX_STALENESS", "15"))
+# Each regeneration is one structured "meeting analysis" call producing minutes, action
+# items and open questions; set to 0 for minutes from chunk summaries only
+MEETING_ANALYSIS_ENABLED = os.getenv("MEETING_ANALYSIS_ENABLED", "1") != "0"
+# Seconds a new session waits for the previous one's transcription loop, queued answers
+# and last minutes update before its data is reset; whatever is still queued then is dropped
+SESSION_STOP_TIMEOUT = float(os.getenv("SESSION_STOP_TIMEOUT", "45"))
+# Wait before reconnecting after a recognizer stream fails (full jitter, doubling per
+# consecutive failure up to the max); a stream that delivered final results resets it
+STREAM_BACKOFF_BASE = float(os.getenv("STREAM_BACKOFF_BASE", "0.5"))
+STREAM_BACKOFF_MAX = float(os.getenv("STREAM_BACKOFF_MAX", "10"))
+
 # Global variables for in-memory transcription
 class TranscriptionState:
-    def __init__(self):
-        self.transcriptions = []
-        self.recent_transcriptions = []
-        self.last_saved_segment = ""
+    def __init__(self, user_dir):
+        self.user_dir = user_dir
         self.should_continue = threading.Event()
+        self.loop_done = threading.Event()  # Cleared while transcribe_streaming runs
+        self.loop_done.set()
         self.start_time = None
+        self.minutes_lock = threading.Lock()
+        self.new_meeting()
+        self.pipeline = None
+        self.minutes_scheduler = None
+        self.capture = None
+        self.vad = None
+        self.rollover = None
+
+    def new_meeting(self):
+        """Fresh transcript, index and minutes (the stored session data was just reset)."""
+        # Segments beyond the resident cap are read back from the stored transcript
+        self.transcript = Transcript(loader=lambda start, end: get_storage(self.user_dir).read_segment_range(start, end))
+        # The index resolves context lines through the transcript rather than keeping its own copy
+        self.index = TranscriptIndex(resolve=lambda seqs: [s.to_context() for s in self.transcript.lookup(seqs)])
+        self.minutes = IncrementalMinutes(user=user_room(self.user_dir))
+        self.analysis = MeetingAnalysis(user=user_room(self.user_dir))
+        self.extractive = ExtractiveSummarizer()
+        with self.minutes_lock:
+            self.llm_minutes = ""
+            self.llm_minutes_seq = 0  # Segments covered by llm_minutes
+        self.questions = QuestionQueue()
+
+    def is_idle(self):
+        """Whether nothing is listening, queued or running for this session."""
+        if self.should_continue.is_set() or not self.loop_done.is_set():
+            return False
+        if self.pipeline is not None:
+            stats = self.pipeline.stats()
+            if stats["depth"] or stats["running"]:
+                return False
+        if self.minutes_scheduler is not None:
+            stats = self.minutes_scheduler.stats()
+            if stats["pending"] or stats["in_flight"]:
+                return False
+        return True
 
-# Dictionary to store per-user transcription states
-user_states = {}
+    def memory_usage(self):
+        """Approximate bytes held in memory, per part of the session state."""
+        usage = {
+            "transcript": self.transcript.memory_bytes(),
+            "index": self.index.memory_bytes(),
+            "extractive": self.extractive.memory_bytes(),
+        }
+        if self.capture is not None:
+            usage["capture"] = self.capture.buffer.nbytes
+        if self.rollover is not None:
+            usage["rollover"] = self.rollover.buffered * 2  # 16-bit samples kept for replay
+        return usage
+
+# Per-user transcription states; idle ones are evicted after SESSION_IDLE_TTL, or least
+# recently used first beyond SESSION_MAX_STATES (their data stays in storage)
+sessions = SessionRegistry(TranscriptionState, TranscriptionState.is_idle)
 
 def get_user_state(user_dir):
     """Get or create transcription state for a user"""
-    if user_dir not in user_states:
-        user_states[user_dir] = TranscriptionState()
-    return user_states[user_dir]
-
-def save_transcription_to_file(user_dir, transcription):
-    """Append the latest transcription to the user's file."""
-    filepath = os.path.join(user_dir, "live_transcription.txt")
-    with open(filepath, "a") as f:
-        f.write(transcription + "\n")
-
-def save_question_and_answer(user_dir, question, answer):
-    """Save detected questions and their GPT answers to a user's JSON file."""
-    filepath = os.path.join(user_dir, "questions_answers.json")
-    try:
-        with open(filepath, "r") as file:
-            qa_data = json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        qa_data = []
+    return sessions.get(user_dir)
+
+def get_pipeline(user_dir):
+    """Get the user's background GPT pipeline, starting a new one if needed."""
+    state = get_user_state(user_dir)
+    if state.pipeline is None or state.pipeline.stopping:
+        state.pipeline = SessionPipeline(user_dir)
+    return state.pipeline
 
+def get_minutes_scheduler(user_dir):
+    """Get the user's minutes regeneration scheduler, starting a new one if needed."""
     state = get_user_state(user_dir)
-    # Extract timestamp from the transcription line containing the question
-    timestamp = "00:00"
-    for line in state.transcriptions:
-        if question in line:
-            match = re.search(r'\(Time Stamp: (\d{2}:\d{2})\)', line)
-            if match:
-                timestamp = match.group(1)
-                break
-
-    qa_data.insert(0, {
+    if state.minutes_scheduler is None or state.minutes_scheduler.stopping:
+        state.minutes_scheduler = CoalescingScheduler(
+            user_dir,
+            lambda: update_meeting_minutes(user_dir),
+            min_interval=MINUTES_MIN_INTERVAL,
+            debounce=MINUTES_DEBOUNCE,
+            max_staleness=MINUTES_MAX_STALENESS,
+        )
+    return state.minutes_scheduler
+
+def save_segments(user_dir, segments):
+    """Store a batch of final segments; returns the cursor before each one and after the last."""
+    with timings.timed("storage_segments", user_room(user_dir)):
+        return get_storage(user_dir).append_segments(segments)
+
+def save_question_and_answer(user_dir, question, answer, timestamp="00:00"):
+    """Append a detected question and its GPT answer to the user's Q&A log; returns (item, count)."""
+    item = {
         "question": question,
         "answer": answer,
         "timestamp": timestamp
-    })
+    }
+    with timings.timed("storage_qa", user_room(user_dir)):
+        count = get_storage(user_dir).append_qa(item)
+    return item, count
 
-    with open(filepath, "w") as file:
-        json.dump(qa_data, file, indent=4)
+def build_context(user_dir, query):
+    """Relevant and recent transcript lines for answering query, under the context token budget."""
+    state = get_user_state(user_dir)
+    if not len(state.index):
+        # Nothing indexed in this process yet (e.g. after a restart): index the saved transcript,
+        # one line per segment so line ids stay segment sequence ids
+        for segment in get_storage(user_dir).read_segments(0)[0]:
+            state.index.add(segment.text)
+    return state.index.build_context(query)
 
 def get_full_transcription(user_dir):
     """Return all transcriptions for a user as a single string."""
     state = get_user_state(user_dir)
-    return "\n".join(state.transcriptions)
+    return state.transcript.text()
 
 def detect_questions(transcription):
     """
@@ -88,64 +178,81 @@ def detect_questions(transcription):
             questions.append(line)
     return questions
 
-def transcribe_streaming(user_dir):
-    """Stream and transcribe audio in real-time for a specific user."""
+def transcribe_streaming(user_dir, recognizer=None, source=None):
+    """
+    Stream and transcribe audio in real-time for a specific user. The
+    recognizer and audio source default to the SPEECH_BACKEND ones.
+    """
     state = get_user_state(user_dir)
-    state.should_continue.set()
-    state.start_time = time.time()
-    client = speech.SpeechClient()
-
-    def record_audio():
-        samplerate = 16000
-        channels = 1
-        dtype = 'int16'
-        
-        with sd.InputStream(samplerate=samplerate, channels=channels, dtype=dtype) as stream:
-            while state.should_continue.is_set():
-                audio_chunk, overflowed = stream.read(1024)
-                if not overflowed:
-                    # Convert to bytes
-                    audio_data = audio_chunk.tobytes()
-                    yield audio_data
-
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=16000,
-        language_code="en-US",
-        enable_automatic_punctuation=True
-    )
-    
-    streaming_config = speech.StreamingRecognitionConfig(config=config)
-
-    while state.should_continue.is_set():
-        try:
-            print(f"Starting new session for user directory: {user_dir}")
-            requests = (speech.StreamingRecognizeRequest(audio_content=chunk) 
-                       for chunk in record_audio())
-            responses = client.streaming_recognize(streaming_config, requests)
-            process_responses(user_dir, responses)
-        except Exception as e:
-            print(f"Stream ended: {e}")
-            if state.should_continue.is_set():
-                continue
-            else:
-                break
+    state.loop_done.clear()
+    try:
+        state.should_continue.set()
+        state.start_time = time.time()
+        state.new_meeting()
+        get_pipeline(user_dir)
+        get_minutes_scheduler(user_dir)
+
+        # The source stays open across stream reconnects and fills the ring buffer;
+        # each stream reads ~100 ms chunks out of it
+        state.capture = AudioCapture()
+        if recognizer is None:
+            recognizer, default_source = create_backend(state.capture.rate)
+            source = source or default_source
+        elif source is None:
+            source = MicrophoneSource()
+        # Silence is held back by the voice-activity gate instead of being streamed
+        state.vad = VADGate(state.capture.rate) if VAD_ENABLED else None
+
+        chunks = state.capture.chunks(active=state.should_continue)
+        if state.vad is not None:
+            chunks = state.vad.gate(chunks)
+        # Streams are rolled over before the service's duration limit; each new stream
+        # replays the audio after the last final result so nothing is lost at the seam
+        user = user_room(user_dir)
+        state.rollover = StreamRollover(chunks, state.capture.rate,
+                                        on_latency=lambda seconds: timings.observe("recognizer_latency", seconds, user))
+
+        with source.open(state.capture):
+            failures = 0
+            while state.should_continue.is_set() and not state.rollover.exhausted:
+                seen = len(state.transcript)
+                try:
+                    print(f"Starting new session for user directory: {user_dir}")
+                    responses = timings.timed_iter("recognizer", recognizer.stream(state.rollover.next_stream()), user)
+                    process_responses(user_dir, state.rollover.results(responses))
+                    failures = 0
+                except Exception as e:
+                    print(f"Stream ended: {e}")
+                    if not state.should_continue.is_set():
+                        break
+                    if len(state.transcript) > seen:
+                        failures = 0  # The stream was working before it failed
+                    delay = random.uniform(0, min(STREAM_BACKOFF_MAX, STREAM_BACKOFF_BASE * 2 ** failures))
+                    failures += 1
+                    # Sleep in short steps so stopping the session is not held up
+                    deadline = time.monotonic() + delay
+                    while state.should_continue.is_set() and time.monotonic() < deadline:
+                        time.sleep(min(0.1, deadline - time.monotonic()))
+        print(f"Audio capture for {user_dir}: {state.capture.stats()}")
+        print(f"Recognizer streams for {user_dir}: {state.rollover.stats()}")
+        if state.vad is not None:
+            print(f"Voice activity gate for {user_dir}: {state.vad.stats()}")
+    finally:
+        state.loop_done.set()
 
 def save_action_items(user_dir, action_items):
-    """Save action items to a user's JSON file."""
-    filepath = os.path.join(user_dir, "action_items.json")
+    """Save a user's action items."""
     try:
-        with open(filepath, "w") as file:
-            json.dump({"action_items": action_items}, file, indent=4)
+        with timings.timed("storage_documents", user_room(user_dir)):
+            get_storage(user_dir).save_document("action_items", {"action_items": action_items})
     except Exception as e:
         print(f"Error saving action items: {e}")
 
-def save_meeting_minutes(user_dir, minutes):
-    """Save meeting minutes to a user's JSON file."""
-    filepath = os.path.join(user_dir, "meeting_minutes.json")
+def save_meeting_minutes(user_dir, minutes, tier=None):
+    """Save a user's meeting minutes, tagged with the summarizer tier that produced them."""
     try:
-        with open(filepath, "w") as file:
-            json.dump({"meeting_minutes": minutes}, file, indent=4)
+        with timings.timed("storage_documents", user_room(user_dir)):
+            get_storage(user_dir).save_document("meeting_minutes", {"meeting_minutes": minutes, "tier": tier})
     except Exception as e:
         print(f"Error saving meeting minutes: {e}")
 
@@ -154,40 +261,212 @@ def process_responses(user_dir, responses):
     state = get_user_state(user_dir)
 
     for response in responses:
+        segments = []
         for result in response.results:
             if result.is_final:
                 transcript = result.alternatives[0].transcript
                 confidence = result.alternatives[0].confidence
 
-                elapsed_time = int(time.time() - state.start_time)
-                minutes = elapsed_time // 60
-                seconds = elapsed_time % 60
-                timestamp = f"(Time Stamp: {minutes:02d}:{seconds:02d})"
-
-                if transcript != state.last_saved_segment:
-                    state.last_saved_segment = transcript
-                    formatted_line = f"{transcript} (Confidence: {confidence:.2f}) {timestamp}"
-                    state.transcriptions.append(formatted_line)
-                    save_transcription_to_file(user_dir, formatted_line)
-
-                    print(f"New line added for {user_dir}: {formatted_line}")
-
-                    questions = detect_questions(transcript)
-                    for question in questions:
-                        try:
-                            answer = get_gpt_response(question, "\n".join(state.transcriptions))
-                            save_question_and_answer(user_dir, question, answer)
-                        except Exception as e:
-                            print(f"Error generating answer for question '{question}': {e}")
-
-                    try:
-                        meeting_minutes = generate_meeting_minutes("\n".join(state.transcriptions))
-                        save_meeting_minutes(user_dir, meeting_minutes)
-                        notify_frontend_update()
-                    except Exception as e:
-                        print(f"Error processing updates: {e}")
+                last = state.transcript.last()
+                if last is None or transcript != last.text:
+                    # Time stamps follow the audio, so replays faster than real time keep the meeting's times
+                    if state.capture is not None:
+                        end = state.capture.elapsed()
+                    else:
+                        end = time.time() - state.start_time
+                    segment = state.transcript.append(transcript, end, confidence)
+                    state.index.add(segment.text, segment.to_context())
+                    segments.append(segment)
+        if not segments:
+            continue
+
+        with timings.timed("transcript", user_room(user_dir)):
+            # All final results of one response are stored in a single batch
+            session = get_storage(user_dir).session
+            cursors = save_segments(user_dir, segments)
+            queued = False
+            for i, segment in enumerate(segments):
+                print(f"New line added for {user_dir}: {segment.to_line()}")
+
+                notify_frontend_update(user_dir, 'transcript_line', {
+                    'segment': segment.to_dict(),
+                    'start': cursors[i],
+                    'cursor': cursors[i + 1],
+                    'session': session
+                })
+                state.extractive.add(segment)
+
+                for question in detect_questions(segment.text):
+                    # Restatements of a question already asked this session are not answered again
+                    if state.questions.add(question, segment.clock(), time.perf_counter()):
+                        queued = True
+
+            # GPT work runs off the recognizer loop: answers on the user's pipeline, minutes on
+            # the debounced scheduler. Answer tasks share a key, so while one is queued or running,
+            # newly detected questions wait for the next and are answered in the same batch.
+            if queued:
+                get_pipeline(user_dir).submit(answer_pending_questions, user_dir, key="questions")
+            # The extractive tier refreshes the minutes right away; the LLM tier on its coarse schedule
+            publish_minutes(user_dir)
+            get_minutes_scheduler(user_dir).request()
+
+def answer_pending_questions(user_dir):
+    """Answer the session's pending questions with GPT, a batch per call, and store them (runs on the pipeline)."""
+    state = get_user_state(user_dir)
+    while True:
+        batch = state.questions.take()
+        if not batch:
+            return
+        texts = [question.text for question in batch]
+        try:
+            with timings.timed("answer", user_room(user_dir)):
+                answers = answer_questions(texts, build_context(user_dir, " ".join(texts)), user_room(user_dir))
+                for question, answer in zip(batch, answers):
+                    session = get_storage(user_dir).session
+                    item, cursor = save_question_and_answer(user_dir, question.text, answer, question.timestamp)
+                    notify_frontend_update(user_dir, 'qa_item', {'item': item, 'cursor': cursor, 'session': session})
+                    if question.detected_at is not None:
+                        # Includes the time spent waiting for the batch and queued on the pipeline
+                        timings.observe("question_to_answer", time.perf_counter() - question.detected_at, user_room(user_dir))
+        except Exception as e:
+            print(f"Error generating answers for questions {texts}: {e}")
+
+def update_meeting_minutes(user_dir):
+    """Regenerate and store the meeting minutes (runs on the minutes scheduler)."""
+    state = get_user_state(user_dir)
+    try:
+        with timings.timed("minutes", user_room(user_dir)):
+            if MEETING_ANALYSIS_ENABLED:
+                meeting_minutes = update_meeting_analysis(user_dir)
+                covered = state.analysis.next_seq
+            else:
+                covered = len(state.transcript)
+                meeting_minutes = state.minutes.update(state.transcript)
+            # Failures keep the previous LLM minutes; the extractive tier covers the newer lines
+            if meeting_minutes.strip() and not meeting_minutes.startswith(("Error", "No valid summaries")):
+                with state.minutes_lock:
+                    state.llm_minutes, state.llm_minutes_seq = meeting_minutes, covered
+            publish_minutes(user_dir)
+    except Exception as e:
+        print(f"Error processing updates: {e}")
+
+def publish_minutes(user_dir):
+    """
+    Store and push the current minutes: the LLM minutes, with an extractive
+    summary of any lines they do not cover yet. Tagged with the tier:
+    "extractive" (no LLM minutes yet), "llm" or "llm+extractive".
+    """
+    state = get_user_state(user_dir)
+    with timings.timed("minutes_publish", user_room(user_dir)), state.minutes_lock:
+        if not state.llm_minutes:
+            meeting_minutes = format_summary(state.extractive.summary())
+            tier = "extractive"
+            if meeting_minutes:
+                meeting_minutes = f"## Key points so far\n{meeting_minutes}"
+        else:
+            recent = state.extractive.summary(state.llm_minutes_seq, EXTRACTIVE_RECENT_SENTENCES)
+            meeting_minutes, tier = state.llm_minutes, "llm"
+            if recent:
+                meeting_minutes += f"\n\n## Since the last update\n{format_summary(recent)}"
+                tier = "llm+extractive"
+        if not meeting_minutes:
+            return
+        # Saved under the lock so a slower writer never replaces newer minutes
+        save_meeting_minutes(user_dir, meeting_minutes, tier)
+        notify_frontend_update(user_dir, 'minutes_update', {'meeting_minutes': meeting_minutes, 'tier': tier})
+
+def update_meeting_analysis(user_dir):
+    """Analyze the new transcript lines, store the action items and queue open questions; returns the minutes."""
+    state = get_user_state(user_dir)
+    open_questions = state.analysis.update(state.transcript)
+    if state.analysis.action_items:
+        save_action_items(user_dir, state.analysis.action_items)
+
+    # Open questions go through the same dedupe and batched answering as the ones detected in lines
+    last = state.transcript.last()
+    timestamp = last.clock() if last is not None else "00:00"
+    queued = [q for q in open_questions if state.questions.add(q, timestamp, time.perf_counter())]
+    if queued and state.should_continue.is_set():
+        get_pipeline(user_dir).submit(answer_pending_questions, user_dir, key="questions")
+    return state.analysis.render()
 
 def stop_transcription(user_dir):
     """Stop the transcription process for a specific user."""
     state = get_user_state(user_dir)
     state.should_continue.clear()
+    # Let queued answers and the last pending minutes update finish in the background
+    if state.pipeline is not None:
+        state.pipeline.stop(drain=True, timeout=0)
+    if state.minutes_scheduler is not None:
+        state.minutes_scheduler.stop(flush=True, timeout=0)
+
+def finish_session(user_dir, timeout=None):
+    """
+    Stop the user's previous session and wait for its transcription loop, queued
+    answers and last minutes update, so none of them writes into the session that
+    is about to start. Returns whether it all finished within the timeout
+    (SESSION_STOP_TIMEOUT by default); work still queued after that is dropped.
+    """
+    state = get_user_state(user_dir)
+    timeout = SESSION_STOP_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    remaining = lambda: max(0.0, deadline - time.monotonic())
+    state.should_continue.clear()
+    state.loop_done.wait(remaining())
+    if state.pipeline is not None:
+        state.pipeline.stop(drain=True, timeout=remaining())
+        state.pipeline.stop(drain=False, timeout=0)
+    if state.minutes_scheduler is not None:
+        state.minutes_scheduler.stop(flush=True, timeout=remaining())
+        state.minutes_scheduler.stop(flush=False, timeout=0)
+    if not state.is_idle():
+        print(f"Previous session for {user_dir} still running after {timeout} s")
+        return False
+    return True
+
+@registry.collector
+def collect_session_metrics():
+    """Per-session queue depths and counters for /metrics, read at scrape time."""
+    gauges = {}
+    counters = {}
+    for user_dir, state in sessions.items():
+        user = {"user": user_room(user_dir)}
+        for part, size in state.memory_usage().items():
+            gauges.setdefault("session_memory_bytes", []).append((dict(user, part=part), size))
+        gauges.setdefault("listening", []).append((user, int(state.should_continue.is_set())))
+        if state.pipeline is not None:
+            stats = state.pipeline.stats()
+            gauges.setdefault("pipeline_depth", []).append((user, stats["depth"]))
+            for outcome in ("submitted", "completed", "failed", "dropped", "coalesced"):
+                counters.setdefault("pipeline_tasks", []).append((dict(user, outcome=outcome), stats[outcome]))
+        if state.minutes_scheduler is not None:
+            stats = state.minutes_scheduler.stats()
+            gauges.setdefault("minutes_pending", []).append((user, int(bool(stats["pending"]))))
+            counters.setdefault("minutes_runs", []).append((user, stats["runs"]))
+        stats = state.questions.stats()
+        gauges.setdefault("questions_pending", []).append((user, stats["pending"]))
+        for outcome, key in (("queued", "added"), ("duplicate", "duplicates")):
+            counters.setdefault("questions", []).append((dict(user, outcome=outcome), stats[key]))
+        counters.setdefault("question_batches", []).append((user, stats["batches"]))
+        if state.capture is not None:
+            stats = state.capture.stats()
+            gauges.setdefault("capture_buffered_samples", []).append((user, stats["buffered_samples"]))
+            counters.setdefault("capture_dropped_samples", []).append((user, stats["dropped_samples"]))
+            counters.setdefault("capture_overflows", []).append((user, stats["overflows"]))
+        if state.vad is not None:
+            gauges.setdefault("vad_forwarded_ratio", []).append((user, state.vad.stats()["forwarded_ratio"]))
+        if state.rollover is not None:
+            stats = state.rollover.stats()
+            counters.setdefault("recognizer_streams", []).append((user, stats["streams"]))
+            counters.setdefault("recognizer_duplicate_finals", []).append((user, stats["duplicate_finals"]))
+    stats = sessions.stats()
+    gauges["sessions"] = [({}, stats["states"])]
+    counters["sessions_created"] = [({}, stats["created"])]
+    counters["sessions_evicted"] = [({}, stats["evicted"])]
+    cache = gpt_utils.llm_cache.stats()
+    gauges["llm_cache_entries"] = [({}, cache["entries"])]
+    counters["llm_cache_lookups"] = [({"result": result}, cache[key]) for result, key in
+                                     (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))]
+    metrics = [(f"live_ai_{name}", "gauge", name.replace("_", " "), samples) for name, samples in gauges.items()]
+    metrics += [(f"live_ai_{name}_total", "counter", name.replace("_", " "), samples) for name, samples in counters.items()]
+    return metrics
@@ -0,0 +1,307 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from qa_store import get_store
+from transcript import Segment
+
+# "file" keeps the original per-user files; "sqlite" uses a WAL-mode database
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "file")
+# Shared database for every user; when empty each user gets <user_dir>/session.sqlite3
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "")
+
+TRANSCRIPT_FILENAME = "live_transcription.txt"
+QA_FILENAME = "questions_answers.jsonl"
+DOCUMENT_FILENAMES = {"meeting_minutes": "meeting_minutes.json", "action_items": "action_items.json"}
+SESSION_FILENAME = "session_id"
+
+
+def new_session_id():
+    return uuid.uuid4().hex[:12]
+
+
+class FileStorage:
+    """
+    The original layout: a transcript text file, a Q&A log and one JSON file
+    per document in the user's directory. Transcript cursors are byte offsets
+    into the transcript file; Q&A cursors are entry counts. `session` is
+    replaced on every reset, so cursors handed out before it can be told apart.
+    """
+
+    def __init__(self, user_dir):
+        self.user_dir = user_dir
+        self.transcript_path = os.path.join(user_dir, TRANSCRIPT_FILENAME)
+        self.session_path = os.path.join(user_dir, SESSION_FILENAME)
+        self.qa = get_store(os.path.join(user_dir, QA_FILENAME))
+        self.lock = threading.Lock()
+        self.offsets = None  # Byte offset of each transcript line, built on first use
+        self.indexed_end = 0
+        try:
+            with open(self.session_path, "r") as file:
+                self.session = file.read().strip()
+        except FileNotFoundError:
+            self.session = ""
+        if not self.session:
+            self._save_session(new_session_id())
+
+    def _save_session(self, session):
+        temp_path = f"{self.session_path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(session)
+        os.replace(temp_path, self.session_path)
+        self.session = session
+
+    def reset(self):
+        """Clear everything for a new session."""
+        with self.lock:
+            with open(self.transcript_path, "w"):
+                pass
+            self.offsets = array("q")
+            self.indexed_end = 0
+            for name in DOCUMENT_FILENAMES:
+                self.save_document(name, {})
+            self.qa.clear()
+            self._save_session(new_session_id())
+
+    def append_segments(self, segments):
+        """Append a batch of segments in one write; returns the cursor before each segment and after the last."""
+        lines = [(segment.to_line() + "\n").encode("utf-8") for segment in segments]
+        with self.lock:
+            with open(self.transcript_path, "ab") as f:
+                cursors = [f.tell()]
+                for line in lines:
+                    cursors.append(cursors[-1] + len(line))
+                f.write(b"".join(lines))
+            if self.offsets is not None:
+                self.offsets.extend(cursors[:-1])
+                self.indexed_end = cursors[-1]
+            return cursors
+
+    def _line_offsets(self):
+        """Offsets of the complete transcript lines, indexing the file on first use (caller holds the lock)."""
+        if self.offsets is None:
+            self.offsets = array("q")
+            position = 0
+            try:
+                with open(self.transcript_path, "rb") as file:
+                    for line in file:
+                        if not line.endswith(b"\n"):
+                            break
+                        self.offsets.append(position)
+                        position += len(line)
+            except FileNotFoundError:
+                pass
+            self.indexed_end = position
+        return self.offsets
+
+    def read_segments(self, cursor=0, session=None):
+        """
+        Segments after cursor, oldest first, with the new cursor and whether the
+        cursor was reset (it came from an earlier session, or points past the end).
+        """
+        stale = session is not None and session != self.session
+        try:
+            with open(self.transcript_path, "rb") as file:
+                reset = stale or not 0 <= cursor <= os.fstat(file.fileno()).st_size
+                if reset:
+                    cursor = 0
+                file.seek(cursor)
+                data = file.read()
+        except FileNotFoundError:
+            return [], 0, stale or cursor != 0
+
+        # Only hand out complete lines; a partially written one is picked up next time
+        end = data.rfind(b"\n") + 1
+        segments = [Segment.from_line(line) for line in data[:end].decode("utf-8").splitlines()]
+        return segments, cursor + end, reset
+
+    def read_segment_range(self, start, end=None):
+        """Segments with sequence ids start..end-1 (to the last with end=None), oldest first."""
+        with self.lock:
+            offsets = self._line_offsets()
+            end = len(offsets) if end is None else min(end, len(offsets))
+            if start >= end:
+                return []
+            first = offsets[start]
+            last = offsets[end] if end < len(offsets) else self.indexed_end
+        with open(self.transcript_path, "rb") as file:
+            file.seek(first)
+            data = file.read(last - first)
+        return [Segment.from_line(line, seq) for seq, line in enumerate(data.decode("utf-8").splitlines(), start)]
+
+    def append_qa(self, item):
+        """Append a Q&A entry; returns the new entry count."""
+        return self.qa.append(item)
+
+    def read_qa(self, cursor=0, session=None):
+        """Q&A entries after cursor, newest first, with the new cursor and whether it was reset."""
+        reset = session not in (None, self.session) or not 0 <= cursor <= self.qa.count()
+        items, cursor = self.qa.since(0 if reset else cursor)
+        return items, cursor, reset
+
+    def save_document(self, name, value):
+        """Replace a JSON document (meeting_minutes, action_items) atomically."""
+        path = os.path.join(self.user_dir, DOCUMENT_FILENAMES[name])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(value, file, indent=4)
+        # Readers see either the old or the new document, never a half-written one
+        os.replace(temp_path, path)
+
+    def load_document(self, name):
+        """The stored document, or None if there is none."""
+        try:
+            with open(os.path.join(self.user_dir, DOCUMENT_FILENAMES[name]), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+
+class SQLiteStorage:
+    """
+    Session data in a SQLite database in WAL mode, so HTTP readers never wait
+    for the transcription writer. Each thread has its own connection.
+    Transcript and Q&A cursors are row counts (sequence numbers), and
+    `session` is replaced on every reset, as in FileStorage.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            user TEXT NOT NULL, seq INTEGER NOT NULL, text TEXT NOT NULL,
+            start REAL NOT NULL, end REAL NOT NULL, confidence REAL NOT NULL,
+            PRIMARY KEY (user, seq));
+        CREATE TABLE IF NOT EXISTS qa (
+            user TEXT NOT NULL, seq INTEGER NOT NULL, item TEXT NOT NULL, created_at REAL NOT NULL,
+            PRIMARY KEY (user, seq));
+        CREATE TABLE IF NOT EXISTS documents (
+            user TEXT NOT NULL, name TEXT NOT NULL, body TEXT NOT NULL, updated_at REAL NOT NULL,
+            PRIMARY KEY (user, name));
+        CREATE TABLE IF NOT EXISTS sessions (user TEXT PRIMARY KEY, id TEXT NOT NULL);
+    """
+
+    def __init__(self, path, user):
+        self.path = path
+        self.user = user
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(self.SCHEMA)
+        # Next sequence number per table, read once here and kept up to date by the writers
+        self.next_seq = {}
+        for table in ("segments", "qa"):
+            row = connection.execute(f"SELECT MAX(seq) FROM {table} WHERE user = ?", (self.user,)).fetchone()
+            self.next_seq[table] = 0 if row[0] is None else row[0] + 1
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO sessions (user, id) VALUES (?, ?)", (self.user, new_session_id()))
+        self.session = connection.execute("SELECT id FROM sessions WHERE user = ?", (self.user,)).fetchone()[0]
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def reset(self):
+        """Clear everything for a new session."""
+        with self.write_lock:
+            connection = self._connection()
+            with connection:
+                for table in ("segments", "qa", "documents"):
+                    connection.execute(f"DELETE FROM {table} WHERE user = ?", (self.user,))
+                session = new_session_id()
+                connection.execute("INSERT OR REPLACE INTO sessions (user, id) VALUES (?, ?)", (self.user, session))
+            self.session = session
+            self.next_seq = {"segments": 0, "qa": 0}
+
+    def append_segments(self, segments):
+        """Insert a batch of segments in one transaction; returns the cursor before each segment and after the last."""
+        with self.write_lock:
+            connection = self._connection()
+            with connection:
+                start = self.next_seq["segments"]
+                connection.executemany(
+                    "INSERT INTO segments (user, seq, text, start, end, confidence) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.user, start + i, s.text, s.start, s.end, s.confidence) for i, s in enumerate(segments)])
+            self.next_seq["segments"] = start + len(segments)
+            return list(range(start, start + len(segments) + 1))
+
+    def _segments(self, where, params):
+        rows = self._connection().execute(
+            f"SELECT seq, text, start, end, confidence FROM segments WHERE user = ? AND {where} ORDER BY seq",
+            (self.user,) + params).fetchall()
+        return [Segment(*row) for row in rows]
+
+    def read_segments(self, cursor=0, session=None):
+        """Segments after cursor, oldest first, with the new cursor and whether the cursor was reset."""
+        reset = session not in (None, self.session) or not 0 <= cursor <= self.next_seq["segments"]
+        if reset:
+            cursor = 0
+        segments = self._segments("seq >= ?", (cursor,))
+        return segments, cursor + len(segments), reset
+
+    def read_segment_range(self, start, end=None):
+        """Segments with sequence ids start..end-1 (to the last with end=None), oldest first."""
+        if end is None:
+            return self._segments("seq >= ?", (start,))
+        return self._segments("seq >= ? AND seq < ?", (start, end))
+
+    def append_qa(self, item):
+        """Append a Q&A entry; returns the new entry count."""
+        with self.write_lock:
+            connection = self._connection()
+            with connection:
+                seq = self.next_seq["qa"]
+                connection.execute("INSERT INTO qa (user, seq, item, created_at) VALUES (?, ?, ?, ?)",
+                                   (self.user, seq, json.dumps(item), time.time()))
+            self.next_seq["qa"] = seq + 1
+            return seq + 1
+
+    def read_qa(self, cursor=0, session=None):
+        """Q&A entries after cursor, newest first, with the new cursor and whether it was reset."""
+        connection = self._connection()
+        count = self.next_seq["qa"]
+        reset = session not in (None, self.session) or not 0 <= cursor <= count
+        if reset:
+            cursor = 0
+        rows = connection.execute("SELECT item FROM qa WHERE user = ? AND seq >= ? AND seq < ? ORDER BY seq DESC",
+                                  (self.user, cursor, count)).fetchall()
+        return [json.loads(row[0]) for row in rows], count, reset
+
+    def save_document(self, name, value):
+        """Replace a JSON document (meeting_minutes, action_items)."""
+        with self.write_lock:
+            connection = self._connection()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO documents (user, name, body, updated_at) VALUES (?, ?, ?, ?)",
+                                   (self.user, name, json.dumps(value), time.time()))
+
+    def load_document(self, name):
+        """The stored document, or None if there is none."""
+        row = self._connection().execute("SELECT body FROM documents WHERE user = ? AND name = ?",
+                                         (self.user, name)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+storages = {}
+storages_lock = threading.Lock()
+
+def get_storage(user_dir):
+    """Shared storage backend (chosen by STORAGE_BACKEND) for a user's session data."""
+    with storages_lock:
+        if user_dir not in storages:
+            if STORAGE_BACKEND == "sqlite":
+                user = os.path.basename(os.path.normpath(user_dir))
+                path = STORAGE_SQLITE_PATH or os.path.join(user_dir, "session.sqlite3")
+                storages[user_dir] = SQLiteStorage(path, user)
+            else:
+                storages[user_dir] = FileStorage(user_dir)
+        return storages[user_dir]
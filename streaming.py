@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import types
+from collections import deque
+
+# Streaming recognition sessions are capped by the service (~5 minutes); roll over before that
+STREAM_LIMIT_SECONDS = float(os.getenv("STREAM_LIMIT_SECONDS", "280"))
+# Audio kept for replaying into the next stream (everything after the last final result, up to this much)
+STREAM_REPLAY_SECONDS = float(os.getenv("STREAM_REPLAY_SECONDS", "10"))
+
+
+def duration_seconds(duration):
+    """Seconds in a result offset (timedelta or protobuf Duration)."""
+    if hasattr(duration, "total_seconds"):
+        return duration.total_seconds()
+    return duration.seconds + duration.nanos / 1e9
+
+
+class StreamRollover:
+    """
+    Splits one continuous audio chunk stream across consecutive recognizer
+    streams.
+
+    Each stream's request generator (next_stream()) ends on its own before
+    the service limit, so the stream closes cleanly instead of being cut.
+    Every chunk sent is also kept (copied) in a replay buffer; the next stream
+    starts by replaying the audio after the last final result, so speech that
+    was still in flight when a stream ended is recognized again rather than
+    lost. Positions are counted in samples of audio sent, and results() maps
+    each stream's result offsets onto that timeline to drop finals the
+    previous stream already produced.
+
+    A stream that ends on an error may still have its request generator
+    waiting for audio on the recognizer's thread. Only the newest stream's
+    generator takes chunks from the source: an older one that receives a
+    chunk hands it over to the newest stream and stops, so no chunk is lost
+    and the source is never iterated by two threads at once.
+
+    When on_latency is given, it is called with the recognizer latency of
+    each new final result: the time from sending the chunk holding the end of
+    the utterance to receiving the result.
+    """
+
+    def __init__(self, chunks, rate, limit=None, replay_seconds=None, clock=time.monotonic, on_latency=None):
+        self.source = iter(chunks)
+        self.rate = rate
+        self.limit = limit or STREAM_LIMIT_SECONDS
+        self.replay_samples = int((replay_seconds or STREAM_REPLAY_SECONDS) * rate)
+        self.clock = clock
+        self.on_latency = on_latency
+        self.buffer = deque()  # (start position, bytes, clock when sent)
+        self.buffered = 0
+        self.position = 0  # Samples of new audio taken from the source
+        self.last_final_end = 0
+        self.stream_offset = 0
+        self.exhausted = False
+        self.lock = threading.Lock()
+        self.source_lock = threading.Lock()  # Held while taking a chunk from the source
+        self.handoff = deque()  # Chunks taken by a stream after a newer one had started
+        self.streams = 0
+        self.rollovers = 0
+        self.replayed_samples = 0
+        self.duplicates = 0
+
+    def next_stream(self):
+        """Audio for a new stream: the replay first, then live chunks until the stream limit."""
+        with self.lock:
+            replay = [(start, data) for start, data, _ in self.buffer
+                      if start + len(data) // 2 > self.last_final_end]
+            self.stream_offset = replay[0][0] if replay else self.position
+            self.streams += 1
+            stream = self.streams
+        return self._audio(stream, replay, self.clock())
+
+    def _next_chunk(self, stream):
+        """The next chunk (copied) for stream, or None once the source is exhausted or a newer stream started."""
+        with self.source_lock:
+            if stream != self.streams:
+                return None
+            if self.handoff:
+                return self.handoff.popleft()
+            chunk = next(self.source, None)
+            if chunk is None:
+                self.exhausted = True
+                return None
+            data = bytes(chunk)
+            if stream != self.streams:
+                # A newer stream started while this one waited for audio; the chunk is its first
+                self.handoff.append(data)
+                return None
+            return data
+
+    def _audio(self, stream, replay, started):
+        for _, data in replay:
+            self.replayed_samples += len(data) // 2
+            yield data
+        while True:
+            data = self._next_chunk(stream)
+            if data is None:
+                return
+            with self.lock:
+                self.buffer.append((self.position, data, self.clock()))
+                self.buffered += len(data) // 2
+                self.position += len(data) // 2
+                while self.buffer and self.buffered - len(self.buffer[0][1]) // 2 >= self.replay_samples:
+                    self.buffered -= len(self.buffer.popleft()[1]) // 2
+            yield data
+            if self.clock() - started >= self.limit:
+                self.rollovers += 1
+                return
+
+    def results(self, responses):
+        """Responses of the current stream with finals already seen in the previous stream removed."""
+        offset = self.stream_offset
+        for response in responses:
+            results = []
+            for result in response.results:
+                duration = getattr(result, "result_end_time", None)
+                if result.is_final and duration is not None:
+                    end = offset + round(duration_seconds(duration) * self.rate)
+                    with self.lock:
+                        if end <= self.last_final_end:
+                            self.duplicates += 1
+                            continue
+                        self.last_final_end = end
+                        sent = self._sent_at(end)
+                    if sent is not None and self.on_latency is not None:
+                        self.on_latency(self.clock() - sent)
+                results.append(result)
+            yield types.SimpleNamespace(results=results)
+
+    def _sent_at(self, position):
+        """When the buffered chunk holding the sample before position was sent (None once trimmed)."""
+        for start, data, sent in reversed(self.buffer):
+            if start < position:
+                return sent if position <= start + len(data) // 2 else None
+        return None
+
+    def stats(self):
+        return {
+            "streams": self.streams,
+            "rollovers": self.rollovers,
+            "replayed_seconds": self.replayed_samples / self.rate,
+            "duplicate_finals": self.duplicates,
+        }
@@ -0,0 +1,74 @@
+import threading
+import unittest
+import numpy as np
+from audio_capture import AudioCapture, SyntheticSource, tone
+
+class TestAudioCapture(unittest.TestCase):
+    def test_chunks_are_fixed_size_views_of_the_signal(self):
+        """Test odd-sized device blocks come out as 100 ms slices, in order and uncopied"""
+        capture = AudioCapture(rate=16000, chunk_ms=100, buffer_seconds=4)
+        signal = np.arange(16000 * 3 + 500, dtype=np.int64).astype(np.int16)
+        SyntheticSource(signal, blocksize=1024).start(capture)
+
+        received = []
+        for chunk in capture.chunks():
+            self.assertIsInstance(chunk, memoryview)
+            self.assertIs(chunk.obj, capture.buffer)
+            received.append(np.frombuffer(chunk, dtype=np.int16).copy())
+
+        self.assertEqual([len(c) for c in received[:-1]], [1600] * 30)
+        self.assertEqual(len(received[-1]), 500)
+        np.testing.assert_array_equal(np.concatenate(received), signal)
+        stats = capture.stats()
+        self.assertEqual(stats["dropped_samples"], 0)
+        self.assertEqual(stats["chunks"], 31)
+
+    def test_full_buffer_drops_and_counts_new_samples(self):
+        """Test that a stalled consumer loses the newest samples and the loss is counted"""
+        capture = AudioCapture(rate=1000, chunk_ms=100, buffer_seconds=0.5)
+        capture.write(np.ones(400, dtype=np.int16))
+        capture.write(np.full(300, 2, dtype=np.int16), overflowed=True)
+        capture.close()
+
+        samples = np.concatenate([np.frombuffer(c, dtype=np.int16) for c in capture.chunks()])
+        self.assertEqual(len(samples), 500)
+        self.assertEqual(list(samples[-100:]), [2] * 100)
+        stats = capture.stats()
+        self.assertEqual(stats["captured_samples"], 700)
+        self.assertEqual(stats["dropped_samples"], 200)
+        self.assertEqual(stats["overflows"], 1)
+
+    def test_slice_is_not_overwritten_while_held(self):
+        """Test the producer never writes into the slice the consumer is holding"""
+        capture = AudioCapture(rate=1000, chunk_ms=100, buffer_seconds=0.2)
+        capture.write(np.full(200, 7, dtype=np.int16))
+        chunks = capture.chunks()
+        held = next(chunks)
+        capture.write(np.full(100, 9, dtype=np.int16))  # Only room once the held chunk is released
+        self.assertEqual(set(np.frombuffer(held, dtype=np.int16)), {7})
+        self.assertEqual(capture.stats()["dropped_samples"], 100)
+
+    def test_clearing_active_stops_the_consumer(self):
+        """Test chunks() returns once the session is stopped, even with no audio arriving"""
+        capture = AudioCapture(rate=1000, chunk_ms=100)
+        active = threading.Event()
+        active.set()
+        consumer = threading.Thread(target=lambda: list(capture.chunks(active=active)))
+        consumer.start()
+        active.clear()
+        consumer.join(timeout=2)
+        self.assertFalse(consumer.is_alive())
+
+    def test_float_samples_are_converted(self):
+        """Test float sources in [-1, 1] are stored as int16"""
+        capture = AudioCapture(rate=1000, chunk_ms=100)
+        capture.write(np.array([0.0, 1.0, -1.0, 2.0]))
+        capture.close()
+        self.assertEqual(list(np.frombuffer(next(capture.chunks()), dtype=np.int16)), [0, 32767, -32767, 32767])
+
+    def test_tone(self):
+        self.assertEqual(len(tone(0.5, rate=8000)), 4000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import unittest
+from flask import Flask, session
+from events import socketio, notify_frontend_update
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'test'
+socketio.init_app(app)
+
+@app.route('/login/<user>')
+def login(user):
+    session['user'] = user
+    return ''
+
+class TestEvents(unittest.TestCase):
+    def connect(self, user=None):
+        client = app.test_client()
+        if user:
+            client.get(f'/login/{user}')
+        return socketio.test_client(app, flask_test_client=client)
+
+    def test_updates_only_reach_the_users_room(self):
+        """Test that an update for one user is not broadcast to other users"""
+        alice, bob = self.connect('alice'), self.connect('bob')
+        payload = {'line': 'Ship it Friday?\n', 'start': 0, 'cursor': 16}
+
+        notify_frontend_update(os.path.join('transcriptions', 'users', 'alice'), 'transcript_line', payload)
+
+        received = alice.get_received()
+        self.assertEqual([(m['name'], m['args'][0]) for m in received], [('transcript_line', payload)])
+        self.assertEqual(bob.get_received(), [])
+
+    def test_logged_out_socket_is_rejected(self):
+        """Test that a browser without a session cannot connect"""
+        self.assertFalse(self.connect().is_connected())
+
+if __name__ == '__main__':
+    unittest.main()
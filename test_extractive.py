@@ -0,0 +1,56 @@
+import unittest
+from extractive import ExtractiveSummarizer, format_summary
+from transcript import Transcript
+
+LINES = [
+    "Good morning everyone.",
+    "The release candidate passed all integration tests yesterday.",
+    "Okay.",
+    "Marketing wants the budget raised by twenty percent for digital campaigns.",
+    "The release candidate passed the integration tests.",
+    "Hiring for the senior developer role starts next week.",
+]
+
+class TestExtractiveSummarizer(unittest.TestCase):
+    def setUp(self):
+        self.transcript = Transcript()
+        self.summarizer = ExtractiveSummarizer()
+        for i, line in enumerate(LINES):
+            self.summarizer.add(self.transcript.append(line, 5.0 * (i + 1), 0.9))
+
+    def test_summary_picks_informative_sentences_in_order(self):
+        """Test short filler and near-repeats are skipped and picks keep meeting order"""
+        texts = [text for _, _, text in self.summarizer.summary(count=3)]
+        self.assertEqual(texts, [LINES[1], LINES[3], LINES[5]])
+
+    def test_summary_since_seq(self):
+        """Test a summary of only the lines after a given segment"""
+        sentences = self.summarizer.summary(since_seq=4, count=5)
+        self.assertEqual([seq for seq, _, _ in sentences], [4, 5])
+        self.assertEqual(format_summary(sentences[-1:]), f"* [00:30] {LINES[5]}")
+
+    def test_window_forgets_oldest_sentences(self):
+        """Test that only the most recent sentences are kept, with frequencies as if only they were added"""
+        windowed = ExtractiveSummarizer(window=4)
+        recent = ExtractiveSummarizer()
+        for segment in self.transcript:
+            windowed.add(segment)
+        for segment in self.transcript.since(2):
+            recent.add(segment)
+
+        # The fifth sentence went over the window of four, so the oldest two were dropped
+        self.assertEqual([seq for seq, _, _ in windowed.sentences], [2, 3, 4, 5])
+        def frequencies(summarizer):
+            return {term: summarizer.df[i] for term, i in summarizer.vocabulary.items() if summarizer.df[i]}
+        self.assertEqual(frequencies(windowed), frequencies(recent))
+        self.assertEqual(windowed.summary(), recent.summary())
+        self.assertEqual(self.summarizer.summary(since_seq=6), [])
+
+    def test_segments_are_split_into_sentences(self):
+        summarizer = ExtractiveSummarizer()
+        summarizer.add(Transcript().append("We ship the release Friday. Maria updates the deployment checklist.", 3.0, 0.9))
+        self.assertEqual(len(summarizer), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,36 @@
+import json
+import time
 import unittest
 from unittest.mock import patch, MagicMock
-from gpt_utils import chunk_transcription, process_long_transcription, generate_meeting_minutes
+from openai import RateLimitError
+from gpt_utils import chunk_transcription, process_long_transcription, generate_meeting_minutes, IncrementalMinutes, get_gpt_response, summarize_chunk, iter_token_chunks, TokenChunker, stream_gpt_response, answer_questions, MeetingAnalysis, validate, ANALYSIS_SCHEMA
+from transcript import Transcript
+from llm_cache import LLMCache
+from metrics import llm_calls, stage_seconds
 
 class MockResponse:
     def __init__(self, content):
         self.choices = [MagicMock(message=MagicMock(content=content))]
 
+class MockStream:
+    """Chunks of a streamed completion, one per token."""
+    def __init__(self, tokens):
+        self.chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=token))], usage=None) for token in tokens]
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
 class TestGPTUtils(unittest.TestCase):
     def setUp(self):
+        # Give every test its own empty, memory-only response cache
+        cache_patcher = patch('gpt_utils.llm_cache', LLMCache(path=""))
+        self.cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
         # Sample test transcript with multiple topics
         self.test_transcript = """
         Alice: Good morning everyone. Let's discuss the Q1 results.
@@ -38,31 +61,33 @@ class TestGPTUtils(unittest.TestCase):
     @patch('gpt_utils.client.chat.completions.create')
     def test_process_long_transcription(self, mock_chat):
         """Test the rolling summary process"""
-        # First verify we have enough chunks
-        chunks = chunk_transcription(self.test_transcript, chunk_size=200)
+        # First verify we have enough chunks at a small token budget
+        chunks = list(iter_token_chunks(self.test_transcript, max_tokens=20))
         self.assertTrue(len(chunks) >= 3, f"Test setup error: not enough chunks ({len(chunks)})")
         
-        # Mock responses for each chunk
-        responses = [
-            MockResponse("Q1 results discussed: 15% sales increase"),
-            MockResponse("Marketing budget: 20% increase proposed"),
-            MockResponse("Hiring: 5 open positions, focus on senior dev")
-        ]
-        
-        # Configure mock to return responses in sequence
-        mock_chat.side_effect = responses
+        # Mock a summary for each chunk based on the topic it covers
+        topics = {
+            "Q1": "Q1 results discussed: 15% sales increase",
+            "marketing": "Marketing budget: 20% increase proposed",
+            "hiring": "Hiring: 5 open positions, focus on senior dev"
+        }
+
+        def summarize(**kwargs):
+            chunk = kwargs["messages"][-1]["content"]
+            return MockResponse("; ".join(s for topic, s in topics.items() if topic in chunk) or "Discussion continued")
+
+        mock_chat.side_effect = summarize
         
-        result = process_long_transcription(self.test_transcript)
+        result = process_long_transcription(self.test_transcript, max_tokens=20)
         
         # Print debug information
         print(f"\nNumber of chunks: {len(chunks)}")
         print(f"Mock call count: {mock_chat.call_count}")
-        print(f"Expected responses: {len(responses)}")
         print(f"Result: {result}")
         
         # Verify the mock was called the expected number of times
-        self.assertEqual(mock_chat.call_count, len(responses), 
-                        f"Expected {len(responses)} calls, got {mock_chat.call_count}")
+        self.assertEqual(mock_chat.call_count, len(chunks), 
+                        f"Expected {len(chunks)} calls, got {mock_chat.call_count}")
         
         # Verify all parts of the rolling summary are present
         for expected_text in ["Q1 results", "Marketing budget", "Hiring"]:
@@ -97,5 +122,258 @@ class TestGPTUtils(unittest.TestCase):
         self.assertIn("Marketing Updates", result)
         self.assertIn("Hiring Plans", result)
 
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_incremental_minutes_only_summarizes_new_chunks(self, mock_chat):
+        """Test that repeated updates reuse stored chunk summaries"""
+        mock_chat.return_value = MockResponse("summary")
+        minutes = IncrementalMinutes(max_tokens=15)
+        transcript = Transcript()
+        for i in range(10):
+            transcript.append(f"Speaker {i}: point number {i} about the roadmap.", i + 1.0, 0.9)
+
+        minutes.update(transcript)
+        first_chunks = len(list(iter_token_chunks(transcript.text().split("\n"), max_tokens=15)))
+        # Every complete chunk plus the minutes call, at most
+        self.assertLessEqual(mock_chat.call_count, first_chunks + 1)
+
+        # Adding one line should cost at most one or two new chunk summaries plus the minutes call
+        for i in range(10, 20):
+            transcript.append(f"Speaker {i}: point number {i} about the roadmap.", i + 1.0, 0.9)
+            mock_chat.reset_mock()
+            result = minutes.update(transcript)
+            self.assertEqual(result, "summary")
+            self.assertLessEqual(mock_chat.call_count, 3)
+
+        # Re-running on an unchanged transcript is served entirely from the cache
+        mock_chat.reset_mock()
+        minutes.update(transcript)
+        self.assertEqual(mock_chat.call_count, 0)
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_incremental_minutes_keys_summaries_by_chunk_text(self, mock_chat):
+        """Test that a replaced transcript only resummarizes the chunks whose text changed"""
+        mock_chat.return_value = MockResponse("summary")
+        self.cache.bypass = True  # Count the summaries this class avoids, not the ones the response cache would
+        minutes = IncrementalMinutes(max_tokens=15)
+        lines = [f"Speaker {i}: point number {i} about the roadmap." for i in range(12)]
+        transcript = Transcript()
+        for i, line in enumerate(lines):
+            transcript.append(line, i + 1.0, 0.9)
+        minutes.update(transcript)
+        old_chunks = set(minutes.chunks)
+
+        # Same opening, different ending, and shorter, so the minutes start over
+        replaced = Transcript()
+        for i, line in enumerate(lines[:6] + ["Speaker 9: something else entirely."]):
+            replaced.append(line, i + 1.0, 0.9)
+        mock_chat.reset_mock()
+        minutes.update(replaced)
+        changed = [chunk for chunk in minutes.chunks if chunk not in old_chunks]
+        self.assertLess(len(changed), len(minutes.chunks))
+        # The changed chunks plus the minutes call
+        self.assertEqual(mock_chat.call_count, len(changed) + 1)
+        self.assertEqual(len(minutes.chunk_summaries), len(set(minutes.chunks)))
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_repeated_question_uses_cache(self, mock_chat):
+        """Test that an identical question and context is only sent to the API once"""
+        mock_chat.return_value = MockResponse("Friday")
+
+        first = get_gpt_response("When do we ship?", self.test_transcript)
+        second = get_gpt_response("When do we ship?", self.test_transcript)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_chat.call_count, 1)
+        self.assertEqual(self.cache.stats()["memory_hits"], 1)
+
+        # A different context is a different request
+        get_gpt_response("When do we ship?", "")
+        self.assertEqual(mock_chat.call_count, 2)
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_llm_metrics_are_labelled_with_the_user(self, mock_chat):
+        """Test that call counts and durations carry the session's user"""
+        mock_chat.return_value = MockResponse("Friday")
+        key = ("response", "ok", "alice")
+        before = llm_calls.values.get(key, 0)
+
+        get_gpt_response("When do we ship?", "", user="alice")
+
+        self.assertEqual(llm_calls.values[key], before + 1)
+        self.assertIn(("llm:response", "alice"), stage_seconds.values)
+
+    def test_token_chunks_keep_whole_lines(self):
+        """Test that token chunks respect the budget without cutting lines"""
+        count_words = lambda text: len(text.split())
+        chunks = list(iter_token_chunks(self.test_transcript, max_tokens=25, count_tokens=count_words))
+        lines = [line.strip() for line in self.test_transcript.split("\n") if line.strip()]
+
+        self.assertLess(len(chunks), len(chunk_transcription(self.test_transcript, chunk_size=100)))
+        for chunk in chunks:
+            self.assertLessEqual(count_words(chunk), 25)
+        # Every chunk is made of whole transcript lines, in order
+        self.assertEqual([line for chunk in chunks for line in chunk.split("\n")], lines)
+
+    def test_token_chunks_split_long_lines_and_overlap(self):
+        """Test sentence splitting of over-budget lines and overlap between chunks"""
+        count_words = lambda text: len(text.split())
+        long_line = "Alice: We reviewed the launch plan. Marketing starts Monday. Sales follows on Friday with the new pricing."
+        chunks = list(iter_token_chunks([long_line], max_tokens=8, count_tokens=count_words))
+        self.assertEqual(chunks[0], "Alice: We reviewed the launch plan.")
+        self.assertTrue(all(count_words(chunk) <= 8 for chunk in chunks))
+        self.assertEqual(" ".join(chunks), long_line)
+
+        lines = [f"line {i} words here" for i in range(6)]
+        chunks = list(iter_token_chunks(lines, max_tokens=8, overlap_tokens=4, count_tokens=count_words))
+        # The last line of each chunk is repeated at the start of the next
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.split("\n")[-1], current.split("\n")[0])
+
+    def test_token_chunker_is_incremental(self):
+        """Test that feeding lines one at a time gives the same chunks as a single pass"""
+        lines = [f"Speaker {i % 3}: item {i} is on track." for i in range(30)]
+        chunker = TokenChunker(max_tokens=30)
+        streamed = []
+        for line in lines:
+            streamed.extend(chunker.feed(line))
+        streamed.append(chunker.flush())
+        self.assertEqual(streamed, list(iter_token_chunks(lines, max_tokens=30)))
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_parallel_summaries_keep_chunk_order(self, mock_chat):
+        """Test that concurrent chunk summaries are joined in transcript order and overlap in time"""
+        def slow_summary(**kwargs):
+            time.sleep(0.1)
+            chunk = kwargs["messages"][-1]["content"].split("\n", 1)[1]
+            return MockResponse(f"summary of {chunk[:12]}")
+
+        mock_chat.side_effect = slow_summary
+        transcript = "\n".join(f"Line {i:02d} " + "word " * 40 for i in range(8))
+        chunks = list(iter_token_chunks(transcript, max_tokens=60))
+
+        started = time.monotonic()
+        result = process_long_transcription(transcript, max_workers=8, max_tokens=60)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(result.split("\n"), [f"summary of {chunk[:12]}" for chunk in chunks])
+        # Sequential calls would take at least 0.1s per chunk
+        self.assertLess(elapsed, 0.1 * len(chunks) / 2)
+
+    @patch('gpt_utils.time.sleep')
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_rate_limit_is_retried_with_backoff(self, mock_chat, mock_sleep):
+        """Test that rate-limit errors are retried before giving up"""
+        rate_limited = RateLimitError("rate limited", response=MagicMock(status_code=429), body=None)
+        mock_chat.side_effect = [rate_limited, rate_limited, MockResponse("Q1 results")]
+
+        self.assertEqual(summarize_chunk("Alice: Q1 results"), "Q1 results")
+        self.assertEqual(mock_chat.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertIn("timeout", mock_chat.call_args.kwargs)
+
+        mock_chat.reset_mock()
+        mock_chat.side_effect = rate_limited
+        self.assertTrue(summarize_chunk("Bob: hiring").startswith("Error summarizing chunk"))
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_streamed_response_is_cached(self, mock_chat):
+        """Test tokens are yielded as they arrive and the full answer is then served from the cache"""
+        stream = MockStream(["We ", "ship ", "Friday."])
+        mock_chat.return_value = stream
+
+        self.assertEqual(list(stream_gpt_response("When do we ship?", self.test_transcript)), ["We ", "ship ", "Friday."])
+        self.assertTrue(mock_chat.call_args.kwargs["stream"])
+        self.assertTrue(stream.closed)
+
+        self.assertEqual(get_gpt_response("When do we ship?", self.test_transcript), "We ship Friday.")
+        self.assertEqual(list(stream_gpt_response("When do we ship?", self.test_transcript)), ["We ship Friday."])
+        self.assertEqual(mock_chat.call_count, 1)
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_closing_a_stream_cancels_it(self, mock_chat):
+        """Test a client going away closes the upstream stream and caches nothing"""
+        stream = MockStream(["one ", "two ", "three"])
+        mock_chat.return_value = stream
+
+        tokens = stream_gpt_response("Count", "")
+        self.assertEqual(next(tokens), "one ")
+        tokens.close()
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_questions_are_answered_in_one_call(self, mock_chat):
+        """Test pending questions share one JSON completion, answers matched back by number"""
+        mock_chat.return_value = MockResponse('{"answers": [{"id": 2, "answer": "20%"}, {"id": 1, "answer": "Friday"}]}')
+
+        answers = answer_questions(["When do we ship?", "How much is the budget increase?"], self.test_transcript)
+        self.assertEqual(answers, ["Friday", "20%"])
+        self.assertEqual(mock_chat.call_count, 1)
+        self.assertEqual(mock_chat.call_args.kwargs["response_format"], {"type": "json_object"})
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_unparseable_batch_falls_back_to_single_calls(self, mock_chat):
+        """Test questions missing from a bad batch reply are answered one at a time"""
+        mock_chat.side_effect = [MockResponse('{"answers": [{"id": 1, "answer": "Friday"}'),
+                                 MockResponse("Friday"), MockResponse("20%")]
+
+        answers = answer_questions(["When do we ship?", "How much is the budget increase?"], self.test_transcript)
+        self.assertEqual(answers, ["Friday", "20%"])
+        self.assertEqual(mock_chat.call_count, 3)
+        self.assertNotIn("response_format", mock_chat.call_args.kwargs)
+
+    def test_validate_against_schema(self):
+        """Test replies are cleaned to the schema, with optional fields defaulting to null"""
+        reply = {"minutes": ["Ship Friday"], "action_items": [{"task": "Update checklist", "extra": 1}],
+                 "open_questions": [], "confidence": 0.9}
+        self.assertEqual(validate(reply, ANALYSIS_SCHEMA), {
+            "minutes": ["Ship Friday"],
+            "action_items": [{"task": "Update checklist", "owner": None, "due": None}],
+            "open_questions": []})
+        with self.assertRaisesRegex(ValueError, r"reply.action_items\[0\].task"):
+            validate({"minutes": [], "action_items": [{"owner": "Maria"}], "open_questions": []}, ANALYSIS_SCHEMA)
+        with self.assertRaisesRegex(ValueError, "reply.minutes should be a list"):
+            validate({"minutes": "Ship Friday"}, ANALYSIS_SCHEMA)
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_meeting_analysis_merges_new_lines(self, mock_chat):
+        """Test each update sends only new lines and merges minutes, action items and open questions"""
+        transcript = Transcript()
+        transcript.append("The release candidate passed the tests.", 5.0, 0.9)
+        transcript.append("Maria will update the checklist.", 9.0, 0.9)
+        mock_chat.return_value = MockResponse(json.dumps({
+            "minutes": ["Release candidate passed tests"],
+            "action_items": [{"task": "Update the checklist", "owner": "Maria", "due": None}],
+            "open_questions": ["Do we ship Friday?"]}))
+        analysis = MeetingAnalysis()
+        self.assertEqual(analysis.update(transcript), ["Do we ship Friday?"])
+
+        transcript.append("The checklist is due Thursday.", 14.0, 0.9)
+        mock_chat.return_value = MockResponse(json.dumps({
+            "minutes": [], "action_items": [{"task": "update the checklist", "due": "Thursday"}],
+            "open_questions": ["Do we ship Friday?"]}))
+        self.assertEqual(analysis.update(transcript), [])
+
+        prompt = mock_chat.call_args.kwargs["messages"][-1]["content"]
+        self.assertIn("The checklist is due Thursday.", prompt)
+        self.assertNotIn("Maria will update", prompt)
+        self.assertEqual(analysis.action_items, [{"task": "Update the checklist", "owner": "Maria", "due": "Thursday"}])
+        self.assertIn("- [ ] Update the checklist (owner: Maria, due: Thursday)", analysis.render())
+
+    @patch('gpt_utils.client.chat.completions.create')
+    def test_invalid_analysis_is_retried(self, mock_chat):
+        """Test lines whose reply does not validate are sent again on the next update"""
+        transcript = Transcript()
+        transcript.append("Budget is up 20%.", 3.0, 0.9)
+        mock_chat.return_value = MockResponse('{"minutes": "Budget up"}')
+        analysis = MeetingAnalysis()
+        self.assertEqual(analysis.update(transcript), [])
+        self.assertEqual(analysis.next_seq, 0)
+
+        mock_chat.return_value = MockResponse('{"minutes": ["Budget up 20%"], "action_items": [], "open_questions": []}')
+        analysis.update(transcript)
+        self.assertEqual(analysis.points, ["Budget up 20%"])
+        self.assertEqual(analysis.next_seq, 1)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
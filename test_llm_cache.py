@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from llm_cache import LLMCache, make_key
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestLLMCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+
+    def create(self):
+        self.calls += 1
+        return f"response {self.calls}"
+
+    def test_key_depends_on_model_messages_and_params(self):
+        """Test that the cache key changes with any part of the request"""
+        messages = [{"role": "user", "content": "hi"}]
+        key = make_key("gpt-3.5-turbo", messages, {"temperature": 0.7})
+        self.assertEqual(key, make_key("gpt-3.5-turbo", [dict(m) for m in messages], {"temperature": 0.7}))
+        self.assertNotEqual(key, make_key("gpt-4", messages, {"temperature": 0.7}))
+        self.assertNotEqual(key, make_key("gpt-3.5-turbo", messages, {"temperature": 0.2}))
+        self.assertNotEqual(key, make_key("gpt-3.5-turbo", [{"role": "user", "content": "hello"}], {"temperature": 0.7}))
+
+    def test_hits_misses_and_bypass(self):
+        """Test hit/miss counting and that bypass always calls through"""
+        cache = LLMCache(path="", clock=self.clock)
+        messages = [{"role": "user", "content": "hi"}]
+
+        self.assertEqual(cache.get_or_create("m", messages, {}, self.create), "response 1")
+        self.assertEqual(cache.get_or_create("m", messages, {}, self.create), "response 1")
+        self.assertEqual(cache.get_or_create("m", messages, {}, self.create, bypass=True), "response 2")
+        self.assertEqual(self.calls, 2)
+
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = LLMCache(max_entries=2, path="", clock=self.clock)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are misses"""
+        cache = LLMCache(ttl=60, path="", clock=self.clock)
+        cache.set("a", "A")
+        self.clock.now += 59
+        self.assertEqual(cache.get("a"), "A")
+        self.clock.now += 2
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_disk_tier_survives_new_instance(self):
+        """Test that a fresh cache instance is served from the SQLite file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            LLMCache(path=path, clock=self.clock).set("a", "A")
+
+            cache = LLMCache(path=path, clock=self.clock)
+            self.assertEqual(cache.get("a"), "A")
+            self.assertEqual(cache.get("a"), "A")
+            stats = cache.stats()
+            self.assertEqual(stats["disk_hits"], 1)
+            self.assertEqual(stats["memory_hits"], 1)
+
+            self.clock.now += cache.ttl + 1
+            self.assertIsNone(LLMCache(path=path, clock=self.clock).get("a"))
+
+    def test_failed_create_is_not_cached(self):
+        """Test that exceptions from the API are not stored"""
+        cache = LLMCache(path="", clock=self.clock)
+
+        def fail():
+            raise RuntimeError("rate limited")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_create("m", [], {}, fail)
+        self.assertEqual(cache.get_or_create("m", [], {}, self.create), "response 1")
+
+if __name__ == '__main__':
+    unittest.main()
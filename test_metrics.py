@@ -0,0 +1,67 @@
+import unittest
+from metrics import Registry, StageTimings, format_report
+
+class TestStageTimings(unittest.TestCase):
+    def test_report_percentiles(self):
+        """Test counts and totals cover everything while percentiles use the recent window"""
+        timings = StageTimings(window=100)
+        for i in range(1, 201):
+            timings.observe("llm", i / 1000)
+        row = timings.report()["llm"]
+        self.assertEqual(row["count"], 200)
+        self.assertAlmostEqual(row["total"], sum(range(1, 201)) / 1000)
+        self.assertAlmostEqual(row["p50"], 0.1505)
+        self.assertAlmostEqual(row["max"], 0.2)
+
+    def test_timed_and_timed_iter(self):
+        """Test block timing and per-item arrival timing"""
+        timings = StageTimings()
+        with timings.timed("storage"):
+            pass
+        self.assertEqual(list(timings.timed_iter("recognizer", iter([1, 2, 3]))), [1, 2, 3])
+        report = timings.report()
+        self.assertEqual(report["storage"]["count"], 1)
+        self.assertEqual(report["recognizer"]["count"], 3)
+        self.assertIn("recognizer", format_report(report))
+
+    def test_timed_records_failures(self):
+        timings = StageTimings()
+        with self.assertRaises(ValueError):
+            with timings.timed("answer"):
+                raise ValueError
+        self.assertEqual(timings.report()["answer"]["count"], 1)
+
+
+class TestRegistry(unittest.TestCase):
+    def test_counter_and_collector(self):
+        registry = Registry()
+        calls = registry.counter("calls_total", "Calls", ("function",))
+        calls.inc(function="minutes")
+        calls.inc(2, function="minutes")
+        registry.collector(lambda: [("depth", "gauge", "Queue depth", [({"user": 'a"b'}, 3)])])
+        text = registry.render()
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{function="minutes"} 3', text)
+        self.assertIn('depth{user="a\\"b"} 3', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            latency.observe(value, stage="llm")
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{stage="llm",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="llm",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{stage="llm",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{stage="llm"} 4', text)
+
+    def test_timings_feed_histogram(self):
+        registry = Registry()
+        histogram = registry.histogram("stage_seconds", "Stages", ("stage", "user"))
+        timings = StageTimings(histogram=histogram)
+        timings.observe("answer", 0.2, user="alice")
+        self.assertIn('stage_seconds_count{stage="answer",user="alice"} 1', registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
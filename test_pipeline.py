@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+from pipeline import SessionPipeline, CoalescingScheduler
+
+class TestSessionPipeline(unittest.TestCase):
+    def setUp(self):
+        # Each test holds the single worker on this gate so the queue contents are predictable
+        self.gate = threading.Event()
+        self.ran = []
+
+    def tearDown(self):
+        self.gate.set()
+
+    def blocker(self):
+        self.gate.wait(5)
+
+    def record(self, value):
+        self.ran.append(value)
+
+    def start_pipeline(self, **kwargs):
+        pipeline = SessionPipeline("test", workers=1, **kwargs)
+        pipeline.submit(self.blocker)
+        # Wait until the worker has picked up the blocking task
+        deadline = time.monotonic() + 2
+        while pipeline.depth() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return pipeline
+
+    def test_keyed_tasks_are_coalesced(self):
+        """Test that pending tasks with the same key collapse into the latest one"""
+        pipeline = self.start_pipeline()
+        for i in range(5):
+            pipeline.submit(self.record, i, key="minutes")
+        self.assertEqual(pipeline.depth(), 1)
+
+        self.gate.set()
+        pipeline.stop(drain=True, timeout=2)
+        self.assertEqual(self.ran, [4])
+        self.assertEqual(pipeline.stats()["coalesced"], 4)
+
+    def test_drop_oldest_when_full(self):
+        """Test that a full queue drops its oldest task instead of blocking the producer"""
+        pipeline = self.start_pipeline(max_depth=3, overflow="drop_oldest")
+        started = time.monotonic()
+        for i in range(6):
+            self.assertTrue(pipeline.submit(self.record, i))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        self.gate.set()
+        pipeline.stop(drain=True, timeout=2)
+        self.assertEqual(self.ran, [3, 4, 5])
+        self.assertEqual(pipeline.stats()["dropped"], 3)
+
+    def test_drop_newest_when_full(self):
+        """Test that the drop_newest policy rejects new work once full"""
+        pipeline = self.start_pipeline(max_depth=2, overflow="drop_newest")
+        results = [pipeline.submit(self.record, i) for i in range(4)]
+        self.assertEqual(results, [True, True, False, False])
+
+        self.gate.set()
+        pipeline.stop(drain=True, timeout=2)
+        self.assertEqual(self.ran, [0, 1])
+
+    def test_failed_task_does_not_stop_worker(self):
+        """Test that an exception in one task is counted and later tasks still run"""
+        pipeline = SessionPipeline("test", workers=1)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        pipeline.submit(fail)
+        pipeline.submit(self.record, "after")
+        pipeline.stop(drain=True, timeout=2)
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(self.ran, ["after"])
+        self.assertFalse(pipeline.submit(self.record, "late"))
+
+class TestCoalescingScheduler(unittest.TestCase):
+    def setUp(self):
+        self.runs = []
+        self.lock = threading.Lock()
+
+    def callback(self):
+        with self.lock:
+            self.runs.append(time.monotonic())
+        time.sleep(0.05)
+
+    def test_burst_collapses_into_one_run(self):
+        """Test that a burst of requests inside the debounce window costs one run"""
+        scheduler = CoalescingScheduler("test", self.callback, min_interval=0.1, debounce=0.1, max_staleness=1.0)
+        for _ in range(10):
+            scheduler.request()
+            time.sleep(0.005)
+        time.sleep(0.4)
+        scheduler.stop(flush=False, timeout=1)
+        self.assertEqual(len(self.runs), 1)
+        self.assertEqual(scheduler.stats()["requested"], 10)
+
+    def test_max_staleness_bounds_continuous_requests(self):
+        """Test that steady requests still trigger runs once max_staleness passes"""
+        scheduler = CoalescingScheduler("test", self.callback, min_interval=0.05, debounce=0.2, max_staleness=0.15)
+        started = time.monotonic()
+        while time.monotonic() - started < 0.6:
+            scheduler.request()
+            time.sleep(0.02)
+        scheduler.stop(flush=False, timeout=1)
+        # Without the staleness cap the debounce would never expire during the loop
+        self.assertGreaterEqual(len(self.runs), 2)
+        self.assertLess(self.runs[0] - started, 0.3)
+
+    def test_one_in_flight_with_trailing_rerun(self):
+        """Test that requests during a run produce exactly one trailing run"""
+        release = threading.Event()
+        entered = threading.Event()
+
+        def slow_callback():
+            self.runs.append(time.monotonic())
+            entered.set()
+            release.wait(2)
+
+        scheduler = CoalescingScheduler("test", slow_callback, min_interval=0.0, debounce=0.0, max_staleness=0.0)
+        scheduler.request()
+        self.assertTrue(entered.wait(1))
+        for _ in range(5):
+            scheduler.request()
+        self.assertTrue(scheduler.stats()["in_flight"])
+        self.assertEqual(len(self.runs), 1)
+
+        release.set()
+        time.sleep(0.2)
+        scheduler.stop(flush=False, timeout=1)
+        self.assertEqual(len(self.runs), 2)
+
+    def test_stop_flushes_pending_request(self):
+        """Test that stopping with flush runs a pending request immediately"""
+        scheduler = CoalescingScheduler("test", self.callback, min_interval=10, debounce=10, max_staleness=10)
+        scheduler.request()
+        scheduler.stop(flush=True, timeout=1)
+        self.assertEqual(len(self.runs), 1)
+
+if __name__ == '__main__':
+    unittest.main()
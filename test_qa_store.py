@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from qa_store import QAStore
+
+class TestQAStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "questions_answers.jsonl")
+        self.store = QAStore(self.path)
+
+    def add(self, count, start=0):
+        for i in range(start, start + count):
+            self.store.append({"question": f"Question {i}?", "answer": f"Answer {i}", "timestamp": f"00:{i:02d}"})
+
+    def test_since_returns_new_entries_newest_first(self):
+        """Test cursor-based reads of only the entries added since"""
+        self.add(3)
+        entries, cursor = self.store.since(0)
+        self.assertEqual([e["question"] for e in entries], ["Question 2?", "Question 1?", "Question 0?"])
+        self.assertEqual(cursor, 3)
+
+        self.add(2, start=3)
+        entries, cursor = self.store.since(cursor)
+        self.assertEqual([e["question"] for e in entries], ["Question 4?", "Question 3?"])
+        self.assertEqual(cursor, 5)
+        self.assertEqual(self.store.since(cursor), ([], 5))
+
+    def test_file_is_only_appended(self):
+        """Test that every entry is one JSON line and earlier bytes never change"""
+        self.add(2)
+        with open(self.path, "rb") as file:
+            before = file.read()
+        self.add(1, start=2)
+        with open(self.path, "rb") as file:
+            after = file.read()
+        self.assertTrue(after.startswith(before))
+        self.assertEqual([json.loads(line)["answer"] for line in after.splitlines()], ["Answer 0", "Answer 1", "Answer 2"])
+
+    def test_partial_line_is_not_indexed(self):
+        """Test that a half-written entry is invisible until it is complete"""
+        self.add(1)
+        with open(self.path, "ab") as file:
+            file.write(b'{"question": "Half')
+        self.assertEqual(self.store.count(), 1)
+        with open(self.path, "ab") as file:
+            file.write(b' written?", "answer": "Yes", "timestamp": "00:09"}\n')
+        self.assertEqual(self.store.since(1)[0][0]["question"], "Half written?")
+
+    def test_new_instance_rebuilds_index_and_clear_resets(self):
+        """Test reopening an existing log and clearing it"""
+        self.add(4)
+        reopened = QAStore(self.path)
+        self.assertEqual(reopened.count(), 4)
+
+        reopened.clear()
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(self.store.since(4), ([], 0))
+
+    def test_concurrent_appends(self):
+        """Test that appends from several threads all land as whole lines"""
+        threads = [threading.Thread(target=self.add, args=(25, i * 25)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        entries, cursor = QAStore(self.path).since(0)
+        self.assertEqual(cursor, 100)
+        self.assertEqual(len({e["question"] for e in entries}), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from questions import QuestionQueue, normalize_question
+
+class TestQuestionQueue(unittest.TestCase):
+    def test_restated_questions_are_dropped(self):
+        """Test exact, normalized and near-duplicate restatements are not queued again"""
+        queue = QuestionQueue(similarity=0.8)
+        self.assertTrue(queue.add("Can we ship on Friday?"))
+        self.assertFalse(queue.add("can we ship on friday"))
+        self.assertFalse(queue.add("So can we ship it Friday?"))
+        self.assertTrue(queue.add("Can we ship on Monday?"))
+        self.assertTrue(queue.add("Why?"))
+        self.assertFalse(queue.add("Why?"))
+        self.assertEqual(queue.stats()["duplicates"], 3)
+        self.assertEqual(normalize_question("  Why,  not? "), "why not")
+
+    def test_different_questions_are_kept(self):
+        """Test questions differing only in what they ask about are not taken as restatements"""
+        queue = QuestionQueue(similarity=0.8)
+        self.assertTrue(queue.add("When is the demo?"))
+        self.assertTrue(queue.add("Where is the demo?"))
+        self.assertTrue(queue.add("Who is doing this?"))
+        self.assertTrue(queue.add("Why is he doing this?"))
+        self.assertFalse(queue.add("So when is the demo?"))
+        self.assertEqual(queue.stats()["duplicates"], 1)
+
+    def test_take_returns_batches(self):
+        queue = QuestionQueue(batch_max=2)
+        for i in range(3):
+            queue.add(f"Question number {i} about topic {i}?", timestamp=f"00:0{i}")
+        self.assertEqual([q.text for q in queue.take()], ["Question number 0 about topic 0?", "Question number 1 about topic 1?"])
+        self.assertEqual([q.timestamp for q in queue.take()], ["00:02"])
+        self.assertEqual(queue.take(), [])
+        self.assertEqual(queue.stats()["batches"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
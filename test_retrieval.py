@@ -0,0 +1,95 @@
+import unittest
+from retrieval import TranscriptIndex, tokenize
+
+class TestTranscriptIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TranscriptIndex()
+        self.lines = [
+            "Alice: Good morning everyone. Let's discuss the Q1 results.",
+            "Bob: Sales are up 15% from last quarter.",
+            "Alice: Moving on to the marketing budget.",
+            "Bob: We need to increase the marketing budget by 20%.",
+            "Charlie: I agree, especially for digital campaigns.",
+            "Alice: Finally, let's talk about hiring.",
+            "Bob: We have 5 open positions.",
+            "Charlie: Let's prioritize the senior developer role.",
+        ]
+        for line in self.lines:
+            self.index.add(line)
+
+    def test_tokenize_drops_stopwords(self):
+        """Test that stopwords and punctuation are removed"""
+        self.assertEqual(tokenize("What is the Q1 budget?"), ["q1", "budget"])
+
+    def test_search_ranks_relevant_lines(self):
+        """Test that BM25 puts the lines about the query first"""
+        hits = self.index.search("marketing budget", k=3)
+        self.assertEqual({i for i, _ in hits[:2]}, {2, 3})
+        self.assertTrue(all(score > 0 for _, score in hits))
+        self.assertEqual(self.index.search("unrelated words"), [])
+
+    def test_index_is_incremental(self):
+        """Test that lines added later are searchable immediately"""
+        line_id = self.index.add("Dana: The launch moves to Friday.")
+        self.assertEqual(self.index.search("launch Friday")[0][0], line_id)
+        for i in range(200):
+            self.index.add(f"Filler line number {i} about nothing much.")
+        self.assertEqual(self.index.search("launch")[0][0], line_id)
+
+    def test_context_has_tail_and_hits_within_budget(self):
+        """Test that context keeps recent lines plus matches, in order, under the token budget"""
+        for i in range(300):
+            self.index.add(f"Erin: status update {i} on the infrastructure migration.")
+
+        context = self.index.build_context("marketing budget", max_tokens=200, tail_lines=3)
+        lines = context.split("\n")
+
+        self.assertIn(self.lines[3], lines)
+        self.assertEqual(lines[-1], "Erin: status update 299 on the infrastructure migration.")
+        self.assertNotIn("Erin: status update 10 on the infrastructure migration.", lines)
+        self.assertIn("...", lines)
+        # Lines come back in transcript order
+        self.assertLess(lines.index(self.lines[3]), lines.index(lines[-1]))
+        self.assertLessEqual(sum(len(line) for line in lines) // 4, 220)
+
+    def test_display_line_differs_from_indexed_text(self):
+        """Test that metadata in the stored line is not indexed"""
+        index = TranscriptIndex()
+        index.add("Ship it on Friday?", "Ship it on Friday? (Confidence: 0.93) (Time Stamp: 01:02)")
+        self.assertEqual(index.search("confidence"), [])
+        self.assertIn("Time Stamp: 01:02", index.build_context("friday"))
+
+    def test_lines_resolved_by_id(self):
+        """Test that an index with a resolver keeps no lines and builds the same context through it"""
+        requested = []
+        def resolve(ids):
+            requested.append(ids)
+            return [self.lines[i] for i in ids]
+        index = TranscriptIndex(resolve=resolve)
+        for line in self.lines:
+            index.add(line)
+
+        self.assertEqual(index.lines, [])
+        self.assertEqual(index.build_context("marketing budget", max_tokens=200, tail_lines=2),
+                         self.index.build_context("marketing budget", max_tokens=200, tail_lines=2))
+        self.assertEqual(requested[0], sorted(requested[0]))
+
+    def test_oldest_lines_are_forgotten(self):
+        """Test that past max_lines the oldest lines stop being searched, keeping their ids"""
+        index = TranscriptIndex(max_lines=6)
+        for line in self.lines:
+            index.add(line)
+        recent = TranscriptIndex()
+        for line in self.lines[3:]:
+            recent.add(line)
+
+        # The seventh line went over the limit of six, so the oldest three were forgotten
+        self.assertEqual((index.base, len(index)), (3, 8))
+        self.assertEqual(index.search("Q1 results"), [])
+        self.assertEqual([(i - 3, score) for i, score in index.search("marketing budget hiring")],
+                         recent.search("marketing budget hiring"))
+        # Earlier lines of the meeting exist, so the context starts with a gap
+        self.assertEqual(index.build_context("hiring"), "...\n" + recent.build_context("hiring"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from sessions import SessionRegistry
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class Session:
+    def __init__(self, key):
+        self.key = key
+        self.busy = False
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_idle_states_expire(self):
+        """Test that states unused for the TTL are evicted unless still busy"""
+        clock = FakeClock()
+        sessions = SessionRegistry(Session, lambda state: not state.busy, ttl=60, max_states=10, clock=clock)
+        first = sessions.get("a")
+        sessions.get("b").busy = True
+        self.assertIs(sessions.get("a"), first)
+
+        clock.now = 100
+        sessions.get("c")
+        self.assertNotIn("a", sessions)
+        self.assertIn("b", sessions)
+
+        # A busy state is only evicted once it is idle again
+        sessions.get("c").busy = False
+        next(state for key, state in sessions.items() if key == "b").busy = False
+        clock.now = 200
+        sessions.get("c")
+        self.assertEqual([key for key, _ in sessions.items()], ["c"])
+        self.assertIsNot(sessions.get("a"), first)
+        self.assertEqual(sessions.stats(), {"created": 4, "evicted": 2, "states": 2})
+
+    def test_least_recently_used_beyond_capacity(self):
+        """Test that the least recently used idle states go first when over capacity"""
+        sessions = SessionRegistry(Session, lambda state: not state.busy, ttl=3600, max_states=2,
+                                   clock=FakeClock())
+        sessions.get("a").busy = True
+        sessions.get("b")
+        sessions.get("a")
+        sessions.get("c")
+        self.assertEqual([key for key, _ in sessions.items()], ["a", "c"])
+        sessions.get("d")
+        # "a" is the least recently used but busy, so "c" goes instead
+        self.assertEqual([key for key, _ in sessions.items()], ["a", "d"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+import speech_utils
+from audio_capture import tone
+from speech_backends import Recognizer, ScriptedRecognizer, SignalSource, load_script
+from storage import get_storage
+
+RATE = 16000
+
+def chunks(seconds, chunk=1600):
+    return (b"\x01\x00" * chunk for _ in range(int(seconds * RATE / chunk)))
+
+class TestScriptedRecognizer(unittest.TestCase):
+    def test_results_follow_the_audio(self):
+        """Test interim and final results arrive once enough audio has been heard"""
+        recognizer = ScriptedRecognizer([{"at": 1.0, "text": "hello there team"}, {"at": 2.0, "text": "bye"}], rate=RATE)
+        results = [r.results[0] for r in recognizer.stream(chunks(2.5))]
+        self.assertEqual([(r.is_final, r.alternatives[0].transcript) for r in results],
+                         [(False, "hello"), (True, "hello there team"), (True, "bye")])
+        self.assertEqual([r.result_end_time.total_seconds() for r in results], [0.5, 1.0, 2.0])
+
+    def test_script_continues_in_the_next_stream(self):
+        """Test a script cut by the end of one stream carries on in the next, with stream-relative offsets"""
+        recognizer = ScriptedRecognizer([{"at": 0.5, "text": "one"}, {"at": 1.5, "text": "two"}], rate=RATE)
+        first = [r.results[0].alternatives[0].transcript for r in recognizer.stream(chunks(1))]
+        second = [r.results[0] for r in recognizer.stream(chunks(1))]
+        self.assertEqual(first, ["one"])
+        self.assertEqual(second[0].alternatives[0].transcript, "two")
+        self.assertEqual(second[0].result_end_time.total_seconds(), 0.5)
+
+    def test_load_script_formats(self):
+        """Test JSON Lines, saved transcript lines and plain lines all load with increasing times"""
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+            file.write('{"at": 2, "text": "Scripted."}\n')
+            file.write("Saved line. (Confidence: 0.80) (Time Stamp: 00:05)\n")
+            file.write("Plain line with five words.\n")
+        self.addCleanup(os.remove, file.name)
+        script = load_script(file.name)
+        self.assertEqual([e["text"] for e in script], ["Scripted.", "Saved line.", "Plain line with five words."])
+        self.assertEqual([e["at"] for e in script], [2.0, 5.0, 7.0])
+        self.assertEqual(script[1]["confidence"], 0.8)
+
+    def test_incomplete_backend_fails_when_constructed(self):
+        """Test a recognizer without stream() cannot be created"""
+        class Incomplete(Recognizer):
+            pass
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class TestTranscribeStreamingOffline(unittest.TestCase):
+    def test_live_path_with_fake_backend(self):
+        """Test the whole live path (capture, VAD, rollover, processing, storage) without a device or credentials"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        user_dir = directory.name
+        script = [{"at": 1.0, "text": "Welcome to the weekly release planning meeting."}, {"at": 2.0, "text": "Can we ship on Friday?"},
+                  {"at": 2.5, "text": "So can we ship it Friday?"}]
+
+        with patch("speech_utils.answer_questions", return_value=["Yes."]) as gpt, \
+                patch("speech_utils.notify_frontend_update"), patch("speech_utils.update_meeting_minutes"):
+            speech_utils.transcribe_streaming(
+                user_dir, ScriptedRecognizer(script, rate=RATE), SignalSource(tone(3, rate=RATE), realtime=False))
+            state = speech_utils.get_user_state(user_dir)
+            speech_utils.stop_transcription(user_dir)
+            state.pipeline.stop(drain=True, timeout=5)
+
+        storage = get_storage(user_dir)
+        self.assertEqual([s.text for s in storage.read_segments(0)[0]], [e["text"] for e in script])
+        # Time stamps follow the audio even though it was fed faster than real time
+        self.assertEqual([s.clock() for s in state.transcript], ["00:01", "00:02", "00:02"])
+        for segment, entry in zip(state.transcript, script):
+            self.assertAlmostEqual(segment.end, entry["at"], delta=0.25)
+        self.assertEqual([item["question"] for item in storage.read_qa(0)[0]], ["Can we ship on Friday?"])
+        gpt.assert_called_once()  # The restated question is not answered again
+        self.assertEqual(storage.load_document("meeting_minutes")["tier"], "extractive")
+
+    def test_long_silence_keeps_the_stream_open(self):
+        """Test a pause longer than the service's audio timeout neither closes the stream nor loses speech"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        user_dir = directory.name
+        speed = 20  # 34 s of audio in under 2 s; the 10 s audio timeout scales with it
+        samples = np.concatenate([tone(2, rate=RATE), np.zeros(30 * RATE, dtype=np.int16), tone(2, rate=RATE)])
+        # Gated silence is not heard, so the second line is due soon after the first tone ends
+        script = [{"at": 1.0, "text": "Before the break."}, {"at": 4.0, "text": "After the break."}]
+        recognizer = ScriptedRecognizer(script, rate=RATE, interim=False, audio_timeout=10 / speed)
+
+        with patch("speech_utils.notify_frontend_update"), patch("speech_utils.update_meeting_minutes"):
+            speech_utils.transcribe_streaming(user_dir, recognizer, SignalSource(samples, speed=speed))
+            state = speech_utils.get_user_state(user_dir)
+            speech_utils.stop_transcription(user_dir)
+
+        self.assertGreater(state.vad.stats()["keepalives"], 0)
+        self.assertEqual(recognizer.timeouts, 0)
+        self.assertEqual(state.rollover.stats()["streams"], 1)
+        self.assertEqual([s.text for s in get_storage(user_dir).read_segments(0)[0]], [e["text"] for e in script])
+
+
+class TestFinishSession(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.user_dir = directory.name
+
+    def test_waits_for_queued_work(self):
+        """Test that the previous session's queued answers finish before a new session may start"""
+        done = []
+        pipeline = speech_utils.get_pipeline(self.user_dir)
+        pipeline.submit(lambda: (time.sleep(0.2), done.append(1)), key="first")
+        pipeline.submit(lambda: (time.sleep(0.2), done.append(2)), key="second")
+        self.assertTrue(speech_utils.finish_session(self.user_dir, timeout=5))
+        self.assertEqual(sorted(done), [1, 2])
+
+    def test_drops_work_left_after_timeout(self):
+        """Test that work still queued when the timeout runs out is dropped rather than run later"""
+        release = threading.Event()
+        done = []
+        pipeline = speech_utils.get_pipeline(self.user_dir)
+        pipeline.submit(release.wait, 5, key="questions")
+        time.sleep(0.05)  # Running, so the next task with its key has to wait in the queue
+        pipeline.submit(lambda: done.append(2), key="questions")
+        self.assertFalse(speech_utils.finish_session(self.user_dir, timeout=0.1))
+        release.set()
+        pipeline.stop(timeout=5)
+        self.assertEqual(done, [])
+        self.assertEqual(pipeline.stats()["dropped"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
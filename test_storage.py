@@ -0,0 +1,165 @@
+import os
+import tempfile
+import threading
+import unittest
+from storage import FileStorage, SQLiteStorage
+from transcript import Segment
+
+class StorageContract:
+    """Behaviour every storage backend must share."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage = self.make_storage(self.directory.name)
+
+    def segments(self, count, start=0):
+        return [Segment(i, f"Line {i}.", float(i), float(i + 1), 0.9) for i in range(start, start + count)]
+
+    def test_segments_read_back_by_cursor(self):
+        """Test that batched segments come back in order and cursors only return newer ones"""
+        cursors = self.storage.append_segments(self.segments(3))
+        self.assertEqual(len(cursors), 4)
+        segments, cursor, reset = self.storage.read_segments(0)
+        self.assertEqual([s.text for s in segments], ["Line 0.", "Line 1.", "Line 2."])
+        self.assertEqual(cursor, cursors[-1])
+        self.assertFalse(reset)
+
+        more = self.storage.append_segments(self.segments(2, start=3))
+        self.assertEqual(more[0], cursor)
+        segments, cursor, reset = self.storage.read_segments(cursor)
+        self.assertEqual([s.text for s in segments], ["Line 3.", "Line 4."])
+        self.assertEqual(self.storage.read_segments(cursor), ([], cursor, False))
+
+        # Reading from a cursor inside the batch starts at that segment
+        segments, _, _ = self.storage.read_segments(cursors[1])
+        self.assertEqual(segments[0].text, "Line 1.")
+
+    def test_segment_range_by_sequence_id(self):
+        """Test reading a range of segments by sequence id, with their ids set"""
+        self.storage.append_segments(self.segments(4))
+        self.storage.append_segments(self.segments(2, start=4))
+        self.assertEqual([(s.seq, s.text) for s in self.storage.read_segment_range(1, 4)],
+                         [(1, "Line 1."), (2, "Line 2."), (3, "Line 3.")])
+        self.assertEqual([s.seq for s in self.storage.read_segment_range(4)], [4, 5])
+        self.assertEqual(self.storage.read_segment_range(6, 9), [])
+
+    def test_qa_read_back_newest_first(self):
+        """Test Q&A entries are returned newest first after the cursor"""
+        for i in range(3):
+            self.assertEqual(self.storage.append_qa({"question": f"Q{i}?", "answer": "A", "timestamp": "00:00"}), i + 1)
+        items, cursor, reset = self.storage.read_qa(1)
+        self.assertEqual([item["question"] for item in items], ["Q2?", "Q1?"])
+        self.assertEqual(cursor, 3)
+        self.assertFalse(reset)
+
+    def test_documents(self):
+        """Test documents are replaced and missing ones load as None"""
+        self.assertIsNone(self.storage.load_document("meeting_minutes"))
+        self.storage.save_document("meeting_minutes", {"meeting_minutes": "v1"})
+        self.storage.save_document("meeting_minutes", {"meeting_minutes": "v2"})
+        self.assertEqual(self.storage.load_document("meeting_minutes"), {"meeting_minutes": "v2"})
+
+    def test_reset_invalidates_cursors(self):
+        """Test that after a reset old cursors are reported as reset and everything is empty"""
+        self.storage.append_segments(self.segments(3))
+        self.storage.append_qa({"question": "Q?", "answer": "A", "timestamp": "00:00"})
+        _, cursor, _ = self.storage.read_segments(0)
+        self.storage.reset()
+
+        self.assertEqual(self.storage.read_segments(cursor), ([], 0, True))
+        self.assertEqual(self.storage.read_qa(1), ([], 0, True))
+        self.assertFalse(self.storage.load_document("action_items"))
+
+    def test_cursor_from_earlier_session_is_reset(self):
+        """Test a cursor that is still in range after a reset is reset because its session changed"""
+        self.storage.append_segments(self.segments(2))
+        self.storage.append_qa({"question": "Q?", "answer": "A", "timestamp": "00:00"})
+        session = self.storage.session
+        _, cursor, _ = self.storage.read_segments(0, session)
+        self.storage.reset()
+        self.assertNotEqual(self.storage.session, session)
+        self.storage.append_segments(self.segments(3, start=5))
+        self.storage.append_qa({"question": "New?", "answer": "A", "timestamp": "00:00"})
+        self.storage.append_qa({"question": "Newer?", "answer": "A", "timestamp": "00:00"})
+
+        segments, _, reset = self.storage.read_segments(cursor, session)
+        self.assertTrue(reset)
+        self.assertEqual([s.text for s in segments], ["Line 5.", "Line 6.", "Line 7."])
+        items, _, reset = self.storage.read_qa(1, session)
+        self.assertTrue(reset)
+        self.assertEqual([item["question"] for item in items], ["Newer?", "New?"])
+        self.assertFalse(self.storage.read_qa(1, self.storage.session)[2])
+
+    def test_reader_runs_alongside_writer(self):
+        """Test that a reader thread sees a consistent prefix while another thread writes"""
+        errors = []
+
+        def read():
+            cursor, seen = 0, 0
+            while seen < 50:
+                segments, cursor, _ = self.storage.read_segments(cursor)
+                for segment in segments:
+                    if segment.text != f"Line {seen}.":
+                        errors.append(segment.text)
+                    seen += 1
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(0, 50, 5):
+            self.storage.append_segments(self.segments(5, start=i))
+        reader.join(timeout=10)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(errors, [])
+
+
+class TestFileStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, directory):
+        return FileStorage(directory)
+
+    def test_segment_range_of_existing_file(self):
+        """Test a transcript written before this backend opened is indexed on first use"""
+        self.storage.append_segments(self.segments(3))
+        reopened = FileStorage(self.storage.user_dir)
+        self.assertEqual([(s.seq, s.text) for s in reopened.read_segment_range(2)], [(2, "Line 2.")])
+        reopened.append_segments(self.segments(1, start=3))
+        self.assertEqual([s.text for s in reopened.read_segment_range(1, 3)], ["Line 1.", "Line 2."])
+        self.assertEqual([s.seq for s in reopened.read_segment_range(3)], [3])
+
+    def test_keeps_legacy_transcript_format(self):
+        """Test the transcript file still holds the legacy lines"""
+        self.storage.append_segments(self.segments(1))
+        with open(os.path.join(self.directory.name, "live_transcription.txt")) as file:
+            self.assertEqual(file.read(), "Line 0. (Confidence: 0.90) (Time Stamp: 00:01)\n")
+
+
+class TestSQLiteStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, directory):
+        return SQLiteStorage(os.path.join(directory, "session.sqlite3"), "user1")
+
+    def test_shared_database_keeps_users_apart(self):
+        """Test two users in one database only see their own data"""
+        other = SQLiteStorage(self.storage.path, "user2")
+        self.storage.append_segments(self.segments(2))
+        other.append_segments(self.segments(1, start=7))
+        other.reset()
+        self.assertEqual(len(self.storage.read_segments(0)[0]), 2)
+        self.assertEqual(other.read_segments(0)[0], [])
+
+    def test_reopened_database_continues_sequence(self):
+        """Test a new backend on an existing database picks up the next seq where the old one stopped"""
+        self.storage.append_segments(self.segments(3))
+        self.storage.append_qa({"question": "Q?", "answer": "A", "timestamp": "00:00"})
+        reopened = SQLiteStorage(self.storage.path, "user1")
+        self.assertEqual(reopened.append_segments(self.segments(1, start=3)), [3, 4])
+        self.assertEqual(reopened.append_qa({"question": "Q2?", "answer": "A", "timestamp": "00:00"}), 2)
+        self.assertEqual([s.seq for s in reopened.read_segments(0)[0]], [0, 1, 2, 3])
+
+    def test_uses_wal(self):
+        """Test the database is in write-ahead-log mode"""
+        mode = self.storage._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import datetime
+import queue
+import threading
+import time
+import types
+import unittest
+import numpy as np
+from streaming import StreamRollover
+
+RATE = 1000
+CHUNK = 100  # 0.1 s
+
+def result(transcript, end_seconds, is_final=True):
+    return types.SimpleNamespace(is_final=is_final, result_end_time=datetime.timedelta(seconds=end_seconds),
+                                 alternatives=[types.SimpleNamespace(transcript=transcript, confidence=0.9)])
+
+class FakeRecognizer:
+    """
+    Local stand-in for a streaming recognizer. Every chunk carries one "word"
+    (its sample value); every `per_final` words become a final result. Words
+    still pending when a stream ends are lost, like audio in flight when a
+    real stream is cut.
+    """
+
+    def __init__(self, per_final=3):
+        self.per_final = per_final
+        self.streams = 0
+
+    def streaming_recognize(self, requests):
+        self.streams += 1
+        pending, sent = [], 0
+        for data in requests:
+            samples = np.frombuffer(data, dtype=np.int16)
+            pending.append(int(samples[0]))
+            sent += len(samples)
+            if len(pending) == self.per_final:
+                yield types.SimpleNamespace(results=[result(" ".join(f"w{w}" for w in pending), sent / RATE)])
+                pending = []
+
+class FakeClock:
+    """Advances 0.1 s for every chunk the source hands out, like real-time capture."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def chunks(self, count):
+        for i in range(count):
+            self.now += CHUNK / RATE
+            yield memoryview(np.full(CHUNK, i, dtype=np.int16))
+
+def run(rollover, recognizer):
+    finals = []
+    while not rollover.exhausted:
+        for response in rollover.results(recognizer.streaming_recognize(rollover.next_stream())):
+            finals.extend(r.alternatives[0].transcript for r in response.results if r.is_final)
+    return " ".join(finals).split()
+
+class TestStreamRollover(unittest.TestCase):
+    def test_rollover_loses_no_words(self):
+        """Test that words in flight at every stream boundary are recognized once in the next stream"""
+        clock = FakeClock()
+        recognizer = FakeRecognizer()
+        rollover = StreamRollover(clock.chunks(60), RATE, limit=1.0, replay_seconds=2, clock=clock)
+        words = run(rollover, recognizer)
+
+        self.assertEqual(words, [f"w{i}" for i in range(60)])
+        self.assertGreater(recognizer.streams, 5)
+        stats = rollover.stats()
+        self.assertEqual(stats["rollovers"], recognizer.streams - 1)
+        self.assertGreater(stats["replayed_seconds"], 0)
+
+    def test_without_replay_words_are_lost(self):
+        """Test the failure the replay buffer prevents: plain reconnects drop the words in flight"""
+        clock = FakeClock()
+        rollover = StreamRollover(clock.chunks(60), RATE, limit=1.0, replay_seconds=2, clock=clock)
+        rollover.last_final_end = float("inf")  # Never replay anything
+        rollover.results = lambda responses: responses
+        self.assertLess(len(run(rollover, FakeRecognizer())), 60)
+
+    def test_overlapping_finals_are_dropped(self):
+        """Test finals a new stream repeats from the replayed audio are removed by offset"""
+        clock = FakeClock()
+        rollover = StreamRollover(clock.chunks(10), RATE, limit=0.5, clock=clock)
+        list(rollover.results([types.SimpleNamespace(results=[result("one", 0.3)])]))
+        list(rollover.next_stream())  # Sends 5 chunks and rolls over; 0.3-0.5 s is unfinalized
+
+        stream = rollover.next_stream()
+        self.assertAlmostEqual(rollover.stream_offset / RATE, 0.3)
+        responses = [types.SimpleNamespace(results=[result("one", 0.0), result("partial", 0.1, is_final=False)]),
+                     types.SimpleNamespace(results=[result("two", 0.4)])]
+        kept = [r.alternatives[0].transcript for response in rollover.results(responses) for r in response.results]
+        self.assertEqual(kept, ["partial", "two"])
+        self.assertEqual(rollover.stats()["duplicate_finals"], 1)
+        self.assertEqual(len(list(stream)), 7)  # 2 replayed chunks + the 5 remaining
+
+    def test_recognizer_latency(self):
+        """Test latency is measured from sending the chunk that ends the utterance"""
+        clock = FakeClock()
+        latencies = []
+        rollover = StreamRollover(clock.chunks(10), RATE, limit=0.5, clock=clock, on_latency=latencies.append)
+        list(rollover.next_stream())  # Chunk i is sent at (i + 1) * 0.1 s
+        clock.now = 0.9
+        list(rollover.results([types.SimpleNamespace(results=[result("one", 0.3), result("partial", 0.4, is_final=False)])]))
+        self.assertEqual(len(latencies), 1)
+        self.assertAlmostEqual(latencies[0], 0.6)
+
+    def test_abandoned_stream_hands_its_chunk_over(self):
+        """Test a stream still waiting for audio on another thread passes its chunk to the new stream"""
+        source = queue.Queue()
+        rollover = StreamRollover(iter(source.get, None), RATE)
+        old, new = [], []
+        errors = []
+
+        def consume(stream, received):
+            try:
+                for data in stream:
+                    received.append(int(np.frombuffer(data, dtype=np.int16)[0]))
+            except Exception as e:
+                errors.append(e)
+
+        first = threading.Thread(target=consume, args=(rollover.next_stream(), old), daemon=True)
+        first.start()
+        source.put(np.full(CHUNK, 0, dtype=np.int16).tobytes())
+        while not old:
+            time.sleep(0.01)
+        time.sleep(0.05)  # The old stream is now waiting inside the source for the next chunk
+
+        # The old stream failed; its generator is still blocked when the next stream starts
+        second = threading.Thread(target=consume, args=(rollover.next_stream(), new), daemon=True)
+        second.start()
+        for value in (1, 2):
+            source.put(np.full(CHUNK, value, dtype=np.int16).tobytes())
+        source.put(None)
+        first.join(5)
+        second.join(5)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(old, [0])
+        self.assertEqual(new, [0, 1, 2])  # Chunk 0 again as replay, then chunk 1 from the old stream
+        self.assertTrue(rollover.exhausted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from transcript import Segment, Transcript, format_clock
+
+class TestTranscript(unittest.TestCase):
+    def test_legacy_line_round_trip(self):
+        """Test that the file format renders and parses back to the same segment"""
+        segment = Segment(3, "Can we ship on Friday?", 60.0, 62.7, 0.934)
+        line = segment.to_line()
+        self.assertEqual(line, "Can we ship on Friday? (Confidence: 0.93) (Time Stamp: 01:02)")
+
+        parsed = Segment.from_line(line + "\n")
+        self.assertEqual(parsed.text, "Can we ship on Friday?")
+        self.assertEqual(parsed.clock(), "01:02")
+        self.assertAlmostEqual(parsed.confidence, 0.93)
+
+        # Lines that are not in the legacy format are kept as plain text
+        self.assertEqual(Segment.from_line("just text").text, "just text")
+
+    def test_append_assigns_sequence_and_offsets(self):
+        """Test sequence ids and default start offsets"""
+        transcript = Transcript()
+        first = transcript.append("Hello everyone.", 2.5, 0.9)
+        second = transcript.append("Let's begin.", 4.0, 0.8)
+
+        self.assertEqual((first.seq, first.start, first.end), (0, 0.0, 2.5))
+        self.assertEqual((second.seq, second.start, second.end), (1, 2.5, 4.0))
+        self.assertIs(transcript.last(), second)
+        self.assertEqual(transcript.since(1), [second])
+        self.assertEqual(format_clock(125.9), "02:05")
+
+    def test_text_is_extended_incrementally(self):
+        """Test that the joined text grows with new segments without rebuilding"""
+        transcript = Transcript()
+        self.assertEqual(transcript.text(), "")
+        transcript.append("One.", 1, 0.9)
+        transcript.append("Two.", 2, 0.9)
+        self.assertEqual(transcript.text(), "[00:01] One.\n[00:02] Two.")
+
+        before = transcript.text()
+        transcript.append("Three.", 3, 0.9)
+        self.assertTrue(transcript.text().startswith(before))
+        self.assertEqual(transcript.text().split("\n")[-1], "[00:03] Three.")
+        self.assertEqual(transcript.joined_count, 3)
+
+        transcript.clear()
+        self.assertEqual((len(transcript), transcript.text()), (0, ""))
+
+    def test_segments_use_slots(self):
+        """Test that segments carry no per-instance __dict__"""
+        self.assertFalse(hasattr(Segment(0, "x", 0, 0, 0), "__dict__"))
+
+    def test_spilled_segments_are_loaded_from_storage(self):
+        """Test that segments beyond the resident cap are dropped and read back when needed"""
+        stored = []
+        transcript = Transcript(max_resident=4, loader=lambda start, end: [
+            Segment.from_line(line, seq) for seq, line in enumerate(stored[start:end], start)])
+        for i in range(6):
+            segment = transcript.append(f"Line number {i}.", i + 1.0, 0.9)
+            stored.append(segment.to_line())
+
+        # Five segments went over the cap of four, so the oldest two were spilled
+        self.assertEqual(len(transcript), 6)
+        self.assertEqual(transcript.base, 2)
+        self.assertEqual([s.seq for s in transcript.segments], [2, 3, 4, 5])
+        self.assertEqual(transcript.last().text, "Line number 5.")
+
+        self.assertEqual([s.seq for s in transcript.since(4)], [4, 5])
+        self.assertEqual([(s.seq, s.text) for s in transcript.since(1)[:2]],
+                         [(1, "Line number 1."), (2, "Line number 2.")])
+        self.assertEqual(transcript.text().splitlines()[0], "[00:01] Line number 0.")
+        self.assertEqual(len(transcript.text().splitlines()), 6)
+        self.assertEqual(len(list(transcript)), 6)
+        self.assertEqual([(s.seq, s.text) for s in transcript.lookup([0, 4])],
+                         [(0, "Line number 0."), (4, "Line number 4.")])
+        self.assertGreater(transcript.memory_bytes(), 0)
+
+    def test_lookup_reads_only_the_requested_ranges(self):
+        """Test that lookup reads back each run of spilled ids on its own, not the whole stored transcript"""
+        stored, loads = [], []
+
+        def loader(start, end):
+            loads.append((start, end))
+            return [Segment.from_line(line, seq) for seq, line in enumerate(stored[start:end], start)]
+
+        transcript = Transcript(max_resident=4, loader=loader)
+        for i in range(12):
+            stored.append(transcript.append(f"Line number {i}.", i + 1.0, 0.9).to_line())
+        self.assertGreater(transcript.base, 5)
+
+        found = transcript.lookup([1, 2, 4, transcript.base])
+        self.assertEqual([s.seq for s in found], [1, 2, 4, transcript.base])
+        self.assertEqual(loads, [(1, 3), (4, 5)])
+
+if __name__ == '__main__':
+    unittest.main()
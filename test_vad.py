@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+from audio_capture import AudioCapture, SyntheticSource, tone
+from vad import VADGate
+
+RATE = 16000
+
+def silence(seconds, level=20):
+    """Low-level room noise."""
+    return np.random.default_rng(0).integers(-level, level, int(seconds * RATE)).astype(np.int16)
+
+def chunked(signal, chunk=1600):
+    return [memoryview(signal[i:i + chunk]) for i in range(0, len(signal), chunk)]
+
+class TestVADGate(unittest.TestCase):
+    def gate(self, **kwargs):
+        return VADGate(RATE, **{"hangover_ms": 200, "preroll_ms": 200, **kwargs})
+
+    def test_silence_is_gated(self):
+        """Test that room noise is never forwarded"""
+        gate = self.gate()
+        self.assertEqual(list(gate.gate(chunked(silence(2)))), [])
+        self.assertEqual(gate.stats()["gated_ratio"], 1.0)
+
+    def test_preroll_and_hangover_surround_speech(self):
+        """Test the silence just before speech and the hangover after it are forwarded in order"""
+        signal = np.concatenate([silence(1), tone(0.5), silence(1)])
+        chunks = chunked(signal)
+        forwarded = list(self.gate().gate(chunks))
+        out = np.concatenate([np.frombuffer(c, dtype=np.int16) for c in forwarded])
+
+        # 2 pre-roll chunks + 5 speech chunks + 2 hangover chunks, contiguous in the original signal
+        self.assertEqual(len(forwarded), 9)
+        np.testing.assert_array_equal(out, signal[8 * 1600:17 * 1600])
+
+    def test_keepalive_during_long_silence(self):
+        """Test that a long silence forwards one frame of zeros per keepalive interval and nothing else"""
+        gate = self.gate(keepalive_ms=1000)
+        forwarded = list(gate.gate(chunked(silence(5.05))))
+        self.assertEqual(len(forwarded), 5)
+        self.assertTrue(all(frame == bytes(len(frame)) for frame in forwarded))
+        self.assertEqual(gate.stats()["keepalives"], 5)
+
+        # Speech restarts the interval
+        list(gate.gate(chunked(tone(0.2)) + chunked(silence(0.9))))
+        self.assertEqual(gate.stats()["keepalives"], 5)
+
+    def test_speech_chunks_are_not_copied(self):
+        """Test chunks that open the gate are forwarded as the same object"""
+        chunks = chunked(tone(0.3))
+        forwarded = list(self.gate().gate(chunks))
+        self.assertEqual([id(c) for c in forwarded], [id(c) for c in chunks])
+
+    def test_quiet_fricatives_open_the_gate(self):
+        """Test that quiet, high zero-crossing noise ('s' sounds) counts as speech"""
+        hiss = (np.random.default_rng(1).standard_normal(1600) * 150).astype(np.int16)
+        gate = self.gate()
+        self.assertTrue(gate.is_speech(hiss))
+        self.assertFalse(gate.is_speech(silence(0.1)))
+
+    def test_gated_vs_forwarded_ratio(self):
+        """Test the ratios on a meeting that is half silence"""
+        signal = np.concatenate([tone(2), silence(2), tone(2), silence(2)])
+        capture = AudioCapture(rate=RATE, buffer_seconds=10)
+        SyntheticSource(signal).start(capture)
+        gate = self.gate(hangover_ms=0, preroll_ms=0)
+        forwarded = sum(len(np.frombuffer(c, dtype=np.int16)) for c in gate.gate(capture.chunks()))
+        stats = gate.stats()
+        self.assertEqual(forwarded, 4 * RATE)
+        self.assertAlmostEqual(stats["forwarded_ratio"], 0.5)
+        self.assertAlmostEqual(stats["gated_seconds"], 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import re
+import sys
+import threading
+
+# Segments of a session kept in memory; older ones are read back from storage when needed
+TRANSCRIPT_RESIDENT_SEGMENTS = int(os.getenv("TRANSCRIPT_RESIDENT_SEGMENTS", "2000"))
+
+LEGACY_LINE = re.compile(r"^(?P<text>.*?) \(Confidence: (?P<confidence>[\d.]+)\) \(Time Stamp: (?P<minutes>\d+):(?P<seconds>\d{2})\)$")
+
+
+def format_clock(seconds):
+    """MM:SS for a number of seconds since the session started."""
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class Segment:
+    """One final recognition result. start/end are seconds since the session started."""
+    __slots__ = ("seq", "text", "start", "end", "confidence")
+
+    def __init__(self, seq, text, start, end, confidence):
+        self.seq = seq
+        self.text = text
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+
+    def clock(self):
+        """MM:SS timestamp shown for this segment (when it was finalized)."""
+        return format_clock(self.end)
+
+    def to_context(self):
+        """Compact form used in LLM prompts."""
+        return f"[{self.clock()}] {self.text}"
+
+    def to_line(self):
+        """Legacy transcript-file line: 'text (Confidence: 0.93) (Time Stamp: 01:02)'."""
+        return f"{self.text} (Confidence: {self.confidence:.2f}) (Time Stamp: {self.clock()})"
+
+    def to_dict(self):
+        return {"seq": self.seq, "text": self.text, "start": self.start, "end": self.end,
+                "confidence": self.confidence, "timestamp": self.clock()}
+
+    @classmethod
+    def from_line(cls, line, seq=None):
+        """Parse a legacy transcript-file line back into a segment."""
+        line = line.strip()
+        match = LEGACY_LINE.match(line)
+        if not match:
+            return cls(seq, line, 0.0, 0.0, 0.0)
+        end = int(match.group("minutes")) * 60 + int(match.group("seconds"))
+        return cls(seq, match.group("text"), float(end), float(end), float(match.group("confidence")))
+
+
+class Transcript:
+    """
+    Ordered segments of one session.
+
+    text() returns every segment in context form joined by newlines. The
+    joined string is extended with only the segments added since the last
+    call, so building a prompt context never re-joins the whole list.
+
+    At most `max_resident` segments are kept in memory. Older ones are
+    dropped from memory (they are already in the session's stored
+    transcript) and read back through `loader` only when since() or text()
+    reach that far back. `loader(start, end)` returns the stored segments
+    with sequence ids start..end-1 (to the last with end=None), oldest first.
+    """
+
+    def __init__(self, max_resident=None, loader=None):
+        self.max_resident = max_resident or TRANSCRIPT_RESIDENT_SEGMENTS
+        self.loader = loader
+        self.segments = []
+        self.base = 0  # Sequence id of the first resident segment
+        self.joined = ""
+        self.joined_count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.base + len(self.segments)
+
+    def __iter__(self):
+        return iter(self.since(0))
+
+    def append(self, text, end, confidence, start=None):
+        """Add a final segment; start defaults to where the previous segment ended."""
+        with self.lock:
+            if start is None:
+                start = self.segments[-1].end if self.segments else 0.0
+            segment = Segment(self.base + len(self.segments), text, start, end, confidence)
+            self.segments.append(segment)
+            if self.loader is not None and len(self.segments) > self.max_resident:
+                # Drop a quarter at a time so the joined text is rebuilt rarely
+                spilled = len(self.segments) - self.max_resident * 3 // 4
+                del self.segments[:spilled]
+                self.base += spilled
+                self.joined = ""
+                self.joined_count = 0
+            return segment
+
+    def last(self):
+        """Most recent segment, or None."""
+        return self.segments[-1] if self.segments else None
+
+    def since(self, seq):
+        """Segments with a sequence id of seq or higher."""
+        with self.lock:
+            base, resident = self.base, list(self.segments)
+        if seq >= base:
+            return resident[seq - base:]
+        return self._load(seq, base) + resident
+
+    def lookup(self, seqs):
+        """The segments with the given sequence ids (sorted), reading spilled ones back from storage."""
+        with self.lock:
+            base, resident = self.base, list(self.segments)
+        found = []
+        run = []  # Consecutive spilled ids, read back in one range
+        for seq in seqs:
+            if run and seq != run[-1] + 1:
+                found.extend(self._load(run[0], run[-1] + 1))
+                run = []
+            if seq < base:
+                run.append(seq)
+            else:
+                found.append(resident[seq - base])
+        if run:
+            found.extend(self._load(run[0], run[-1] + 1))
+        return found
+
+    def _load(self, start, end):
+        """Stored segments start..end-1 (to the last with end=None), read back from storage."""
+        return self.loader(start, end)
+
+    def text(self):
+        """
+        All segments in context form, one per line. Once segments have spilled
+        this reads them back from storage on every call; incremental consumers
+        should use since() instead.
+        """
+        with self.lock:
+            if self.joined_count < len(self.segments):
+                new = "\n".join(s.to_context() for s in self.segments[self.joined_count:])
+                self.joined = f"{self.joined}\n{new}" if self.joined else new
+                self.joined_count = len(self.segments)
+            base, joined = self.base, self.joined
+        if not base:
+            return joined
+        spilled = "\n".join(s.to_context() for s in self._load(0, base))
+        return f"{spilled}\n{joined}" if joined else spilled
+
+    def clear(self):
+        """Drop every segment (a new session is starting)."""
+        with self.lock:
+            self.segments = []
+            self.base = 0
+            self.joined = ""
+            self.joined_count = 0
+
+    def memory_bytes(self):
+        """Approximate memory held by the resident segments and joined text."""
+        with self.lock:
+            return sys.getsizeof(self.joined) + sum(
+                sys.getsizeof(s) + sys.getsizeof(s.text) for s in self.segments)
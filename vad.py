@@ -0,0 +1,118 @@
+import os
+from collections import deque
+import numpy as np
+
+# Set VAD_ENABLED=0 to stream all audio, silence included
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") != "0"
+# Analysis frame length within each chunk
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "20"))
+# Frames at least this loud (dBFS) are speech
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+# Quieter frames (down to threshold minus this margin) are still speech when they
+# cross zero as often as unvoiced consonants do ("s", "f", "th")
+VAD_ZCR_MARGIN_DB = float(os.getenv("VAD_ZCR_MARGIN_DB", "10"))
+VAD_ZCR_MIN = float(os.getenv("VAD_ZCR_MIN", "0.25"))
+# Keep forwarding this long after the last speech, so trailing words and short pauses pass
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))
+# Silence held back and sent ahead of the first speech chunk, so word onsets aren't clipped
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+# While gated, send one frame of digital silence after this much held-back audio, so the
+# recognizer does not close the stream for lack of audio (Google does after about 10 s); 0 to never
+VAD_KEEPALIVE_MS = int(os.getenv("VAD_KEEPALIVE_MS", "3000"))
+
+
+class VADGate:
+    """
+    Voice-activity gate between audio capture and the recognizer.
+
+    Each chunk is split into short frames whose energy and zero-crossing rate
+    are computed in one vectorized pass; a chunk with any speech frame opens
+    the gate. Speech chunks are passed through untouched (no copy). Silent
+    chunks are held in a short pre-roll (copied, since the capture buffer
+    reuses their memory) and only forwarded if speech follows. During long
+    silences a single frame of zeros is forwarded every `keepalive_ms` to
+    keep the recognizer's stream open.
+    """
+
+    def __init__(self, rate, frame_ms=None, threshold_db=None, zcr_margin_db=None, zcr_min=None,
+                 hangover_ms=None, preroll_ms=None, keepalive_ms=None):
+        self.rate = rate
+        self.frame_samples = max(1, rate * (frame_ms or VAD_FRAME_MS) // 1000)
+        self.threshold_db = VAD_THRESHOLD_DB if threshold_db is None else threshold_db
+        self.zcr_margin_db = VAD_ZCR_MARGIN_DB if zcr_margin_db is None else zcr_margin_db
+        self.zcr_min = VAD_ZCR_MIN if zcr_min is None else zcr_min
+        self.hangover_samples = rate * (VAD_HANGOVER_MS if hangover_ms is None else hangover_ms) // 1000
+        self.preroll_samples = rate * (VAD_PREROLL_MS if preroll_ms is None else preroll_ms) // 1000
+        self.keepalive_samples = rate * (VAD_KEEPALIVE_MS if keepalive_ms is None else keepalive_ms) // 1000
+        self.keepalive_frame = bytes(self.frame_samples * 2)
+        self.silent_samples = 0  # Held back since the last chunk or keepalive forwarded
+        self.keepalives = 0
+        self.hangover = 0
+        self.preroll = deque()
+        self.preroll_held = 0
+        self.forwarded_samples = 0
+        self.gated_samples = 0
+        self.speech_chunks = 0
+        self.chunks = 0
+
+    def is_speech(self, samples):
+        """Whether any frame of an int16 sample array sounds like speech."""
+        if not len(samples):
+            return False
+        usable = len(samples) // self.frame_samples * self.frame_samples
+        frames = samples[:usable].reshape(-1, self.frame_samples) if usable else samples.reshape(1, -1)
+        frames = frames.astype(np.float32) / 32768.0
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        crossings = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        loud = energy_db >= self.threshold_db
+        fricative = (energy_db >= self.threshold_db - self.zcr_margin_db) & (crossings >= self.zcr_min)
+        return bool(np.any(loud | fricative))
+
+    def process(self, chunk):
+        """Chunks to forward for this input chunk: none while silent, pre-roll plus the chunk once speech starts."""
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        count = len(samples)
+        self.chunks += 1
+        speech = self.is_speech(samples)
+        if speech:
+            self.speech_chunks += 1
+            self.hangover = self.hangover_samples
+        elif self.hangover > 0:
+            self.hangover -= count
+        else:
+            self.preroll.append(bytes(chunk))
+            self.preroll_held += count
+            while self.preroll and self.preroll_held - len(self.preroll[0]) // 2 >= self.preroll_samples:
+                self.gated_samples += len(self.preroll[0]) // 2
+                self.preroll_held -= len(self.preroll.popleft()) // 2
+            self.silent_samples += count
+            if self.keepalive_samples and self.silent_samples >= self.keepalive_samples:
+                self.silent_samples = 0
+                self.keepalives += 1
+                return [self.keepalive_frame]
+            return []
+
+        self.silent_samples = 0
+        forwarded = list(self.preroll) + [chunk]
+        self.forwarded_samples += self.preroll_held + count
+        self.preroll.clear()
+        self.preroll_held = 0
+        return forwarded
+
+    def gate(self, chunks):
+        """Filter a stream of chunks."""
+        for chunk in chunks:
+            yield from self.process(chunk)
+
+    def stats(self):
+        gated = self.gated_samples + self.preroll_held
+        total = self.forwarded_samples + gated
+        return {
+            "chunks": self.chunks,
+            "speech_chunks": self.speech_chunks,
+            "forwarded_seconds": self.forwarded_samples / self.rate,
+            "gated_seconds": gated / self.rate,
+            "forwarded_ratio": self.forwarded_samples / total if total else 0.0,
+            "gated_ratio": gated / total if total else 0.0,
+            "keepalives": self.keepalives,
+        }